@@ -0,0 +1,282 @@
+"""Benchmarks reproducibles de carga, combinaciones y búsqueda de interacciones.
+
+Genera datos sintéticos con :mod:`benchmarks.synthetic`, mide el tiempo
+(mejor y mediana de varias repeticiones) y el pico de memoria Python
+(``tracemalloc``, en una ejecución aparte para no falsear los tiempos) de las
+etapas de ambos scripts y compara el resultado con las referencias guardadas
+en ``benchmarks/baseline.json``.
+
+Las etapas ``startup.*`` lanzan cada orden de ambos scripts en un proceso
+nuevo sobre un plan de una sola administración: su tiempo es, casi por
+completo, el de arrancar el intérprete e importar lo que necesita la orden.
+
+Uso, desde la raíz del repositorio::
+
+    python -m benchmarks.run_benchmarks --scale small
+    python -m benchmarks.run_benchmarks --scale medium --save-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pharmprofile import cic, detect
+from pharmprofile.drugbank_index import compile_index
+from pharmprofile.engine import COMMANDS, CombinationResults, analyse
+from pharmprofile.name_resolver import MATCH_EXACT
+from pharmprofile.pair_stats import STATS_MODES, PairStatistics, statistics_labels
+from pharmprofile.run_report import RunReport
+from pharmprofile.vocabulary import Vocabulary
+from pharmprofile.window_engine import DEFAULT_OFFSET_DAYS, DEFAULT_ROLLING_HOURS
+
+from benchmarks.synthetic import (
+    SHEET_NAME,
+    DrugBankSpec,
+    ScheduleSpec,
+    profile_names,
+    write_drugbank,
+    write_profile,
+    write_schedule,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_TOLERANCE = 1.25
+# Diferencias menores que ésta son ruido del planificador, no regresiones.
+NOISE_FLOOR_SECONDS = 0.02
+
+SCALES: Dict[str, Tuple[ScheduleSpec, DrugBankSpec, int]] = {
+    "small": (ScheduleSpec(patients=50, administrations=40), DrugBankSpec(drugs=500, interactions_per_drug=15), 10),
+    "medium": (ScheduleSpec(patients=200, administrations=60), DrugBankSpec(drugs=2000), 20),
+    "large": (
+        ScheduleSpec(patients=1000, administrations=100, vocabulary=800),
+        DrugBankSpec(drugs=10000, interactions_per_drug=40),
+        50,
+    ),
+}
+
+
+@dataclass
+class Measurement:
+    best_seconds: float
+    median_seconds: float
+    peak_mb: float
+
+
+@dataclass
+class Dataset:
+    schedule: Path
+    drugbank: Path
+    profile: Path
+
+
+def prepare_dataset(directory: Path, scale: str) -> Dataset:
+    schedule_spec, drugbank_spec, profile_size = SCALES[scale]
+    return Dataset(
+        write_schedule(directory / "schedule.xlsx", schedule_spec),
+        write_drugbank(directory / "drugbank.xml", drugbank_spec),
+        write_profile(
+            directory / "profile.txt",
+            profile_names(profile_size, min(schedule_spec.vocabulary, drugbank_spec.drugs), schedule_spec.seed),
+        ),
+    )
+
+
+def measure(function: Callable[[], Any], repeats: int) -> Measurement:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Measurement(round(min(timings), 6), round(statistics.median(timings), 6), round(peak / (1024 * 1024), 3))
+
+
+def benchmarks(dataset: Dataset) -> List[Tuple[str, Callable[[], Any]]]:
+    """Etapas a medir; las entradas de cada una se preparan fuera de la medición."""
+
+    events = cic.load_schedule(dataset.schedule, SHEET_NAME)
+    vocabulary = Vocabulary()
+    schedules = cic.build_schedule(events, vocabulary)
+    detect_vocabulary = Vocabulary()
+    administrations = detect.load_schedules(dataset.schedule, SHEET_NAME, detect_vocabulary)
+    profile = cic.load_profile_list(dataset.profile)
+    index_path = dataset.drugbank.with_name("benchmark.index.sqlite")
+    compile_index(dataset.drugbank, index_path)
+
+    def compile_fresh() -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            compile_index(dataset.drugbank, Path(tmp) / "index.sqlite")
+
+    def pair_statistics(mode: str) -> Callable[[], Any]:
+        # Combinaciones de cic con estadísticas de cohorte; compárese con cic.compute_time_window_combinations.
+        def run() -> None:
+            results = CombinationResults.empty(vocabulary, cic.PROFILE)
+            labels = statistics_labels(DEFAULT_ROLLING_HOURS, DEFAULT_OFFSET_DAYS, same_slot=True)
+            analyse(schedules, results, cic.PROFILE, RunReport(), statistics=PairStatistics(labels, mode))
+
+        return run
+
+    return [
+        ("cic.load_schedule", lambda: cic.load_schedule(dataset.schedule, SHEET_NAME)),
+        ("cic.compute_time_window_combinations", lambda: cic.compute_time_window_combinations(schedules, vocabulary)),
+        (
+            "cic.compute_time_window_combinations[vectorized]",
+            lambda: cic.compute_time_window_combinations(schedules, vocabulary, vectorized=True),
+        ),
+        *((f"cic.analyse[pair_stats={mode}]", pair_statistics(mode)) for mode in STATS_MODES),
+        ("cic.find_drugbank_interactions", lambda: cic.find_drugbank_interactions(profile, dataset.drugbank, index_path)),
+        ("detect.load_schedules", lambda: detect.load_schedules(dataset.schedule, SHEET_NAME, Vocabulary())),
+        ("detect.compute_combinations", lambda: detect.compute_combinations(administrations, detect_vocabulary)),
+        (
+            "detect.compute_combinations[vectorized]",
+            lambda: detect.compute_combinations(administrations, detect_vocabulary, vectorized=True),
+        ),
+        (
+            "detect.find_interactions",
+            lambda: detect.find_interactions(dataset.drugbank, profile, index_path, match_policy=MATCH_EXACT),
+        ),
+        ("drugbank_index.compile_index", compile_fresh),
+    ] + startup_benchmarks(dataset, index_path)
+
+
+def startup_benchmarks(dataset: Dataset, index_path: Path) -> List[Tuple[str, Callable[[], Any]]]:
+    """Cada orden de ambos scripts en un proceso nuevo, con un plan CSV de una administración."""
+
+    schedule = write_schedule(dataset.schedule.with_name("startup.csv"), ScheduleSpec(patients=1, administrations=1))
+    output_dir = dataset.schedule.with_name("startup")
+    output_dir.mkdir(exist_ok=True)
+    inputs = [
+        "--excel",
+        str(schedule),
+        "--drugbank",
+        str(dataset.drugbank),
+        "--drugbank-index",
+        str(index_path),
+        "--profile",
+        str(dataset.profile),
+        "--output-dir",
+        str(output_dir),
+    ]
+
+    def launch(module: str, command: str) -> Callable[[], None]:
+        arguments = [sys.executable, "-m", f"pharmprofile.{module}", command, *inputs]
+        return lambda: subprocess.run(arguments, cwd=ROOT, check=True, capture_output=True)
+
+    return [
+        (f"startup.{module}.{command}", launch(module, command)) for module in ("cic", "detect") for command in COMMANDS
+    ]
+
+
+def run(dataset: Dataset, repeats: int, selected: Optional[Sequence[str]] = None) -> Dict[str, Measurement]:
+    results: Dict[str, Measurement] = {}
+    for name, function in benchmarks(dataset):
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(function, repeats)
+        print(f"  {name:<52} {results[name].best_seconds:9.4f}s  {results[name].peak_mb:8.1f} MB", flush=True)
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+
+
+def load_baseline(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare(results: Dict[str, Measurement], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Imprime la comparación con la referencia y devuelve las etapas más lentas que ``tolerance``."""
+
+    regressions = []
+    print(f"\n{'etapa':<52} {'actual':>9} {'referencia':>11} {'ratio':>7}")
+    for name, measurement in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<52} {measurement.best_seconds:9.4f} {'-':>11} {'-':>7}")
+            continue
+        ratio = measurement.best_seconds / reference["best_seconds"] if reference["best_seconds"] else float("inf")
+        regressed = ratio > tolerance and measurement.best_seconds - reference["best_seconds"] > NOISE_FLOOR_SECONDS
+        flag = "  <-- regresión" if regressed else ""
+        print(f"{name:<52} {measurement.best_seconds:9.4f} {reference['best_seconds']:11.4f} {ratio:7.2f}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks de los scripts de interacciones")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Tamaño de los datos sintéticos")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeticiones cronometradas por etapa")
+    parser.add_argument("--only", nargs="*", default=None, help="Medir sólo las etapas que contengan estos textos")
+    parser.add_argument("--data-dir", type=Path, default=None, help="Conservar los datos sintéticos en este directorio")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Archivo de referencias")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como nueva referencia")
+    parser.add_argument("--output", type=Path, default=None, help="Guardar los resultados en JSON")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Ratio frente a la referencia que cuenta como regresión"
+    )
+    parser.add_argument(
+        "--fail-on-regression", action="store_true", help="Terminar con código 1 si alguna etapa supera la tolerancia"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_arguments(argv)
+    # La fila de cabecera genera un aviso por ejecución en drug_drug_interact_cic.
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.data_dir or Path(tmp)
+        print(f"Generando datos sintéticos ({args.scale}) en {directory}")
+        dataset = prepare_dataset(directory, args.scale)
+        print(f"Midiendo ({args.repeats} repeticiones por etapa)")
+        results = run(dataset, args.repeats, args.only)
+
+    report = {
+        "scale": args.scale,
+        "environment": environment(),
+        "results": {name: asdict(measurement) for name, measurement in results.items()},
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    baselines = load_baseline(args.baseline)
+    stored = baselines.get(args.scale)
+    regressions: List[str] = []
+    if stored is not None:
+        print(f"\nReferencia guardada en {stored['environment']['platform']} (Python {stored['environment']['python']})")
+        regressions = compare(results, stored["results"], args.tolerance)
+    else:
+        print(f"\nNo hay referencia para la escala {args.scale} en {args.baseline}")
+
+    if args.save_baseline:
+        baselines[args.scale] = report
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Referencia de {args.scale} guardada en {args.baseline}")
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
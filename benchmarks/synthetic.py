@@ -0,0 +1,195 @@
+"""Generadores de datos sintéticos para los benchmarks.
+
+Los datos reales (``Med_vs_Tiempo.xlsx`` y ``drugbank_2.xml``) son privados,
+así que los benchmarks trabajan con un plan de medicación y un XML con la
+forma de DrugBank generados a partir de una semilla. Los nombres de los
+fármacos se comparten entre ambos generadores para que las búsquedas de
+interacciones encuentren coincidencias.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+SHEET_NAME = "Med_vs_Tiempo (5)"
+HEADER = ("Fecha", "Hora", "Paciente", "Med")
+DRUGBANK_NAMESPACE = "http://www.drugbank.ca"
+START = datetime(2023, 1, 1)
+# Separaciones que ejercitan cada ventana: misma administración, dentro de 6h,
+# mismo día, exactamente 24h y exactamente 48h.
+_WINDOW_GAPS_MINUTES = (0, 30, 180, 300, 1440, 2880)
+
+
+def drug_name(index: int) -> str:
+    """Nombre sintético del fármaco ``index``; alterna mayúsculas para ejercitar la normalización."""
+
+    name = f"drug{index:05d}"
+    return name.capitalize() if index % 7 == 0 else name
+
+
+@dataclass
+class ScheduleSpec:
+    """Parámetros del plan sintético."""
+
+    patients: int = 200
+    administrations: int = 60
+    drugs_per_cell: Tuple[int, int] = (1, 3)
+    vocabulary: int = 300
+    mean_gap_minutes: float = 240.0
+    seed: int = 0
+
+
+@dataclass
+class DrugBankSpec:
+    """Parámetros del XML sintético con forma de DrugBank."""
+
+    drugs: int = 2000
+    interactions_per_drug: int = 25
+    synonyms_per_drug: int = 2
+    seed: int = 0
+
+
+def iter_schedule_rows(spec: ScheduleSpec) -> Iterator[Tuple[datetime, datetime, str, str]]:
+    """Filas ``(fecha, hora, paciente, medicamentos)`` en el formato de la hoja.
+
+    La hora se devuelve como ``datetime`` del 1900-01-01, igual que las celdas
+    de hora que lee openpyxl. Las separaciones entre administraciones siguen
+    una exponencial de media ``mean_gap_minutes`` mezclada con separaciones
+    exactas de ventana.
+    """
+
+    generator = random.Random(spec.seed)
+    low, high = spec.drugs_per_cell
+    for patient in range(spec.patients):
+        moment = START + timedelta(minutes=generator.randrange(0, 24 * 60))
+        for _ in range(spec.administrations):
+            if generator.random() < 0.3:
+                gap = generator.choice(_WINDOW_GAPS_MINUTES)
+            else:
+                gap = int(generator.expovariate(1.0 / spec.mean_gap_minutes))
+            moment += timedelta(minutes=gap)
+            count = generator.randint(low, min(high, spec.vocabulary))
+            medications = "_".join(drug_name(i) for i in generator.sample(range(spec.vocabulary), count))
+            yield (
+                datetime(moment.year, moment.month, moment.day),
+                datetime(1900, 1, 1, moment.hour, moment.minute),
+                f"P{patient:05d}",
+                medications,
+            )
+
+
+def write_schedule(path: Path, spec: ScheduleSpec) -> Path:
+    """Escribe el plan en ``.xlsx`` (openpyxl en modo de sólo escritura) o ``.csv``."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".csv":
+        with path.open("w", encoding="utf-8", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(HEADER)
+            writer.writerows(iter_schedule_rows(spec))
+        return path
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append(HEADER)
+    for row in iter_schedule_rows(spec):
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def write_drugbank(path: Path, spec: DrugBankSpec) -> Path:
+    """Escribe un XML con la estructura de DrugBank (nombre, sinónimos e interacciones)."""
+
+    generator = random.Random(spec.seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<drugbank xmlns="{DRUGBANK_NAMESPACE}">\n')
+        for index in range(spec.drugs):
+            name = drug_name(index)
+            handle.write(f'<drug type="small-molecule"><drugbank-id primary="true">DB{index:05d}</drugbank-id>')
+            handle.write(f"<name>{escape(name)}</name><synonyms>")
+            for synonym in range(spec.synonyms_per_drug):
+                handle.write(f"<synonym>{escape(name)} form {synonym}</synonym>")
+            handle.write("</synonyms><drug-interactions>")
+            partners = generator.sample(range(spec.drugs), min(spec.interactions_per_drug, spec.drugs))
+            for partner in partners:
+                if partner == index:
+                    continue
+                partner_name = escape(drug_name(partner))
+                handle.write(
+                    f"<drug-interaction><drugbank-id>DB{partner:05d}</drugbank-id><name>{partner_name}</name>"
+                    f"<description>{escape(name)} may increase the effects of {partner_name}.</description>"
+                    "</drug-interaction>"
+                )
+            handle.write("</drug-interactions></drug>\n")
+        handle.write("</drugbank>\n")
+    return path
+
+
+def write_profile(path: Path, names: Sequence[str]) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(names) + "\n", encoding="utf-8")
+    return path
+
+
+def profile_names(count: int, vocabulary: int, seed: int = 0) -> List[str]:
+    """Perfil de interés: fármacos del plan en minúsculas, como en ``lista_med_cic.txt``."""
+
+    generator = random.Random(seed)
+    return [drug_name(i).lower() for i in generator.sample(range(vocabulary), min(count, vocabulary))]
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generar un plan de medicación y un DrugBank sintéticos")
+    parser.add_argument("output_dir", type=Path, help="Directorio de salida")
+    parser.add_argument("--format", choices=("xlsx", "csv"), default="xlsx", help="Formato del plan")
+    parser.add_argument("--patients", type=int, default=ScheduleSpec.patients, help="Número de pacientes")
+    parser.add_argument(
+        "--administrations", type=int, default=ScheduleSpec.administrations, help="Administraciones por paciente"
+    )
+    parser.add_argument("--min-drugs", type=int, default=1, help="Mínimo de medicamentos por celda")
+    parser.add_argument("--max-drugs", type=int, default=3, help="Máximo de medicamentos por celda")
+    parser.add_argument("--vocabulary", type=int, default=ScheduleSpec.vocabulary, help="Fármacos distintos del plan")
+    parser.add_argument(
+        "--mean-gap-minutes",
+        type=float,
+        default=ScheduleSpec.mean_gap_minutes,
+        help="Separación media entre administraciones (densidad temporal)",
+    )
+    parser.add_argument("--drugs", type=int, default=DrugBankSpec.drugs, help="Entradas del DrugBank sintético")
+    parser.add_argument(
+        "--interactions", type=int, default=DrugBankSpec.interactions_per_drug, help="Interacciones por entrada"
+    )
+    parser.add_argument("--profile-size", type=int, default=20, help="Fármacos del perfil de interés")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+    schedule = ScheduleSpec(
+        args.patients,
+        args.administrations,
+        (args.min_drugs, args.max_drugs),
+        args.vocabulary,
+        args.mean_gap_minutes,
+        args.seed,
+    )
+    drugbank = DrugBankSpec(args.drugs, args.interactions, seed=args.seed)
+    write_schedule(args.output_dir / f"schedule.{args.format}", schedule)
+    write_drugbank(args.output_dir / "drugbank.xml", drugbank)
+    write_profile(args.output_dir / "profile.txt", profile_names(args.profile_size, args.vocabulary, args.seed))
+    print(f"Datos sintéticos en {args.output_dir}: {asdict(schedule)} {asdict(drugbank)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Análisis de interacciones entre fármacos a partir de planes de medicación.
+
+``drug_drug_interact_cic.py`` e ``Interact_Detect.py`` son envoltorios de
+:mod:`pharmprofile.cic` y :mod:`pharmprofile.detect`, que comparten el núcleo
+de :mod:`pharmprofile.engine` y sólo difieren en su
+:class:`~pharmprofile.engine.CompatibilityProfile`.
+"""
+from pharmprofile.engine import (
+    CombinationResults,
+    CompatibilityProfile,
+    MedicationEvent,
+    PatientSchedule,
+    analyse,
+    compute_combinations,
+    group_schedules,
+    iter_events,
+    profile_interactions,
+)
+from pharmprofile.vocabulary import PairList, PairSet, Vocabulary
+
+__all__ = [
+    "CombinationResults",
+    "CompatibilityProfile",
+    "MedicationEvent",
+    "PairList",
+    "PairSet",
+    "PatientSchedule",
+    "Vocabulary",
+    "analyse",
+    "compute_combinations",
+    "group_schedules",
+    "iter_events",
+    "profile_interactions",
+]
@@ -0,0 +1,251 @@
+"""Procesamiento por lotes de varios planes de medicación.
+
+Cada planta o servicio exporta su propio libro, a veces con varias hojas. En
+lugar de relanzar el script por archivo, :func:`expand_sources` reúne los
+planes que coinciden con patrones glob o que enumera un manifiesto y
+:func:`run_sources` los analiza uno por proceso con
+:func:`parallel.ordered_map`. Cada plan escribe sus salidas en un
+subdirectorio propio; el índice de DrugBank se compila una sola vez en el
+proceso principal antes de repartir el trabajo, de modo que los procesos sólo
+lo abren en modo de lectura, y las interacciones del perfil (que no dependen
+del plan) se calculan una vez para todo el lote.
+
+El manifiesto es un archivo de texto con un plan por línea: la ruta y,
+separadas por tabuladores, la hoja y el nombre del subdirectorio, ambos
+opcionales. Las rutas relativas se resuelven desde el directorio del
+manifiesto y se ignoran las líneas vacías y las que empiezan por ``#``. Una
+hoja ``*`` equivale a todas las hojas del libro.
+
+Al terminar, :func:`write_cohort_summary` escribe un TSV con una fila por
+plan (estado, pacientes, administraciones, pares por ventana...) y una fila
+final con la suma de cada columna.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pharmprofile.engine import COMMAND_COMBOS, COMMAND_INGEST
+from pharmprofile.run_report import RunReport
+from pharmprofile.schedule_reader import list_sheets
+
+LOGGER = logging.getLogger(__name__)
+
+ALL_SHEETS = "*"
+MANIFEST_COMMENT = "#"
+SUMMARY_TOTAL = "TOTAL"
+STATUS_OK = "ok"
+STATUS_EMPTY = "empty"
+STATUS_FAILED = "failed"
+# Contadores del informe de ejecución que pasan al resumen, con su columna.
+SUMMARY_COUNTERS = (
+    ("read", "patients", "patients"),
+    ("read", "administrations", "administrations"),
+    ("read", "timestamp_failures", "timestamp_failures"),
+    ("write", "pairs_", None),
+    ("screening", "records", "screening_records"),
+    ("columnar", "rows", "columnar_rows"),
+)
+# Columnas que no se suman en la fila ``TOTAL``: un mismo par puede aparecer en
+# varios planes, así que la suma de pares por plan no es un recuento de la cohorte.
+UNSUMMED_PREFIXES = ("pairs_",)
+
+SourceAnalysis = Callable[[argparse.Namespace], Tuple[str, Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class BatchSource:
+    """Un plan del lote: archivo, hoja y subdirectorio de salida."""
+
+    label: str
+    path: Path
+    sheet: str
+
+
+@dataclass
+class SourceResult:
+    """Estado de un plan analizado y su informe de ejecución (:meth:`RunReport.as_dict`)."""
+
+    source: BatchSource
+    status: str
+    report: Dict[str, Any] = field(default_factory=dict)
+
+
+def read_manifest(path: Path, default_sheet: str) -> List[Tuple[Path, str, Optional[str]]]:
+    """Entradas ``(ruta, hoja, subdirectorio)`` del manifiesto, en su orden."""
+
+    entries: List[Tuple[Path, str, Optional[str]]] = []
+    with path.open("r", encoding="utf-8", newline="") as handle:
+        for row in csv.reader(handle, delimiter="\t"):
+            fields = [value.strip() for value in row]
+            if not fields or not fields[0] or fields[0].startswith(MANIFEST_COMMENT):
+                continue
+            source = Path(fields[0])
+            if not source.is_absolute():
+                source = path.parent / source
+            sheet = fields[1] if len(fields) > 1 and fields[1] else default_sheet
+            label = fields[2] if len(fields) > 2 and fields[2] else None
+            entries.append((source, sheet, label))
+    return entries
+
+
+def expand_sources(patterns: Sequence[str], manifest: Optional[Path], default_sheet: str) -> List[BatchSource]:
+    """Planes del lote: los del manifiesto y después los de cada patrón, sin repetir.
+
+    Los subdirectorios se toman del nombre del archivo, con la hoja añadida
+    cuando un mismo libro aporta varias, y se numeran si coinciden.
+    """
+
+    entries = read_manifest(manifest, default_sheet) if manifest is not None else []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            LOGGER.warning("Ningún plan coincide con %s", pattern)
+        entries.extend((Path(match), default_sheet, None) for match in matches)
+
+    expanded: List[Tuple[Path, str, Optional[str]]] = []
+    seen = set()
+    for path, sheet, label in entries:
+        sheets = [sheet]
+        if sheet == ALL_SHEETS:
+            sheets = list_sheets(path) if path.exists() else []
+            sheets = sheets or [default_sheet]
+        for name in sheets:
+            key = (path.resolve(), name)
+            if key not in seen:
+                seen.add(key)
+                expanded.append((path, name, label))
+
+    per_path: Dict[Path, int] = {}
+    for path, _, _ in expanded:
+        per_path[path.resolve()] = per_path.get(path.resolve(), 0) + 1
+    sources: List[BatchSource] = []
+    used: Dict[str, int] = {}
+    for path, sheet, label in expanded:
+        if label is None:
+            label = path.stem if per_path[path.resolve()] == 1 else f"{path.stem}_{sheet}"
+        label = re.sub(r"[^\w.-]+", "_", label).strip("._") or "plan"
+        used[label] = used.get(label, 0) + 1
+        if used[label] > 1:
+            label = f"{label}_{used[label]}"
+        sources.append(BatchSource(label, path, sheet))
+    return sources
+
+
+def needs_index(args: argparse.Namespace) -> bool:
+    """Si la orden consulta DrugBank: búsqueda de interacciones del perfil o cribado."""
+
+    return args.command != COMMAND_INGEST and (args.command != COMMAND_COMBOS or args.screen)
+
+
+def open_shared_index(args: argparse.Namespace, report: RunReport) -> argparse.Namespace:
+    """Compila (o valida) el índice de DrugBank una sola vez, antes de repartir los planes.
+
+    Devuelve los argumentos sin ``rebuild_index``, para que ni el proceso
+    principal ni los planes lo vuelvan a construir.
+    """
+
+    if needs_index(args) and args.drugbank.exists():
+        from pharmprofile.drugbank_index import DrugBankIndex
+
+        with report.stage("drugbank"):
+            DrugBankIndex.open(args.drugbank, args.drugbank_index, rebuild=args.rebuild_index).close()
+    return argparse.Namespace(**{**vars(args), "rebuild_index": False})
+
+
+def source_arguments(args: argparse.Namespace, source: BatchSource) -> argparse.Namespace:
+    """Argumentos de un plan: su archivo, su hoja y su subdirectorio, sin paralelismo interno.
+
+    El índice ya está compilado y no se vuelve a construir; la salida columnar
+    conserva su nombre dentro del subdirectorio.
+    """
+
+    output_dir = args.output_dir / source.label
+    options = dict(vars(args))
+    options.update(
+        excel=source.path,
+        sheet=source.sheet,
+        output_dir=output_dir,
+        workers=1,
+        rebuild_index=False,
+        columnar=output_dir / args.columnar.name if args.columnar is not None else None,
+    )
+    return argparse.Namespace(**options)
+
+
+def run_sources(
+    analyse_source: SourceAnalysis,
+    args: argparse.Namespace,
+    sources: Sequence[BatchSource],
+    workers: int = 1,
+) -> Iterator[SourceResult]:
+    """Analiza cada plan con ``analyse_source`` y devuelve los resultados en el orden de ``sources``.
+
+    ``analyse_source`` recibe los argumentos de :func:`source_arguments` y
+    devuelve el estado y el informe del plan; con ``workers > 1`` se ejecuta
+    en un pool de procesos y debe poder serializarse con ``pickle``.
+    """
+
+    tasks = ((source_arguments(args, source),) for source in sources)
+    if workers > 1:
+        from pharmprofile.parallel import PoolStats, ordered_map
+
+        outcomes: Iterator[Tuple[str, Dict[str, Any]]] = ordered_map(
+            analyse_source, tasks, workers, PoolStats(workers)
+        )
+    else:
+        outcomes = (analyse_source(*task) for task in tasks)
+    for source, (status, report) in zip(sources, outcomes):
+        yield SourceResult(source, status, report)
+
+
+def summary_counters(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Columnas del resumen a partir del informe de ejecución de un plan."""
+
+    stages = {stage["name"]: stage["counters"] for stage in report.get("stages", [])}
+    columns: Dict[str, Any] = {}
+    for stage, counter, column in SUMMARY_COUNTERS:
+        counters = stages.get(stage, {})
+        if column is None:
+            columns.update((name, value) for name, value in counters.items() if name.startswith(counter))
+        elif counter in counters:
+            columns[column] = counters[counter]
+    if "total_seconds" in report:
+        columns["seconds"] = report["total_seconds"]
+    return columns
+
+
+def write_cohort_summary(path: Path, results: Sequence[SourceResult]) -> None:
+    """TSV con una fila por plan y una fila ``TOTAL`` con la suma de los contadores aditivos.
+
+    Las columnas de pares quedan vacías en ``TOTAL`` (véase ``UNSUMMED_PREFIXES``).
+    """
+
+    rows = [summary_counters(result.report) for result in results]
+    columns: List[str] = []
+    for row in rows:
+        columns.extend(name for name in row if name not in columns)
+    totals = {
+        name: "" if name.startswith(UNSUMMED_PREFIXES) else sum(row.get(name, 0) for row in rows) for name in columns
+    }
+    if "seconds" in totals:
+        totals["seconds"] = round(totals["seconds"], 6)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle, delimiter="\t", lineterminator="\n")
+        writer.writerow(["source", "path", "sheet", "status", *columns])
+        for result, row in zip(results, rows):
+            source = result.source
+            values = (row.get(name, "") for name in columns)
+            writer.writerow([source.label, source.path, source.sheet, result.status, *values])
+        counts = Counter(result.status for result in results)
+        statuses = ", ".join(f"{count} {status}" for status, count in counts.items())
+        writer.writerow([SUMMARY_TOTAL, "", "", statuses, *(totals[name] for name in columns)])
@@ -0,0 +1,618 @@
+"""Herramientas para detectar interacciones entre fármacos.
+
+Este módulo procesa un archivo de Excel con registros de administración
+farmacológica por paciente y fecha, genera una representación XML y
+calcula combinaciones de medicamentos en distintas ventanas de tiempo.
+También ofrece una búsqueda básica de interacciones en un archivo
+DrugBank.
+
+Es la implementación de ``drug_drug_interact_cic.py``: el cálculo lo hace
+:mod:`pharmprofile.engine` con el perfil :data:`PROFILE`, que reproduce las
+salidas históricas de este script (listas sin ordenar y con repeticiones,
+desplazamiento exacto de 48h, coincidencia de nombres por subcadena). Las
+etapas las encadena :mod:`pharmprofile.pipeline` con :data:`PIPELINE`; aquí
+quedan la línea de órdenes y el formato de las listas.
+
+Con ``--batch`` o ``--batch-manifest`` se analizan varios planes, cada uno
+en su subdirectorio, con un único índice de DrugBank y un resumen de la
+cohorte (:mod:`pharmprofile.batch`).
+
+La línea de órdenes acepta una orden opcional que limita las etapas (y las
+importaciones) de la ejecución: ``ingest`` lee el plan y exporta
+``drug.xml``, ``combos`` calcula las combinaciones, ``interactions`` sólo
+consulta DrugBank con el perfil y ``screen`` sólo hace el cribado. Sin orden
+se ejecuta todo, como siempre.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Collection, Iterable, Iterator, List, Optional, Sequence
+
+# build_schedule y write_drug_xml se siguen ofreciendo desde este módulo.
+from pharmprofile.engine import (  # noqa: F401
+    COMMAND_ALL,
+    COMMAND_INTERACTIONS,
+    COMMANDS,
+    XML_COMMENT,
+    CombinationResults,
+    CompatibilityProfile,
+    MedicationEvent,
+    PatientSchedule,
+    build_schedule,
+    compute_combinations,
+    group_schedules,
+    iter_events,
+    profile_interactions,
+    split_medications,
+    write_drug_xml,
+)
+from pharmprofile.name_resolver import MATCH_EXACT, MATCH_POLICIES, MATCH_SUBSTRING
+from pharmprofile.pair_matrix import write_count_matrix, write_pair_matrices
+from pharmprofile.pair_stats import DEFAULT_MEMORY_MB, DEFAULT_TOP_K, STATS_MODES
+from pharmprofile.pair_writers import write_lines
+from pharmprofile.pipeline import Messages, Pipeline, analyse_schedule, run_batch, validate_arguments
+from pharmprofile.run_report import RunReport, profiled
+from pharmprofile.vocabulary import PairList, Vocabulary
+from pharmprofile.window_engine import DEFAULT_OFFSET_DAYS, DEFAULT_ROLLING_HOURS, WindowSpec, window_spec
+
+if TYPE_CHECKING:
+    from xml.etree.ElementTree import Element
+
+    from pharmprofile.incremental import IncrementalState
+    from pharmprofile.schedule_reader import Row
+    from pharmprofile.timestamps import TimestampParser
+
+# Rutas por defecto
+DEFAULT_EXCEL_PATH = Path("Med_vs_Tiempo.xlsx")
+DEFAULT_SHEET_NAME = "Med_vs_Tiempo (5)"
+DEFAULT_OUTPUT_DIR = Path(".")
+DEFAULT_DRUGBANK_XML = Path("drugbank_2.xml")
+DEFAULT_PROFILE_LIST = Path("lista_med_cic.txt")
+STATE_FILENAME = "estado_incremental.sqlite"
+SCREENING_FILENAME = "cribado_interacciones.tsv"
+SAME_SLOT_FILENAME = "intreacciones_cic_no_depurado.txt"
+WINDOW_FILENAME = "combinaciones_ventana_{label}_noSorted.txt"
+SUMMARY_FILENAME = "resumen_cohorte.tsv"
+PAIR_STATS_FILENAME = "estadisticas_pares.tsv"
+
+PAIR_OUTPUT_TEXT = "text"
+PAIR_OUTPUT_MATRIX = "matrix"
+PAIR_OUTPUT_BOTH = "both"
+PAIR_OUTPUTS = (PAIR_OUTPUT_TEXT, PAIR_OUTPUT_MATRIX, PAIR_OUTPUT_BOTH)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def combine_date_time(date_value, time_value, parser: Optional[TimestampParser] = None) -> datetime:
+    """Convierte valores de fecha y hora en un objeto ``datetime``.
+
+    Se aceptan instancias de ``datetime``, ``date`` y ``time``, números de
+    serie de Excel y los textos que reconoce :mod:`pharmprofile.timestamps`.
+    Lanza ``ValueError`` si alguno de los dos valores no se puede interpretar.
+    """
+
+    from pharmprofile.timestamps import TimestampParser
+
+    timestamp = (parser or TimestampParser()).parse(date_value, time_value)
+    if timestamp is None:
+        raise ValueError(f"No se pudo interpretar la fecha/hora {date_value!r} {time_value!r}")
+    return timestamp
+
+
+def parse_row(row: Row, parser: TimestampParser) -> Optional[MedicationEvent]:
+    """Evento de una fila del plan; ``None`` si falta la fecha, la hora o el paciente.
+
+    La fila de cabecera no se descarta de antemano: no se puede interpretar
+    como fecha y se cuenta en ``parser.failures``, como cualquier otra fila sucia.
+    """
+
+    if row[0] is None or row[1] is None or row[2] is None:
+        return None
+    date_value, time_value, patient, medication_cell = row
+    timestamp = parser.parse(date_value, time_value)
+    if timestamp is None:
+        return None
+    medications = split_medications(str(medication_cell)) if medication_cell else []
+    return MedicationEvent(timestamp=timestamp, patient=str(patient), medications=medications)
+
+
+PROFILE = CompatibilityProfile(
+    name="cic",
+    parse_row=parse_row,
+    skip_header=False,
+    merge_same_second=True,
+    sort_xml_by_time=False,
+    exact_offset=True,
+    forward_only=False,
+    fold_case=False,
+    deduplicate=False,
+    same_slot_pairs=True,
+    offset_includes_same_day=False,
+    match_policy=MATCH_SUBSTRING,
+    first_entry_only=False,
+    pair_with_query=False,
+    lowercase_descriptions=True,
+)
+
+
+def load_schedule(excel_path: Path, sheet_name: str) -> List[MedicationEvent]:
+    """Carga el plan de medicación completo desde un archivo de Excel, CSV o Parquet."""
+
+    return list(iter_medication_events(excel_path, sheet_name))
+
+
+def iter_medication_events(
+    excel_path: Path, sheet_name: str, parser: Optional[TimestampParser] = None
+) -> Iterator[MedicationEvent]:
+    """Lee el plan de medicación fila a fila sin cargar la hoja completa.
+
+    Al terminar se registra en un único aviso cuántas filas se omitieron por
+    no poder interpretar su fecha u hora.
+    """
+
+    from pharmprofile.timestamps import TimestampParser
+
+    LOGGER.info("Leyendo hoja '%s' de %s", sheet_name, excel_path)
+    parser = parser or TimestampParser()
+    events = iter_events(excel_path, sheet_name, PROFILE, parser)
+
+    def counted() -> Iterator[MedicationEvent]:
+        count = 0
+        for event in events:
+            count += 1
+            yield event
+        LOGGER.info("Cargados %s eventos de medicación", count)
+        if parser.failures:
+            LOGGER.warning(
+                "Se omitieron %s filas con fecha/hora no interpretable (p. ej. %s)",
+                parser.failures,
+                parser.describe_failures(),
+            )
+
+    return counted()
+
+
+def iter_patient_schedules(
+    excel_path: Path,
+    sheet_name: str,
+    vocabulary: Vocabulary,
+    grouped: bool = False,
+    parser: Optional[TimestampParser] = None,
+) -> Iterator[PatientSchedule]:
+    """Produce la representación columnar de cada paciente, de uno en uno.
+
+    Los pacientes salen en orden de primera aparición en la hoja. Con
+    ``grouped=True`` se asume que las filas de cada paciente son contiguas.
+    """
+
+    return group_schedules(iter_medication_events(excel_path, sheet_name, parser), vocabulary, grouped=grouped)
+
+
+def build_drug_tree(events: Sequence[MedicationEvent]) -> Element:
+    """Construye el árbol XML con pacientes, fechas y medicamentos."""
+
+    from xml.etree.ElementTree import Comment, Element, SubElement
+
+    root = Element("drug")
+    root.append(Comment(XML_COMMENT))
+
+    patients: dict[str, Element] = {}
+    for event in events:
+        patient = patients.get(event.patient)
+        if patient is None:
+            patient = SubElement(root, event.patient, name=event.patient)
+            patients[event.patient] = patient
+
+        date_key = event.timestamp.strftime("%Y-%m-%d-%H-%M-%S")
+        existing_date = patient.find(date_key)
+        if existing_date is None:
+            existing_date = SubElement(
+                patient,
+                date_key,
+                name=event.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            )
+
+        for med in event.medications:
+            SubElement(existing_date, med, name=med)
+
+    return root
+
+
+def compute_time_window_combinations(
+    schedules: Iterable[PatientSchedule],
+    vocabulary: Vocabulary,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    vectorized: bool = False,
+    windows: Sequence[WindowSpec] = (),
+) -> CombinationResults:
+    """Calcula combinaciones de medicamentos en ventanas de 6h, 24h y 48h.
+
+    Para cada fecha sólo se visitan las fechas del mismo día, las situadas
+    exactamente ``offset_days`` días después y las que caen a menos de
+    ``rolling_hours`` horas. El orden de salida y la precedencia (mismo día,
+    luego desplazamiento exacto, luego ventana móvil) coinciden con el
+    recorrido de todos los pares de fechas. ``same_slot`` reúne los pares de
+    una misma fecha (``intreacciones_cic_no_depurado.txt``). Las ventanas de
+    ``windows`` se calculan en el mismo recorrido y quedan en ``results.windows``.
+    """
+
+    return compute_combinations(schedules, vocabulary, PROFILE, rolling_hours, offset_days, vectorized, windows)
+
+
+def write_combinations(
+    results: CombinationResults,
+    output_dir: Path,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    pair_output: str = PAIR_OUTPUT_TEXT,
+    patient_counts: bool = False,
+    state: Optional[IncrementalState] = None,
+) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [
+        ("combinaciones_24h_noSorted.txt", results.same_day),
+        (f"combinaciones_{offset_days * 24}_noSorted.txt", results.offset),
+        (f"combinaciones_{rolling_hours}_noSorted.txt", results.rolling),
+    ]
+    if results.same_slot is not None:
+        outputs.append((SAME_SLOT_FILENAME, results.same_slot))
+    outputs.extend((WINDOW_FILENAME.format(label=spec.label), pairs) for spec, pairs in results.windows.items())
+    for name, pairs in outputs:
+        _write_pairs(output_dir / name, pairs, pair_output, patient_counts, state)
+
+
+def _write_pairs(
+    path: Path,
+    pairs: PairList,
+    pair_output: str,
+    patient_counts: bool,
+    state: Optional[IncrementalState] = None,
+) -> None:
+    """Escribe la lista de texto, la matriz de conteos (``.npz``) o ambas.
+
+    Con estado incremental, los pares nuevos se suman al acumulado, se
+    añaden al final de la lista de texto existente y la matriz se regenera
+    a partir del acumulado.
+    """
+
+    append = state is not None and not state.fresh
+    if state is not None:
+        state.add_pairs(path.name, pairs)
+    if pair_output in (PAIR_OUTPUT_TEXT, PAIR_OUTPUT_BOTH):
+        _write_list(path, pairs, append)
+    if pair_output in (PAIR_OUTPUT_MATRIX, PAIR_OUTPUT_BOTH):
+        if state is not None:
+            write_count_matrix(path.with_suffix(".npz"), state.pair_counts(path.name))
+        else:
+            write_pair_matrices(path.with_suffix(".npz"), pairs, patient_counts)
+
+
+def _write_list(path: Path, values: Collection[str], append: bool = False) -> None:
+    if append and path.exists():
+        LOGGER.info("Añadiendo %s entradas a %s", len(values), path)
+    else:
+        LOGGER.info("Escribiendo %s entradas en %s", len(values), path)
+    write_lines(path, values, append)
+
+
+def load_profile_list(profile_path: Path) -> List[str]:
+    if not profile_path.exists():
+        LOGGER.warning("No se encontró el archivo de perfil %s", profile_path)
+        return []
+    return [line.strip() for line in profile_path.read_text().splitlines() if line.strip()]
+
+
+def find_drugbank_interactions(
+    profile: Sequence[str],
+    drugbank_xml: Path,
+    index_path: Optional[Path] = None,
+    rebuild_index: bool = False,
+    match_policy: str = MATCH_SUBSTRING,
+    report: Optional[RunReport] = None,
+) -> List[str]:
+    """Busca interacciones de los fármacos del perfil en el índice de DrugBank.
+
+    Con la política por defecto (``substring``) un fármaco del perfil
+    coincide con una entrada cuando su nombre aparece dentro del nombre o de
+    algún sinónimo de ésta; ``exact`` exige igualdad. El índice se compila a
+    partir de ``drugbank_xml`` la primera vez y se reutiliza después.
+    """
+
+    if not profile:
+        return []
+    if not drugbank_xml.exists():
+        LOGGER.warning("No se encontró el archivo DrugBank %s", drugbank_xml)
+        return []
+    from pharmprofile.drugbank_index import DrugBankIndex
+
+    with DrugBankIndex.open(drugbank_xml, index_path, rebuild=rebuild_index) as index:
+        interactions, _ = profile_interactions(index, profile, PROFILE, match_policy, report)
+    return interactions
+
+
+def _write_pair_lists(
+    args: argparse.Namespace, results: CombinationResults, state: Optional[IncrementalState]
+) -> None:
+    write_combinations(
+        results, args.output_dir, args.window_hours, args.offset_days, args.pair_output, args.patient_counts, state
+    )
+
+
+MESSAGES = Messages(
+    no_events="No se encontraron eventos de medicación. Abortando.",
+    missing_drugbank="No se encontró el archivo DrugBank %s; se omite el cribado",
+    pool=(
+        "Combinaciones: %s tareas en %s procesos, %.2fs de cálculo en %.2fs "
+        "(aceleración estimada %.2fx, eficiencia paralela %.0f%%)"
+    ),
+    xml_written="Archivo XML guardado en %s",
+    columnar_written="%s pares de %s pacientes guardados en %s",
+    screening_written="Cribado: %s registros marcados en %s pacientes guardados en %s",
+    window_summary="Ventana %s: %s apariciones de %s pares distintos (±%s) en %s pacientes",
+    top_pairs="Top-%s de pares por ventana (%s, confianza %.3f) guardado en %s",
+    no_sources="No se encontraron planes para el lote. Abortando.",
+    batch_start="Analizando %s planes con %s procesos",
+    source_status="Plan %s (%s, hoja %s): %s",
+    source_failed="No se pudo analizar %s (hoja %s): %s",
+    summary_written="Resumen de %s planes guardado en %s",
+    requires_incremental="{option} requiere --incremental",
+    not_incremental="{option} no está disponible con --incremental",
+    not_positive="--top-k y --pair-stats-memory deben ser positivos",
+    sketch_memory=(
+        "--pair-stats-memory {memory:g} no alcanza para las tablas, registros y búferes "
+        "de {windows} ventanas con --top-k {top_k}; el mínimo es {minimum:.1f} MB"
+    ),
+    missing_modules="{option} requiere módulos no instalados: pip install {modules}",
+)
+
+PIPELINE = Pipeline(
+    profile=PROFILE,
+    read=iter_patient_schedules,
+    write_combinations=_write_pair_lists,
+    messages=MESSAGES,
+    logger=LOGGER,
+    xml_filename="drug.xml",
+    state_filename=STATE_FILENAME,
+    screening_filename=SCREENING_FILENAME,
+    pair_stats_filename=PAIR_STATS_FILENAME,
+    summary_filename=SUMMARY_FILENAME,
+    require_events=True,
+    optional_drugbank=True,
+)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Detectar interacciones medicamento-medicamento")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default=COMMAND_ALL,
+        choices=COMMANDS,
+        help=(
+            "Etapas a ejecutar: ingest (plan y drug.xml), combos (combinaciones, con --screen también el cribado), "
+            "interactions (sólo DrugBank con el perfil), screen (sólo el cribado); por defecto todas"
+        ),
+    )
+    parser.add_argument(
+        "--excel",
+        type=Path,
+        default=DEFAULT_EXCEL_PATH,
+        help="Plan de medicación en Excel, CSV o Parquet (según la extensión)",
+    )
+    parser.add_argument("--sheet", type=str, default=DEFAULT_SHEET_NAME, help="Nombre de la hoja en el Excel")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR, help="Directorio para guardar resultados")
+    parser.add_argument("--drugbank", type=Path, default=DEFAULT_DRUGBANK_XML, help="Archivo XML de DrugBank")
+    parser.add_argument("--profile", type=Path, default=DEFAULT_PROFILE_LIST, help="Lista de medicamentos de interés")
+    parser.add_argument(
+        "--drugbank-index",
+        type=Path,
+        default=None,
+        help="Índice SQLite compilado de DrugBank (por defecto junto al XML)",
+    )
+    parser.add_argument("--rebuild-index", action="store_true", help="Recompilar el índice de DrugBank")
+    parser.add_argument(
+        "--match",
+        type=str,
+        default=MATCH_SUBSTRING,
+        choices=MATCH_POLICIES,
+        help="Política de coincidencia de nombres con DrugBank",
+    )
+    parser.add_argument(
+        "--window-hours",
+        type=int,
+        default=DEFAULT_ROLLING_HOURS,
+        help="Amplitud en horas de la ventana móvil (por defecto ±6h)",
+    )
+    parser.add_argument(
+        "--offset-days",
+        type=int,
+        default=DEFAULT_OFFSET_DAYS,
+        help="Desplazamiento exacto en días para la ventana de 48h",
+    )
+    parser.add_argument(
+        "--window",
+        type=window_spec,
+        action="append",
+        default=[],
+        metavar="VENTANA",
+        help=(
+            "Ventana de exposición adicional, móvil en horas (12h) o en días calendario (7d); se puede repetir. "
+            f"Se escribe en {WINDOW_FILENAME.format(label='<ventana>')}"
+        ),
+    )
+    parser.add_argument(
+        "--pair-output",
+        type=str,
+        default=PAIR_OUTPUT_TEXT,
+        choices=PAIR_OUTPUTS,
+        help="Listas de texto, matrices dispersas de conteo (.npz) o ambas",
+    )
+    parser.add_argument(
+        "--patient-counts",
+        action="store_true",
+        help="Con salida matricial, añadir la matriz de pacientes distintos por par",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Procesos para calcular las combinaciones por paciente, o para los planes del lote (1 = sin paralelismo)",
+    )
+    parser.add_argument(
+        "--batch",
+        action="append",
+        default=[],
+        metavar="PATRÓN",
+        help=(
+            "Analizar por lotes los planes que coinciden con este patrón glob (se puede repetir); cada uno escribe en "
+            f"su subdirectorio de --output-dir y el resumen va a {SUMMARY_FILENAME}. Con --sheet '*', todas las hojas"
+        ),
+    )
+    parser.add_argument(
+        "--batch-manifest",
+        type=Path,
+        default=None,
+        help="Manifiesto del lote: una línea por plan con ruta y, separados por tabuladores, hoja y subdirectorio",
+    )
+    parser.add_argument(
+        "--run-report",
+        type=Path,
+        default=None,
+        help="Guardar un informe JSON con tiempos, memoria y contadores de cada etapa",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Medir con tracemalloc el pico de memoria Python de cada etapa (más lento)",
+    )
+    parser.add_argument(
+        "--profile-run",
+        type=Path,
+        default=None,
+        help="Ejecutar bajo cProfile y guardar las estadísticas en esta ruta (.prof)",
+    )
+    parser.add_argument(
+        "--screen",
+        action="store_true",
+        help=f"Cruzar los pares observados con DrugBank y escribir los marcados en {SCREENING_FILENAME}",
+    )
+    parser.add_argument(
+        "--screen-match",
+        type=str,
+        default=MATCH_EXACT,
+        choices=MATCH_POLICIES,
+        help=(
+            "Política de coincidencia de nombres del cribado; por defecto exacta (sin distinguir mayúsculas) "
+            "para que «aspirin» no herede las interacciones de «Aspirin Plus»; substring sólo a petición expresa"
+        ),
+    )
+    parser.add_argument(
+        "--columnar",
+        type=Path,
+        default=None,
+        help=(
+            "Guardar además cada aparición de un par con paciente, fechas y ventana en Parquet (.parquet) "
+            "o Arrow (otra extensión); requiere pyarrow y numpy"
+        ),
+    )
+    parser.add_argument(
+        "--pair-stats",
+        choices=STATS_MODES,
+        default=None,
+        help=(
+            f"Guardar en {PAIR_STATS_FILENAME} los pares más frecuentes de cada ventana y sus pacientes distintos, "
+            "con conteo exacto o aproximado (Count-Min Sketch y HyperLogLog)"
+        ),
+    )
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Número de pares por ventana en --pair-stats")
+    parser.add_argument(
+        "--pair-stats-memory",
+        type=float,
+        default=DEFAULT_MEMORY_MB,
+        help="Memoria máxima en MB de --pair-stats sketch (tablas, registros, búferes y temporales)",
+    )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Clasificar los pares de fechas por ventana con NumPy (requiere numpy)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Analizar sólo las administraciones nuevas desde la última ejecución (estado en el directorio de salida)",
+    )
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Con --incremental, descartar el estado y recalcular todo",
+    )
+    parser.add_argument(
+        "--grouped-input",
+        action="store_true",
+        help="Las filas de cada paciente son contiguas; evita el volcado temporal para agruparlas",
+    )
+    xml_group = parser.add_mutually_exclusive_group()
+    xml_group.add_argument(
+        "--xml-stream",
+        dest="xml",
+        action="store_true",
+        default=True,
+        help="Exportar drug.xml paciente a paciente (comportamiento por defecto)",
+    )
+    xml_group.add_argument("--no-xml", dest="xml", action="store_false", help="No generar drug.xml")
+    parser.add_argument(
+        "--log-level",
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Nivel de detalle del registro",
+    )
+    args = parser.parse_args()
+    validate_arguments(parser, args, PIPELINE)
+    return args
+
+
+def run_pipeline(args: argparse.Namespace, report: RunReport) -> None:
+    if args.batch or args.batch_manifest is not None:
+        run_batch(args, report, PIPELINE, _write_drugbank_interactions)
+        return
+    if args.command != COMMAND_INTERACTIONS and not analyse_schedule(args, report, PIPELINE):
+        return
+    if args.command in (COMMAND_ALL, COMMAND_INTERACTIONS):
+        _write_drugbank_interactions(args, report)
+
+
+def _write_drugbank_interactions(args: argparse.Namespace, report: RunReport) -> None:
+    with report.stage("drugbank") as stage:
+        profile = load_profile_list(args.profile)
+        drugbank_interactions = find_drugbank_interactions(
+            profile, args.drugbank, args.drugbank_index, args.rebuild_index, args.match, report
+        )
+        stage.counters["interactions"] = len(drugbank_interactions)
+        if drugbank_interactions:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+            _write_list(args.output_dir / "interacciones_drugbank.txt", drugbank_interactions)
+        else:
+            LOGGER.info("No se generó archivo de interacciones DrugBank (sin perfil o archivo faltante)")
+
+
+def main() -> None:
+    args = parse_arguments()
+    logging.basicConfig(level=getattr(logging, args.log_level))
+
+    report = RunReport(args.trace_memory)
+    with profiled(args.profile_run):
+        run_pipeline(args, report)
+    if args.profile_run is not None:
+        LOGGER.info("Perfil cProfile guardado en %s", args.profile_run)
+    if args.run_report is not None:
+        report.write(args.run_report)
+        LOGGER.info("Informe de ejecución guardado en %s", args.run_report)
+
+
+if __name__ == "__main__":
+    main()
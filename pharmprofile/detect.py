@@ -0,0 +1,462 @@
+"""
+Revised Interact_Detect pipeline for generating drug administration combinations
+and detecting DrugBank interactions.
+
+The script processes an Excel file with patient medication administrations,
+constructs an XML tree, emits combination lists for several time windows, and
+cross-references a DrugBank XML export to enumerate known interactions for a
+profile of interest.
+
+This is the implementation behind ``Interact_Detect.py``. The work is done by
+:mod:`pharmprofile.engine` with :data:`PROFILE`, which reproduces this script's
+outputs (sorted unique pairs, calendar-day offsets, exact name matching). The
+stages are wired by :mod:`pharmprofile.pipeline` with :data:`PIPELINE`; this
+module keeps the command line and the list format.
+
+An optional command limits which stages run, and so which modules are
+imported: ``ingest`` reads the schedule and writes ``drug.xml``, ``combos``
+writes the combination lists, ``interactions`` only looks the profile up in
+DrugBank and ``screen`` only screens observed pairs. Without a command the
+whole pipeline runs as before.
+
+``--batch``/``--batch-manifest`` run the schedule stages for many workbooks
+and sheets in a process pool, each into its own subdirectory, with one
+compiled DrugBank index and a merged ``cohort_summary.tsv``
+(:mod:`pharmprofile.batch`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence, Set, Tuple
+
+from pharmprofile.engine import (
+    COMMAND_ALL,
+    COMMAND_INTERACTIONS,
+    COMMANDS,
+    CombinationResults,
+    CompatibilityProfile,
+    MedicationEvent,
+    PatientSchedule,
+    compute_combinations as compute_engine_combinations,
+    group_schedules,
+    iter_events,
+    profile_interactions,
+    split_medications,
+)
+from pharmprofile.name_resolver import MATCH_EXACT, MATCH_POLICIES
+from pharmprofile.pair_stats import DEFAULT_MEMORY_MB, DEFAULT_TOP_K, STATS_MODES
+from pharmprofile.pair_writers import DEFAULT_RUN_SIZE, external_sort, write_lines
+from pharmprofile.pipeline import Messages, Pipeline, analyse_schedule, run_batch, validate_arguments
+from pharmprofile.run_report import RunReport, profiled
+from pharmprofile.vocabulary import PairSet, Vocabulary
+from pharmprofile.window_engine import DEFAULT_OFFSET_DAYS, DEFAULT_ROLLING_HOURS, WindowSpec, window_spec
+
+if TYPE_CHECKING:
+    from pharmprofile.incremental import IncrementalState
+    from pharmprofile.schedule_reader import Row
+    from pharmprofile.timestamps import TimestampParser
+
+
+# Global defaults
+DEFAULT_EXCEL = Path("Med_vs_Tiempo.xlsx")
+DEFAULT_SHEET = "Med_vs_Tiempo (5)"
+DEFAULT_DRUGBANK = Path("drugbank_2.xml")
+DEFAULT_PROFILE = Path("lista_med_cic.txt")
+DEFAULT_OUTPUT_DIR = Path(".")
+XML_FILENAME = "drug.xml"
+OUTPUT_WINDOW = "combinaciones_{hours}h.txt"
+OUTPUT_24H = OUTPUT_WINDOW.format(hours=24)
+OUTPUT_48H = OUTPUT_WINDOW.format(hours=48)
+OUTPUT_6H = OUTPUT_WINDOW.format(hours=6)
+OUTPUT_EXTRA_WINDOW = "combinaciones_ventana_{label}.txt"
+OUTPUT_INTERACTIONS = "interacciones_drugbank.txt"
+STATE_FILENAME = "incremental_state.sqlite"
+OUTPUT_SCREENING = "screening.tsv"
+OUTPUT_SUMMARY = "cohort_summary.tsv"
+OUTPUT_PAIR_STATS = "pair_statistics.tsv"
+
+
+logger = logging.getLogger(__name__)
+
+
+def load_profile(profile_path: Path) -> List[str]:
+    if not profile_path.exists():
+        raise FileNotFoundError(f"Profile file not found: {profile_path}")
+    with profile_path.open("r", encoding="utf-8") as profile_file:
+        medications = [line.strip() for line in profile_file if line.strip()]
+    logger.debug("Loaded %d medications from profile", len(medications))
+    return medications
+
+
+def parse_row(row: Row, parser: TimestampParser) -> MedicationEvent | None:
+    date_cell, time_cell, patient, medication_cell = row
+    if not (date_cell and time_cell and patient and medication_cell):
+        logger.debug("Skipping incomplete row: %s", row)
+        return None
+
+    # Distinct date and time cells are parsed once; unrecognized ones are counted by the parser.
+    timestamp = parser.parse(date_cell, time_cell)
+    if timestamp is None:
+        return None
+    return MedicationEvent(timestamp, str(patient), split_medications(str(medication_cell)))
+
+
+PROFILE = CompatibilityProfile(
+    name="detect",
+    parse_row=parse_row,
+    skip_header=True,
+    merge_same_second=False,
+    sort_xml_by_time=True,
+    exact_offset=False,
+    forward_only=True,
+    fold_case=True,
+    deduplicate=True,
+    same_slot_pairs=False,
+    offset_includes_same_day=True,
+    match_policy=MATCH_EXACT,
+    first_entry_only=True,
+    pair_with_query=True,
+    lowercase_descriptions=False,
+)
+
+
+def iter_patient_schedules(
+    excel_path: Path,
+    sheet_name: str,
+    vocabulary: Vocabulary,
+    grouped: bool = False,
+    parser: TimestampParser | None = None,
+) -> Iterator[PatientSchedule]:
+    from pharmprofile.timestamps import TimestampParser
+
+    # Every row is its own administration; medications are interned as they are read.
+    parser = parser or TimestampParser()
+    schedules = group_schedules(iter_events(excel_path, sheet_name, PROFILE, parser), vocabulary, False, grouped)
+
+    def counted() -> Iterator[PatientSchedule]:
+        count = 0
+        for schedule in schedules:
+            count += 1
+            yield schedule
+        logger.info("Loaded administrations for %d patients", count)
+        if parser.failures:
+            logger.warning(
+                "Skipped %d rows with unrecognized date/time values (e.g. %s)",
+                parser.failures,
+                parser.describe_failures(),
+            )
+
+    return counted()
+
+
+def load_schedules(excel_path: Path, sheet_name: str, vocabulary: Vocabulary) -> List[PatientSchedule]:
+    return list(iter_patient_schedules(excel_path, sheet_name, vocabulary))
+
+
+def compute_combinations(
+    schedules: Iterable[PatientSchedule],
+    vocabulary: Vocabulary,
+    window_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    vectorized: bool = False,
+) -> Tuple[PairSet, PairSet, PairSet]:
+    results = compute_engine_combinations(schedules, vocabulary, PROFILE, window_hours, offset_days, vectorized)
+    return results.same_day, results.offset, results.rolling
+
+
+def compute_window_combinations(
+    schedules: Iterable[PatientSchedule],
+    vocabulary: Vocabulary,
+    windows: Sequence[WindowSpec],
+    window_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+) -> CombinationResults:
+    # The standard lists and every extra window come out of one sweep per patient.
+    return compute_engine_combinations(schedules, vocabulary, PROFILE, window_hours, offset_days, windows=windows)
+
+
+def write_list(output_path: Path, values: Iterable[str], run_size: int = DEFAULT_RUN_SIZE) -> None:
+    # Sorted in runs of at most run_size lines, merged from temporary files when there is more than one.
+    write_lines(output_path, external_sort(values, run_size), encoding="utf-8")
+    logger.info("Wrote %s", output_path)
+
+
+def find_interactions(
+    drugbank_path: Path,
+    profile: Sequence[str],
+    index_path: Path | None = None,
+    rebuild_index: bool = False,
+    match_policy: str = MATCH_EXACT,
+    report: RunReport | None = None,
+) -> Tuple[Set[str], Set[str]]:
+    if not drugbank_path.exists():
+        raise FileNotFoundError(f"DrugBank XML not found: {drugbank_path}")
+    from pharmprofile.drugbank_index import DrugBankIndex
+
+    with DrugBankIndex.open(drugbank_path, index_path, rebuild=rebuild_index) as index:
+        interactions, not_found = profile_interactions(index, profile, PROFILE, match_policy, report)
+    return set(interactions), not_found
+
+
+def configure_logging(verbose: bool) -> None:
+    level = logging.DEBUG if verbose else logging.INFO
+    logging.basicConfig(level=level, format="%(asctime)s [%(levelname)s] %(message)s")
+
+
+def write_combinations(
+    args: argparse.Namespace, combinations: CombinationResults, state: IncrementalState | None = None
+) -> None:
+    outputs = (
+        (OUTPUT_24H, combinations.same_day),
+        (OUTPUT_WINDOW.format(hours=args.offset_days * 24), combinations.offset),
+        (OUTPUT_WINDOW.format(hours=args.window_hours), combinations.rolling),
+    ) + tuple((OUTPUT_EXTRA_WINDOW.format(label=spec.label), pairs) for spec, pairs in combinations.windows.items())
+    if state is None:
+        for name, combos in outputs:
+            write_list(args.output_dir / name, combos, args.sort_run_size)
+        return
+    # New pairs are merged into the stored sets and every list is rewritten from them.
+    for name, combos in outputs:
+        state.add_pairs(name, combos)
+        write_list(args.output_dir / name, (pair for pair, _ in state.pair_counts(name)), args.sort_run_size)
+
+
+MESSAGES = Messages(
+    no_events="No medication events found",
+    missing_drugbank="DrugBank XML not found: %s",
+    pool=(
+        "Combinations: %d tasks on %d workers, %.2fs compute in %.2fs wall "
+        "(estimated speedup %.2fx, parallel efficiency %.0f%%)"
+    ),
+    xml_written="Wrote %s",
+    columnar_written="Wrote %d pair occurrences for %d patients to %s",
+    screening_written="Screening: %d flagged records for %d patients written to %s",
+    window_summary="Window %s: %d occurrences of %d distinct pairs (±%d) in %d patients",
+    top_pairs="Top %d pairs per window (%s, confidence %.3f) written to %s",
+    no_sources="No schedules matched the batch patterns or manifest",
+    batch_start="Analysing %d schedules on %d workers",
+    source_status="Schedule %s (%s, sheet %s): %s",
+    source_failed="Failed to process %s (sheet %s): %s",
+    summary_written="Wrote the summary of %d schedules to %s",
+    requires_incremental="{option} requires --incremental",
+    not_incremental="{option} is not available with --incremental",
+    not_positive="--top-k and --pair-stats-memory must be positive",
+    sketch_memory=(
+        "--pair-stats-memory {memory:g} cannot hold the tables, registers and buffers "
+        "of {windows} windows with --top-k {top_k}; the minimum is {minimum:.1f} MB"
+    ),
+    missing_modules="{option} requires modules that are not installed: pip install {modules}",
+)
+
+# Empty schedules still write empty lists, and a missing DrugBank fails screening, as the original script did.
+PIPELINE = Pipeline(
+    profile=PROFILE,
+    read=iter_patient_schedules,
+    write_combinations=write_combinations,
+    messages=MESSAGES,
+    logger=logger,
+    xml_filename=XML_FILENAME,
+    state_filename=STATE_FILENAME,
+    screening_filename=OUTPUT_SCREENING,
+    pair_stats_filename=OUTPUT_PAIR_STATS,
+    summary_filename=OUTPUT_SUMMARY,
+    require_events=False,
+    optional_drugbank=False,
+)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate drug combinations and DrugBank interactions")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default=COMMAND_ALL,
+        choices=COMMANDS,
+        help=(
+            "Stages to run: ingest (schedule and drug.xml), combos (combination lists, plus screening with --screen), "
+            "interactions (DrugBank lookups for the profile only), screen (screening only); default: all"
+        ),
+    )
+    parser.add_argument(
+        "--excel", type=Path, default=DEFAULT_EXCEL, help="Path to the Med_vs_Tiempo schedule (.xlsx, .csv or .parquet)"
+    )
+    parser.add_argument("--sheet", default=DEFAULT_SHEET, help="Worksheet name inside the Excel file")
+    parser.add_argument("--drugbank", type=Path, default=DEFAULT_DRUGBANK, help="Path to DrugBank XML export")
+    parser.add_argument("--profile", type=Path, default=DEFAULT_PROFILE, help="Text file with one medication per line")
+    parser.add_argument(
+        "--drugbank-index", type=Path, default=None, help="Compiled SQLite DrugBank index (default: next to the XML)"
+    )
+    parser.add_argument("--rebuild-index", action="store_true", help="Recompile the DrugBank index")
+    parser.add_argument(
+        "--match", default=MATCH_EXACT, choices=MATCH_POLICIES, help="How profile names are matched against DrugBank"
+    )
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR, help="Directory to write outputs")
+    parser.add_argument(
+        "--window-hours", type=int, default=DEFAULT_ROLLING_HOURS, help="Width in hours of the rolling window (default 6)"
+    )
+    parser.add_argument(
+        "--offset-days", type=int, default=DEFAULT_OFFSET_DAYS, help="Calendar-day offset for the 48h list (default 2)"
+    )
+    parser.add_argument(
+        "--window",
+        type=window_spec,
+        action="append",
+        default=[],
+        metavar="SPEC",
+        help=(
+            "Extra exposure window, rolling hours (12h) or calendar days (7d); repeatable. "
+            f"Written to {OUTPUT_EXTRA_WINDOW.format(label='<spec>')}"
+        ),
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes for combination analysis, or for the batch schedules"
+    )
+    parser.add_argument(
+        "--batch",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help=(
+            "Analyse every schedule matching this glob pattern (repeatable), each into its own subdirectory of "
+            f"--output-dir, and write {OUTPUT_SUMMARY}; --sheet '*' means every sheet"
+        ),
+    )
+    parser.add_argument(
+        "--batch-manifest",
+        type=Path,
+        default=None,
+        help="Batch manifest: one schedule per line, path then optional tab-separated sheet and subdirectory",
+    )
+    parser.add_argument(
+        "--grouped-input", action="store_true", help="Rows of each patient are contiguous; skip the temporary spill"
+    )
+    parser.add_argument("--run-report", type=Path, default=None, help="Write a JSON report of per-stage timings")
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="Track per-stage Python peak memory with tracemalloc (slower)"
+    )
+    parser.add_argument("--profile-run", type=Path, default=None, help="Run under cProfile and dump stats to this path")
+    parser.add_argument(
+        "--screen",
+        action="store_true",
+        help=f"Join observed pairs against DrugBank and write flagged records to {OUTPUT_SCREENING}",
+    )
+    parser.add_argument(
+        "--screen-match",
+        default=MATCH_EXACT,
+        choices=MATCH_POLICIES,
+        help="How schedule names are matched against DrugBank when screening (default: exact, case-insensitive)",
+    )
+    parser.add_argument(
+        "--columnar",
+        type=Path,
+        default=None,
+        help=(
+            "Also write every pair occurrence with patient, times and window to .parquet or Arrow "
+            "(requires pyarrow and numpy)"
+        ),
+    )
+    parser.add_argument(
+        "--pair-stats",
+        choices=STATS_MODES,
+        default=None,
+        help=(
+            f"Write the top pairs of each window with their distinct patients to {OUTPUT_PAIR_STATS}, "
+            "counted exactly or approximately (Count-Min Sketch and HyperLogLog)"
+        ),
+    )
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Pairs per window for --pair-stats")
+    parser.add_argument(
+        "--pair-stats-memory",
+        type=float,
+        default=DEFAULT_MEMORY_MB,
+        help="Memory cap in MB for --pair-stats sketch (tables, registers, buffers and temporaries)",
+    )
+    parser.add_argument(
+        "--sort-run-size",
+        type=int,
+        default=DEFAULT_RUN_SIZE,
+        help="Lines sorted in memory at a time; longer lists are merged from temporary files",
+    )
+    parser.add_argument(
+        "--vectorized", action="store_true", help="Bucket administration pairs by window with NumPy (requires numpy)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only analyse administrations added since the previous run (state kept in the output directory)",
+    )
+    parser.add_argument("--full-rebuild", action="store_true", help="With --incremental, discard the state first")
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args(argv)
+    validate_arguments(parser, args, PIPELINE)
+    return args
+
+
+def run_pipeline(args: argparse.Namespace, report: RunReport) -> int:
+    if args.batch or args.batch_manifest is not None:
+        return run_batch(args, report, PIPELINE, _write_batch_interactions)
+    lookup = args.command in (COMMAND_ALL, COMMAND_INTERACTIONS)
+    try:
+        profile = load_profile(args.profile) if lookup else []
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("Failed to load inputs: %s", exc)
+        return 1
+
+    if args.command != COMMAND_INTERACTIONS:
+        try:
+            analyse_schedule(args, report, PIPELINE)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error("Failed to process schedule: %s", exc)
+            return 1
+    if not lookup:
+        return 0
+    return _write_interactions(args, profile, report)
+
+
+def _write_batch_interactions(args: argparse.Namespace, report: RunReport) -> int:
+    # Profile interactions do not depend on the schedule, so they are written once for the whole batch.
+    try:
+        profile = load_profile(args.profile)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("Failed to load inputs: %s", exc)
+        return 1
+    return _write_interactions(args, profile, report)
+
+
+def _write_interactions(args: argparse.Namespace, profile: Sequence[str], report: RunReport) -> int:
+    try:
+        with report.stage("drugbank") as stage:
+            interactions, not_found = find_interactions(
+                args.drugbank, profile, args.drugbank_index, args.rebuild_index, args.match, report
+            )
+            stage.counters["interactions"] = len(interactions)
+            write_list(args.output_dir / OUTPUT_INTERACTIONS, interactions, args.sort_run_size)
+        if not_found:
+            logger.warning("Medications not found in DrugBank: %s", ", ".join(sorted(not_found)))
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("Failed to evaluate DrugBank interactions: %s", exc)
+        return 1
+    return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    configure_logging(args.verbose)
+
+    report = RunReport(args.trace_memory)
+    with profiled(args.profile_run):
+        status = run_pipeline(args, report)
+    if args.profile_run is not None:
+        logger.info("Wrote cProfile stats to %s", args.profile_run)
+    if args.run_report is not None:
+        report.write(args.run_report)
+        logger.info("Wrote run report to %s", args.run_report)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""Índice compilado de DrugBank almacenado en SQLite.
+
+El XML de DrugBank supera el gigabyte, por lo que analizarlo en cada
+ejecución domina el tiempo total. Este módulo lo compila una sola vez en una
+base SQLite junto al XML, con los nombres y sinónimos normalizados como
+claves y las listas de interacciones de cada fármaco. Las ejecuciones
+posteriores abren el índice directamente y sólo lo reconstruyen cuando cambia
+la fecha de modificación del XML y, además, su huella SHA-256.
+
+También puede usarse como paso de compilación independiente::
+
+    python -m pharmprofile.drugbank_index drugbank_2.xml
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from pharmprofile.run_report import peak_rss_mb
+
+if TYPE_CHECKING:
+    import xml.etree.ElementTree as ET
+
+INDEX_VERSION = "2"
+INDEX_SUFFIX = ".index.sqlite"
+_HASH_CHUNK = 1 << 20
+GRAM_SIZE = 3
+
+LOGGER = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE drugs (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE synonyms (drug_id INTEGER NOT NULL, position INTEGER NOT NULL, synonym TEXT NOT NULL);
+CREATE TABLE keys (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE names (key_id INTEGER NOT NULL, drug_id INTEGER NOT NULL);
+CREATE TABLE grams (gram TEXT NOT NULL, key_id INTEGER NOT NULL, PRIMARY KEY (gram, key_id)) WITHOUT ROWID;
+CREATE TABLE interactions (
+    drug_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    partner TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX names_key ON names (key_id, drug_id);
+CREATE INDEX synonyms_drug ON synonyms (drug_id, position);
+CREATE INDEX interactions_drug ON interactions (drug_id, position);
+"""
+
+
+@dataclass
+class DrugBankEntry:
+    """Datos de un ``<drug>`` de DrugBank tal como aparecen en el XML."""
+
+    name: str
+    synonyms: List[str] = field(default_factory=list)
+    interactions: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def default_index_path(drugbank_xml: Path) -> Path:
+    return drugbank_xml.with_name(drugbank_xml.name + INDEX_SUFFIX)
+
+
+def normalize_name(name: str) -> str:
+    return name.lower()
+
+
+def name_grams(key: str) -> List[str]:
+    """Subcadenas distintas de ``GRAM_SIZE`` caracteres de una clave normalizada."""
+
+    return sorted({key[i : i + GRAM_SIZE] for i in range(len(key) - GRAM_SIZE + 1)})
+
+
+def _namespace_prefix(tag: str) -> str:
+    if tag.startswith("{"):
+        return tag.split("}")[0] + "}"
+    return ""
+
+
+def iter_drugbank_entries(drugbank_xml: Path) -> Iterator[DrugBankEntry]:
+    """Recorre en streaming las entradas ``<drug>`` de primer nivel del XML.
+
+    Se usa :func:`xml.etree.ElementTree.iterparse` y se vacía la raíz tras
+    cada elemento de primer nivel, de modo que en memoria sólo vive un
+    ``<drug>`` a la vez y el consumo no crece con el tamaño del archivo.
+    """
+
+    # El analizador XML sólo hace falta al compilar el índice.
+    import xml.etree.ElementTree as ET
+
+    root: Optional[ET.Element] = None
+    ns = ""
+    depth = 0
+    for event, element in ET.iterparse(drugbank_xml, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+                ns = _namespace_prefix(element.tag)
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            if element.tag == f"{ns}drug":
+                yield _entry_from_element(element, ns)
+            root.clear()
+
+
+def _entry_from_element(element: ET.Element, ns: str) -> DrugBankEntry:
+    name = element.findtext(f"{ns}name", default="") or ""
+    synonyms = [syn.text for syn in element.findall(f"{ns}synonyms/{ns}synonym") if syn.text]
+    interactions = [
+        (
+            node.findtext(f"{ns}name", default="") or "",
+            node.findtext(f"{ns}description", default="") or "",
+        )
+        for node in element.findall(f"{ns}drug-interactions/{ns}drug-interaction")
+    ]
+    return DrugBankEntry(name=name, synonyms=synonyms, interactions=interactions)
+
+
+def _file_sha256(path: Path) -> str:
+    import hashlib
+
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(drugbank_xml: Path) -> Dict[str, str]:
+    stat = drugbank_xml.stat()
+    return {"mtime_ns": str(stat.st_mtime_ns), "size": str(stat.st_size)}
+
+
+class DrugBankIndex:
+    """Acceso de sólo lectura a un índice de DrugBank ya compilado."""
+
+    def __init__(self, index_path: Path) -> None:
+        self.path = index_path
+        self._connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "DrugBankIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @classmethod
+    def open(cls, drugbank_xml: Path, index_path: Optional[Path] = None, rebuild: bool = False) -> "DrugBankIndex":
+        """Abre el índice de ``drugbank_xml`` compilándolo si falta o está desactualizado."""
+
+        index_path = index_path or default_index_path(drugbank_xml)
+        if rebuild or not _index_is_current(drugbank_xml, index_path):
+            compile_index(drugbank_xml, index_path)
+        return cls(index_path)
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM drugs").fetchone()[0]
+
+    def drug_names(self) -> List[str]:
+        """Nombres de todas las entradas, en el orden del XML."""
+
+        return [name for (name,) in self._connection.execute("SELECT name FROM drugs ORDER BY id")]
+
+    def name(self, drug_id: int) -> str:
+        return self._connection.execute("SELECT name FROM drugs WHERE id = ?", (drug_id,)).fetchone()[0]
+
+    def synonyms(self, drug_id: int) -> List[str]:
+        rows = self._connection.execute(
+            "SELECT synonym FROM synonyms WHERE drug_id = ? ORDER BY position", (drug_id,)
+        )
+        return [synonym for (synonym,) in rows]
+
+    def interactions(self, drug_id: int) -> List[Tuple[str, str]]:
+        """Pares ``(nombre_contraparte, descripción)`` en el orden del XML."""
+
+        rows = self._connection.execute(
+            "SELECT partner, description FROM interactions WHERE drug_id = ? ORDER BY position", (drug_id,)
+        )
+        return [(partner, description) for partner, description in rows]
+
+    def exact_matches(self, key: str) -> List[int]:
+        """Fármacos cuyo nombre o algún sinónimo normalizado es igual a ``key``."""
+
+        rows = self._connection.execute(
+            "SELECT DISTINCT names.drug_id FROM keys JOIN names ON names.key_id = keys.id "
+            "WHERE keys.key = ? ORDER BY names.drug_id",
+            (normalize_name(key),),
+        )
+        return [drug_id for (drug_id,) in rows]
+
+    def substring_matches(self, fragment: str) -> List[int]:
+        """Fármacos cuyo nombre o algún sinónimo normalizado contiene ``fragment``.
+
+        Los candidatos salen del índice de trigramas (claves que contienen
+        todos los trigramas de ``fragment``) y después se verifican con
+        ``instr``; sólo los fragmentos más cortos que un trigrama recorren
+        todas las claves.
+        """
+
+        fragment = normalize_name(fragment)
+        grams = name_grams(fragment)
+        if not grams:
+            candidates = "SELECT id FROM keys"
+            params: List[str] = [fragment]
+        else:
+            placeholders = ", ".join("?" for _ in grams)
+            candidates = (
+                f"SELECT key_id FROM grams WHERE gram IN ({placeholders}) "
+                "GROUP BY key_id HAVING COUNT(*) = ?"
+            )
+            params = [*grams, len(grams), fragment]
+        rows = self._connection.execute(
+            "SELECT DISTINCT names.drug_id FROM keys JOIN names ON names.key_id = keys.id "
+            f"WHERE keys.id IN ({candidates}) AND instr(keys.key, ?) > 0 ORDER BY names.drug_id",
+            params,
+        )
+        return [drug_id for (drug_id,) in rows]
+
+
+def _read_meta(index_path: Path) -> Dict[str, str]:
+    connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        return dict(connection.execute("SELECT key, value FROM meta"))
+    finally:
+        connection.close()
+
+
+def _index_is_current(drugbank_xml: Path, index_path: Path) -> bool:
+    if not index_path.exists():
+        return False
+    try:
+        meta = _read_meta(index_path)
+    except sqlite3.DatabaseError as exc:
+        LOGGER.warning("Índice DrugBank ilegible en %s (%s); se reconstruirá", index_path, exc)
+        return False
+    if meta.get("version") != INDEX_VERSION:
+        return False
+
+    fingerprint = _source_fingerprint(drugbank_xml)
+    if all(meta.get(key) == value for key, value in fingerprint.items()):
+        return True
+
+    # Cambió la fecha de modificación: sólo se reconstruye si cambió el contenido.
+    if meta.get("sha256") != _file_sha256(drugbank_xml):
+        return False
+    connection = sqlite3.connect(index_path)
+    try:
+        with connection:
+            connection.executemany("REPLACE INTO meta (key, value) VALUES (?, ?)", fingerprint.items())
+    finally:
+        connection.close()
+    LOGGER.info("Índice DrugBank %s sigue vigente (mismo contenido)", index_path)
+    return True
+
+
+def compile_index(drugbank_xml: Path, index_path: Optional[Path] = None) -> Path:
+    """Compila ``drugbank_xml`` en un índice SQLite y devuelve su ruta."""
+
+    index_path = index_path or default_index_path(drugbank_xml)
+    LOGGER.info("Compilando índice DrugBank %s -> %s", drugbank_xml, index_path)
+    fingerprint = _source_fingerprint(drugbank_xml)
+    fingerprint["sha256"] = _file_sha256(drugbank_xml)
+    fingerprint["version"] = INDEX_VERSION
+    fingerprint["source"] = str(drugbank_xml)
+
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(_SCHEMA)
+        count = _store_entries(connection, iter_drugbank_entries(drugbank_xml))
+        connection.executescript(_INDEXES)
+        connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", fingerprint.items())
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, index_path)
+    LOGGER.info("Índice DrugBank con %s fármacos guardado en %s", count, index_path)
+    peak = peak_rss_mb()
+    if peak is not None:
+        LOGGER.info("Memoria residente máxima del proceso: %.1f MB", peak)
+    return index_path
+
+
+def _store_entries(connection: sqlite3.Connection, entries: Iterable[DrugBankEntry]) -> int:
+    count = 0
+    for drug_id, entry in enumerate(entries):
+        connection.execute("INSERT INTO drugs (id, name) VALUES (?, ?)", (drug_id, entry.name))
+        connection.executemany(
+            "INSERT INTO synonyms (drug_id, position, synonym) VALUES (?, ?, ?)",
+            [(drug_id, position, synonym) for position, synonym in enumerate(entry.synonyms)],
+        )
+        keys = {normalize_name(value) for value in [entry.name, *entry.synonyms] if value}
+        for key in keys:
+            connection.execute("INSERT INTO names (key_id, drug_id) VALUES (?, ?)", (_key_id(connection, key), drug_id))
+        connection.executemany(
+            "INSERT INTO interactions (drug_id, position, partner, description) VALUES (?, ?, ?, ?)",
+            [(drug_id, position, partner, description) for position, (partner, description) in enumerate(entry.interactions)],
+        )
+        count += 1
+    return count
+
+
+def _key_id(connection: sqlite3.Connection, key: str) -> int:
+    cursor = connection.execute("INSERT OR IGNORE INTO keys (key) VALUES (?)", (key,))
+    if cursor.rowcount:
+        key_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO grams (gram, key_id) VALUES (?, ?)", [(gram, key_id) for gram in name_grams(key)]
+        )
+        return key_id
+    return connection.execute("SELECT id FROM keys WHERE key = ?", (key,)).fetchone()[0]
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compilar el XML de DrugBank en un índice SQLite")
+    parser.add_argument("drugbank", type=Path, help="Archivo XML de DrugBank")
+    parser.add_argument("--index", type=Path, default=None, help="Ruta del índice (por defecto junto al XML)")
+    parser.add_argument("--force", action="store_true", help="Reconstruir aunque el índice esté vigente")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Medir con tracemalloc el pico de memoria Python de la compilación (más lento)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.trace_memory:
+        import tracemalloc
+
+        tracemalloc.start()
+    DrugBankIndex.open(args.drugbank, args.index, rebuild=args.force).close()
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        LOGGER.info("Pico de memoria Python durante la compilación: %.1f MB", peak / (1024 * 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,894 @@
+"""Motor común de análisis de coadministraciones.
+
+``drug_drug_interact_cic.py`` e ``Interact_Detect.py`` leen el mismo plan de
+medicación, exportan el mismo ``drug.xml``, combinan administraciones por las
+mismas ventanas y buscan interacciones en el mismo índice de DrugBank, pero
+difieren en detalles que cambian sus salidas. Este módulo implementa cada
+etapa una sola vez y recibe esas diferencias como un
+:class:`CompatibilityProfile`; :mod:`pharmprofile.cic` y
+:mod:`pharmprofile.detect` definen el perfil de cada script y conservan sólo
+su interfaz de línea de órdenes, sus mensajes y la escritura de sus archivos.
+
+El recorrido es paciente a paciente: :func:`iter_patient_schedules` produce
+la representación columnar de cada paciente y :func:`analyse` la pasa por la
+exportación XML, el cribado, la salida columnar, la selección incremental y
+el cálculo de combinaciones (en serie o en varios procesos) antes de leer el
+siguiente. Con estadísticas de cohorte (:mod:`pharmprofile.pair_stats`) las
+combinaciones de cada paciente se calculan aparte, se cuentan y se suman al
+total.
+
+Las dependencias de cada etapa (escritura XML, procesos, estado incremental,
+cribado) se importan al usarla, de modo que las órdenes que sólo leen el plan
+o sólo consultan DrugBank no pagan la importación de las demás.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from operator import attrgetter
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from pharmprofile.vocabulary import PairList, PairSet, Vocabulary
+from pharmprofile.window_engine import (
+    DEFAULT_OFFSET_DAYS,
+    DEFAULT_ROLLING_HOURS,
+    SortedTimeline,
+    WindowSpec,
+    bucket_pairs,
+    days_to_microseconds,
+    hours_to_microseconds,
+    widest_horizon,
+)
+
+if TYPE_CHECKING:
+    from pharmprofile.drugbank_index import DrugBankIndex
+    from pharmprofile.incremental import IncrementalState
+    from pharmprofile.pair_stats import PairStatistics
+    from pharmprofile.pair_writers import ColumnarPairWriter
+    from pharmprofile.parallel import PoolStats
+    from pharmprofile.run_report import RunReport
+    from pharmprofile.schedule_reader import Row
+    from pharmprofile.screening import Screening
+    from pharmprofile.timestamps import TimestampParser
+
+XML_COMMENT = "Relacion med_med por paciente por fecha"
+
+# Órdenes de línea de órdenes comunes a ambos scripts; sin orden se ejecuta todo.
+COMMAND_ALL = "all"
+COMMAND_INGEST = "ingest"
+COMMAND_COMBOS = "combos"
+COMMAND_INTERACTIONS = "interactions"
+COMMAND_SCREEN = "screen"
+COMMANDS = (COMMAND_ALL, COMMAND_INGEST, COMMAND_COMBOS, COMMAND_INTERACTIONS, COMMAND_SCREEN)
+
+PairCollection = Union[PairList, PairSet]
+
+
+@dataclass
+class MedicationEvent:
+    """Representa la administración de un medicamento en una fecha concreta."""
+
+    timestamp: datetime
+    patient: str
+    medications: List[str]
+
+
+@dataclass(frozen=True)
+class CompatibilityProfile:
+    """Comportamiento que distingue las salidas de cada script.
+
+    Lectura:
+
+    ``parse_row``
+        Convierte una fila de cuatro columnas en un evento o ``None`` si se
+        descarta; recibe el :class:`TimestampParser` de la lectura.
+    ``skip_header``
+        Descartar la primera fila de Excel y CSV.
+    ``merge_same_second``
+        Acumular en una sola posición los eventos del paciente con la misma
+        fecha al segundo; sin ello cada fila es una administración.
+    ``sort_xml_by_time``
+        Escribir las fechas de ``drug.xml`` en orden cronológico en lugar de
+        en orden de aparición.
+
+    Combinaciones:
+
+    ``exact_offset``
+        La ventana de desplazamiento exige exactamente ``offset_days`` días
+        entre instantes; sin ello basta con la diferencia de días calendario.
+    ``forward_only``
+        Visitar cada par de administraciones una sola vez, de la anterior a la
+        posterior; sin ello se visitan todos los pares ordenados, incluida cada
+        administración consigo misma.
+    ``fold_case``
+        Descartar los pares de medicamentos iguales salvo mayúsculas; sin ello
+        sólo los idénticos.
+    ``deduplicate``
+        Guardar pares distintos (:class:`PairSet`) en lugar de cada aparición
+        (:class:`PairList`).
+    ``same_slot_pairs``
+        Reunir además los pares de medicamentos de una misma administración.
+    ``offset_includes_same_day``
+        Añadir los pares del mismo día a la ventana de desplazamiento.
+
+    DrugBank:
+
+    ``match_policy``
+        Política de coincidencia por defecto (:mod:`pharmprofile.name_resolver`).
+    ``first_entry_only``
+        Usar sólo la primera entrada con nombre que coincide con cada fármaco
+        del perfil; sin ello, todas.
+    ``pair_with_query``
+        Formar el par con el nombre del perfil; sin ello, con el de la entrada.
+    ``lowercase_descriptions``
+        Pasar las descripciones a minúsculas; sin ello se recortan los
+        espacios y se descartan las vacías.
+    """
+
+    name: str
+    parse_row: Callable[[Row, TimestampParser], Optional[MedicationEvent]]
+    skip_header: bool
+    merge_same_second: bool
+    sort_xml_by_time: bool
+    exact_offset: bool
+    forward_only: bool
+    fold_case: bool
+    deduplicate: bool
+    same_slot_pairs: bool
+    offset_includes_same_day: bool
+    match_policy: str
+    first_entry_only: bool
+    pair_with_query: bool
+    lowercase_descriptions: bool
+
+
+@dataclass
+class PatientSchedule:
+    """Representación columnar de los eventos de un paciente.
+
+    ``timestamps[i]`` y ``medications[i]`` describen la i-ésima administración
+    en orden de aparición. Con ``merge_same_second`` los eventos con la misma
+    fecha (al segundo) se acumulan en la misma posición, igual que los nodos
+    de ``drug.xml``.
+
+    En el modo incremental ``new`` indica qué fechas son nuevas; sólo se
+    generan pares en los que interviene al menos una de ellas.
+    """
+
+    patient: str
+    timestamps: List[datetime] = field(default_factory=list)
+    medications: List[List[int]] = field(default_factory=list)
+    new: Optional[List[bool]] = None
+
+
+def split_medications(value: str) -> List[str]:
+    """Separa combinaciones de medicamentos indicadas con guiones bajos."""
+
+    return [med.strip() for med in value.split("_") if med.strip()]
+
+
+def build_schedule(
+    events: Iterable[MedicationEvent], vocabulary: Vocabulary, merge_same_second: bool = True
+) -> List[PatientSchedule]:
+    """Agrupa los eventos por paciente (y fecha, con ``merge_same_second``) internando los medicamentos."""
+
+    patients: dict[str, PatientSchedule] = {}
+    slots: dict[Tuple[str, datetime], List[int]] = {}
+    for event in events:
+        schedule = patients.get(event.patient)
+        if schedule is None:
+            schedule = patients[event.patient] = PatientSchedule(event.patient)
+
+        if not merge_same_second:
+            schedule.timestamps.append(event.timestamp)
+            schedule.medications.append(vocabulary.intern_all(event.medications))
+            continue
+        timestamp = event.timestamp.replace(microsecond=0)
+        meds = slots.get((event.patient, timestamp))
+        if meds is None:
+            meds = slots[(event.patient, timestamp)] = []
+            schedule.timestamps.append(timestamp)
+            schedule.medications.append(meds)
+        meds.extend(vocabulary.intern_all(event.medications))
+
+    return list(patients.values())
+
+
+def iter_events(
+    path: Path,
+    sheet_name: Optional[str],
+    profile: CompatibilityProfile,
+    parser: Optional[TimestampParser] = None,
+) -> Iterator[MedicationEvent]:
+    """Eventos válidos del plan en orden de fila.
+
+    Como :func:`schedule_reader.iter_schedule_rows`, comprueba el archivo y la
+    hoja al llamarla y no al empezar a iterar. ``parser`` memoiza las fechas y
+    horas y cuenta las filas que no se pudieron interpretar.
+    """
+
+    from pharmprofile.schedule_reader import iter_schedule_rows
+    from pharmprofile.timestamps import TimestampParser
+
+    parser = parser or TimestampParser()
+    rows = iter_schedule_rows(path, sheet_name, profile.skip_header)
+    parse_row = profile.parse_row
+    return (event for event in (parse_row(row, parser) for row in rows) if event is not None)
+
+
+def group_schedules(
+    events: Iterable[MedicationEvent],
+    vocabulary: Vocabulary,
+    merge_same_second: bool = True,
+    grouped: bool = False,
+) -> Iterator[PatientSchedule]:
+    """Reparte los eventos por paciente y produce la representación columnar de cada uno.
+
+    Los pacientes salen en orden de primera aparición. Con ``grouped=True``
+    se asume que los eventos de cada paciente son contiguos.
+    """
+
+    from pharmprofile.schedule_reader import group_by_patient
+
+    for _, patient_events in group_by_patient(events, attrgetter("patient"), grouped):
+        yield from build_schedule(patient_events, vocabulary, merge_same_second)
+
+
+def iter_patient_schedules(
+    path: Path,
+    sheet_name: Optional[str],
+    vocabulary: Vocabulary,
+    profile: CompatibilityProfile,
+    grouped: bool = False,
+    parser: Optional[TimestampParser] = None,
+) -> Iterator[PatientSchedule]:
+    """Lee el plan y produce cada paciente según ``profile``, de uno en uno."""
+
+    events = iter_events(path, sheet_name, profile, parser)
+    return group_schedules(events, vocabulary, profile.merge_same_second, grouped)
+
+
+class DrugXmlWriter:
+    """Exporta ``drug.xml`` paciente a paciente sin construir el árbol completo.
+
+    El resultado es idéntico byte a byte al de construir el árbol ``drug``
+    con un nodo por paciente, fecha y medicamento y escribirlo con
+    ``ElementTree.write(..., xml_declaration=True)``.
+    """
+
+    def __init__(self, xml_path: Path, vocabulary: Vocabulary, sort_by_time: bool = False) -> None:
+        from xml.etree import ElementTree
+
+        self.vocabulary = vocabulary
+        self.sort_by_time = sort_by_time
+        self._tree = ElementTree
+        self._handle = xml_path.open("w", encoding="utf-8")
+        self._handle.write("<?xml version='1.0' encoding='utf-8'?>\n<drug>")
+        self._handle.write(ElementTree.tostring(ElementTree.Comment(XML_COMMENT), encoding="unicode"))
+
+    def __enter__(self) -> "DrugXmlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, schedule: PatientSchedule) -> None:
+        names = self.vocabulary
+        tree = self._tree
+        Element, SubElement = tree.Element, tree.SubElement
+        patient = Element(schedule.patient, name=schedule.patient)
+        positions: Iterable[int] = range(len(schedule.timestamps))
+        if self.sort_by_time:
+            positions = sorted(positions, key=schedule.timestamps.__getitem__)
+        for position in positions:
+            timestamp = schedule.timestamps[position]
+            date_node = SubElement(
+                patient,
+                timestamp.strftime("%Y-%m-%d-%H-%M-%S"),
+                name=timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            )
+            for med in schedule.medications[position]:
+                SubElement(date_node, names[med], name=names[med])
+        self._handle.write(tree.tostring(patient, encoding="unicode"))
+
+    def close(self) -> None:
+        if not self._handle.closed:
+            self._handle.write("</drug>")
+            self._handle.close()
+
+
+def write_drug_xml(
+    schedules: Iterable[PatientSchedule], vocabulary: Vocabulary, xml_path: Path, sort_by_time: bool = False
+) -> None:
+    with DrugXmlWriter(xml_path, vocabulary, sort_by_time) as writer:
+        for schedule in schedules:
+            writer.write(schedule)
+
+
+@dataclass
+class CombinationResults:
+    """Pares por ventana, internados y empaquetados; se iteran como texto ``a_b``.
+
+    ``same_slot`` reúne los pares dentro de una misma administración y sólo
+    existe si el perfil lo pide. ``windows`` guarda una colección por cada
+    ventana adicional pedida (:class:`window_engine.WindowSpec`).
+    Con ``occurrences`` las colecciones guardan cada aparición aunque el
+    perfil deduplique, como hacen falta para contar los pares de un paciente.
+    """
+
+    vocabulary: Vocabulary
+    same_day: PairCollection
+    offset: PairCollection
+    rolling: PairCollection
+    same_slot: Optional[PairCollection] = None
+    windows: Dict[WindowSpec, PairCollection] = field(default_factory=dict)
+
+    @classmethod
+    def empty(
+        cls,
+        vocabulary: Vocabulary,
+        profile: CompatibilityProfile,
+        windows: Iterable[WindowSpec] = (),
+        occurrences: bool = False,
+    ) -> "CombinationResults":
+        collection = PairSet if profile.deduplicate and not occurrences else PairList
+        return cls(
+            vocabulary,
+            collection(vocabulary),
+            collection(vocabulary),
+            collection(vocabulary),
+            collection(vocabulary) if profile.same_slot_pairs else None,
+            {spec: collection(vocabulary) for spec in windows},
+        )
+
+    @property
+    def collections(self) -> List[PairCollection]:
+        windows = [self.same_day, self.offset, self.rolling]
+        if self.same_slot is not None:
+            windows.append(self.same_slot)
+        return windows + list(self.windows.values())
+
+    def export(self) -> List[Any]:
+        return [pairs.export() for pairs in self.collections]
+
+    def merge(self, exported: Sequence[Any]) -> None:
+        for pairs, part in zip(self.collections, exported):
+            pairs.merge(part)
+
+    def extend(self, patient: "CombinationResults") -> None:
+        """Añade los pares de un paciente calculados aparte (``occurrences=True``)."""
+
+        for pairs, part in zip(self.collections, patient.collections):
+            pairs.add_codes(part.codes)
+            pairs.mark_boundary()
+
+
+def add_combinations(
+    schedule: PatientSchedule,
+    results: CombinationResults,
+    profile: CompatibilityProfile,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    vectorized: bool = False,
+) -> None:
+    """Añade a ``results`` las combinaciones de un único paciente.
+
+    Para cada administración sólo se visitan las del mismo día, las situadas
+    ``offset_days`` días después y las que caen dentro de la ventana móvil,
+    localizadas por búsqueda binaria sobre la línea temporal ordenada. Cada
+    par va a la primera ventana que aplica (mismo día, desplazamiento,
+    ventana móvil) y los pares salen en orden de aparición de ambas
+    administraciones. Con ``vectorized`` las ventanas se clasifican de una vez
+    con NumPy (:func:`window_engine.bucket_pairs`) con el mismo resultado.
+
+    Si ``results`` tiene ventanas adicionales, todas se calculan en un único
+    recorrido (:func:`_sweep_windows`) y ``vectorized`` no se aplica.
+    """
+
+    meds = schedule.medications
+    new = schedule.new
+    windows = (results.same_day, results.offset, results.rolling)
+    expand = _add_folded if profile.fold_case else _add_distinct
+
+    if results.windows:
+        _sweep_windows(schedule, results, profile, rolling_hours, offset_days)
+    elif vectorized:
+        first, second, buckets = bucket_pairs(
+            schedule.timestamps,
+            hours_to_microseconds(rolling_hours),
+            offset_days,
+            profile.exact_offset,
+            profile.forward_only,
+        )
+        for index_a, index_b, bucket in zip(first.tolist(), second.tolist(), buckets.tolist()):
+            if new is None or new[index_a] or new[index_b]:
+                expand(meds[index_a], meds[index_b], windows[bucket])
+    else:
+        _add_window_pairs(schedule, windows, profile, rolling_hours, offset_days, expand)
+
+    if results.same_slot is not None:
+        for index, slot in enumerate(meds):
+            if new is None or new[index]:
+                expand(slot, slot, results.same_slot)
+        if new is not None:
+            _add_split_slots(schedule, results.same_slot, expand)
+    for pairs in results.collections:
+        pairs.mark_boundary()
+
+
+def _add_split_slots(
+    schedule: PatientSchedule,
+    same_slot: PairCollection,
+    expand: Callable[[Sequence[int], Sequence[int], PairCollection], None],
+) -> None:
+    # Los pares entre la parte ya procesada de una administración y la que se le
+    # añadió después (misma fecha, véase select_new) también son del mismo hueco.
+    new = schedule.new or ()
+    processed = {
+        timestamp: meds
+        for timestamp, meds, is_new in zip(schedule.timestamps, schedule.medications, new)
+        if not is_new
+    }
+    for timestamp, meds, is_new in zip(schedule.timestamps, schedule.medications, new):
+        if is_new and timestamp in processed:
+            expand(processed[timestamp], meds, same_slot)
+            expand(meds, processed[timestamp], same_slot)
+
+
+def _add_window_pairs(
+    schedule: PatientSchedule,
+    windows: Tuple[PairCollection, PairCollection, PairCollection],
+    profile: CompatibilityProfile,
+    rolling_hours: int,
+    offset_days: int,
+    expand: Callable[[Sequence[int], Sequence[int], PairCollection], None],
+) -> None:
+    rolling = hours_to_microseconds(rolling_hours)
+    offset = days_to_microseconds(offset_days)
+    meds = schedule.medications
+    new = schedule.new
+    timeline = SortedTimeline(schedule.timestamps)
+    same_day, offset_window, rolling_window = windows
+    if profile.deduplicate:
+        _add_window_sets(timeline, meds, new, windows, profile, rolling, offset, offset_days, expand)
+        return
+    for index_a, meds_a in enumerate(meds):
+        position = timeline.position_of[index_a]
+        start = position + 1 if profile.forward_only else 0
+        # Las asignaciones posteriores tienen prioridad: mismo día sobre desplazamiento sobre ventana móvil.
+        targets: dict[int, PairCollection] = {}
+        for candidate in timeline.rolling(position, rolling):
+            if candidate >= start:
+                targets[timeline.order[candidate]] = rolling_window
+        # Un desplazamiento nulo es el mismo día, que siempre tiene prioridad.
+        if offset_days:
+            if profile.exact_offset:
+                offsets = timeline.exact_offset(position, offset)
+            else:
+                offsets = timeline.day_offset(position, offset_days)
+            for candidate in offsets:
+                if candidate >= start:
+                    targets[timeline.order[candidate]] = offset_window
+        for candidate in timeline.same_day(position):
+            if candidate >= start:
+                targets[timeline.order[candidate]] = same_day
+
+        for index_b in sorted(targets):
+            if new is None or new[index_a] or new[index_b]:
+                expand(meds_a, meds[index_b], targets[index_b])
+
+
+def _add_window_sets(
+    timeline: SortedTimeline,
+    meds: Sequence[Sequence[int]],
+    new: Optional[Sequence[bool]],
+    windows: Tuple[PairCollection, PairCollection, PairCollection],
+    profile: CompatibilityProfile,
+    rolling: int,
+    offset: int,
+    offset_days: int,
+    expand: Callable[[Sequence[int], Sequence[int], PairCollection], None],
+) -> None:
+    # En un conjunto el orden de inserción no importa: la precedencia se
+    # resuelve con los rangos de la línea temporal, sin diccionario por fecha.
+    same_day, offset_window, rolling_window = windows
+    order = timeline.order
+    for position, index_a in enumerate(order):
+        meds_a = meds[index_a]
+        start = position + 1 if profile.forward_only else 0
+        day = timeline.same_day(position)
+        if not offset_days:
+            offsets = range(0)
+        elif profile.exact_offset:
+            offsets = timeline.exact_offset(position, offset)
+        else:
+            offsets = timeline.day_offset(position, offset_days)
+        for candidate in range(max(start, day.start), day.stop):
+            index_b = order[candidate]
+            if new is None or new[index_a] or new[index_b]:
+                expand(meds_a, meds[index_b], same_day)
+        for candidate in range(max(start, offsets.start), offsets.stop):
+            index_b = order[candidate]
+            if candidate not in day and (new is None or new[index_a] or new[index_b]):
+                expand(meds_a, meds[index_b], offset_window)
+        window = timeline.rolling(position, rolling)
+        for candidate in range(max(start, window.start), window.stop):
+            index_b = order[candidate]
+            if candidate not in day and candidate not in offsets and (new is None or new[index_a] or new[index_b]):
+                expand(meds_a, meds[index_b], rolling_window)
+
+
+def _sweep_windows(
+    schedule: PatientSchedule,
+    results: CombinationResults,
+    profile: CompatibilityProfile,
+    rolling_hours: int,
+    offset_days: int,
+) -> None:
+    """Ventanas clásicas y adicionales en un solo recorrido de la línea temporal.
+
+    Para cada administración se visita una vez la envolvente de todos sus
+    horizontes. Cada candidata va a la ventana clásica que le toca (con la
+    precedencia de siempre) y a todas las adicionales que la contienen, y los
+    pares de medicamentos se empaquetan una sola vez para todas ellas.
+    """
+
+    rolling = hours_to_microseconds(rolling_hours)
+    offset = days_to_microseconds(offset_days)
+    meds = schedule.medications
+    new = schedule.new
+    vocabulary = results.vocabulary
+    timeline = SortedTimeline(schedule.timestamps)
+    order = timeline.order
+    extra = list(results.windows.items())
+    # Las listas conservan el orden de aparición de ambas administraciones; a los conjuntos les da igual.
+    ordered = not profile.deduplicate
+    for index_a in range(len(meds)) if ordered else order:
+        position = timeline.position_of[index_a]
+        day = timeline.same_day(position)
+        if not offset_days:
+            offsets = range(0)
+        elif profile.exact_offset:
+            offsets = timeline.exact_offset(position, offset)
+        else:
+            offsets = timeline.day_offset(position, offset_days)
+        window = timeline.rolling(position, rolling)
+        spans = [(timeline.window(position, spec), pairs) for spec, pairs in extra]
+
+        horizons = [day, window] + [span for span, _ in spans]
+        if offsets:
+            horizons.append(offsets)
+        lower = min(horizon.start for horizon in horizons)
+        if profile.forward_only:
+            lower = max(lower, position + 1)
+        candidates: Iterable[int] = range(lower, max(horizon.stop for horizon in horizons))
+        if ordered:
+            candidates = sorted(candidates, key=order.__getitem__)
+
+        meds_a = meds[index_a]
+        for candidate in candidates:
+            index_b = order[candidate]
+            if new is not None and not (new[index_a] or new[index_b]):
+                continue
+            if candidate in day:
+                targets = [results.same_day]
+            elif candidate in offsets:
+                targets = [results.offset]
+            elif candidate in window:
+                targets = [results.rolling]
+            else:
+                targets = []
+            targets.extend(pairs for span, pairs in spans if candidate in span)
+            if targets:
+                codes = _pair_codes(meds_a, meds[index_b], vocabulary, profile.fold_case)
+                for pairs in targets:
+                    pairs.add_codes(codes)
+
+
+def _pair_codes(meds_a: Sequence[int], meds_b: Sequence[int], vocabulary: Vocabulary, fold_case: bool) -> List[int]:
+    pack = vocabulary.pack_pair
+    if fold_case:
+        folded = vocabulary.folded
+        return [pack(med_a, med_b) for med_a in meds_a for med_b in meds_b if folded[med_a] != folded[med_b]]
+    return [pack(med_a, med_b) for med_a in meds_a for med_b in meds_b if med_a != med_b]
+
+
+def _add_distinct(meds_a: Sequence[int], meds_b: Sequence[int], pairs: PairCollection) -> None:
+    add = pairs.add
+    for med_a in meds_a:
+        for med_b in meds_b:
+            if med_a != med_b:
+                add(med_a, med_b)
+
+
+def _add_folded(meds_a: Sequence[int], meds_b: Sequence[int], pairs: PairCollection) -> None:
+    add = pairs.add
+    folded = pairs.vocabulary.folded
+    for med_a in meds_a:
+        key = folded[med_a]
+        for med_b in meds_b:
+            if key != folded[med_b]:
+                add(med_a, med_b)
+
+
+def compute_combinations(
+    schedules: Iterable[PatientSchedule],
+    vocabulary: Vocabulary,
+    profile: CompatibilityProfile,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    vectorized: bool = False,
+    windows: Iterable[WindowSpec] = (),
+) -> CombinationResults:
+    """Combinaciones de todos los pacientes en memoria."""
+
+    results = CombinationResults.empty(vocabulary, profile, windows)
+    for schedule in schedules:
+        add_combinations(schedule, results, profile, rolling_hours, offset_days, vectorized)
+    finish_combinations(results, profile)
+    return results
+
+
+def tally_combinations(
+    schedule: PatientSchedule,
+    results: CombinationResults,
+    profile: CompatibilityProfile,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    vectorized: bool = False,
+) -> List[Dict[int, int]]:
+    """Como :func:`add_combinations`, y devuelve las apariciones de cada par del paciente por ventana.
+
+    Las ventanas siguen el orden de :attr:`CombinationResults.collections`;
+    con ``offset_includes_same_day`` la de desplazamiento incluye también
+    los pares del mismo día, igual que su lista.
+    """
+
+    patient = CombinationResults.empty(results.vocabulary, profile, results.windows, occurrences=True)
+    add_combinations(schedule, patient, profile, rolling_hours, offset_days, vectorized)
+    results.extend(patient)
+    counts = [Counter(pairs.codes) for pairs in patient.collections]
+    if profile.offset_includes_same_day:
+        counts[1].update(counts[0])
+    return counts
+
+
+def finish_combinations(results: CombinationResults, profile: CompatibilityProfile) -> None:
+    if profile.offset_includes_same_day:
+        results.offset.merge(results.same_day.export())
+
+
+def combination_chunk(
+    schedules: Sequence[PatientSchedule],
+    vocabulary: Vocabulary,
+    profile: CompatibilityProfile,
+    rolling_hours: int,
+    offset_days: int,
+    vectorized: bool = False,
+    windows: Sequence[WindowSpec] = (),
+    tally: bool = False,
+) -> Tuple[List[Any], List[List[Dict[int, int]]]]:
+    """Tarea de un proceso: pares de un grupo de pacientes en forma compacta.
+
+    Los medicamentos ya vienen internados por el proceso principal, así que los
+    códigos devueltos se pueden fusionar sin traducirlos. Con ``tally`` se
+    devuelven además los conteos de cada paciente (:func:`tally_combinations`)
+    para las estadísticas, que se acumulan en el proceso principal.
+    """
+
+    results = CombinationResults.empty(vocabulary, profile, windows)
+    tallies = []
+    for schedule in schedules:
+        if tally:
+            tallies.append(tally_combinations(schedule, results, profile, rolling_hours, offset_days, vectorized))
+        else:
+            add_combinations(schedule, results, profile, rolling_hours, offset_days, vectorized)
+    return results.export(), tallies
+
+
+def select_incremental(
+    schedule: PatientSchedule,
+    state: IncrementalState,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+) -> Optional[PatientSchedule]:
+    """Reduce el paciente a las fechas nuevas y a las anteriores aún dentro del horizonte.
+
+    Registra además las fechas como procesadas. Devuelve ``None`` si el
+    paciente no tiene fechas nuevas. Una administración que ganó medicamentos
+    desde la última ejecución llega partida en dos con la misma fecha (véase
+    :func:`incremental.select_new`).
+    """
+
+    from pharmprofile.incremental import select_new
+
+    timestamps, medications, new = select_new(
+        schedule.timestamps, schedule.medications, state.last_processed(schedule.patient), rolling_hours, offset_days
+    )
+    state.mark_processed(schedule.patient, schedule.timestamps, schedule.medications)
+    if not timestamps:
+        return None
+    return PatientSchedule(schedule.patient, timestamps, medications, new)
+
+
+def _exported(
+    schedules: Iterable[PatientSchedule], xml_writer: DrugXmlWriter, report: RunReport
+) -> Iterator[PatientSchedule]:
+    for schedule in schedules:
+        with report.stage("xml"):
+            xml_writer.write(schedule)
+        yield schedule
+
+
+def _screened(
+    schedules: Iterable[PatientSchedule], screening: Screening, report: RunReport
+) -> Iterator[PatientSchedule]:
+    for schedule in schedules:
+        with report.stage("screening"):
+            screening.screen(schedule.patient, schedule.timestamps, schedule.medications)
+        yield schedule
+
+
+def _recorded(
+    schedules: Iterable[PatientSchedule], columnar: ColumnarPairWriter, report: RunReport
+) -> Iterator[PatientSchedule]:
+    for schedule in schedules:
+        with report.stage("columnar"):
+            columnar.write_patient(schedule.patient, schedule.timestamps, schedule.medications)
+        yield schedule
+
+
+def _pending(
+    schedules: Iterable[PatientSchedule],
+    state: IncrementalState,
+    rolling_hours: float,
+    offset_days: int,
+    report: RunReport,
+) -> Iterator[PatientSchedule]:
+    for schedule in schedules:
+        with report.stage("incremental"):
+            reduced = select_incremental(schedule, state, rolling_hours, offset_days)
+        if reduced is not None:
+            yield reduced
+
+
+def analyse(
+    schedules: Iterable[PatientSchedule],
+    results: CombinationResults,
+    profile: CompatibilityProfile,
+    report: RunReport,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    xml_writer: Optional[DrugXmlWriter] = None,
+    screening: Optional[Screening] = None,
+    columnar: Optional[ColumnarPairWriter] = None,
+    state: Optional[IncrementalState] = None,
+    workers: int = 1,
+    vectorized: bool = False,
+    combine: bool = True,
+    statistics: Optional[PairStatistics] = None,
+) -> Optional[PoolStats]:
+    """Pasa cada paciente por las etapas activas y acumula sus combinaciones en ``results``.
+
+    Las ventanas adicionales son las de ``results.windows``; el modo
+    incremental conserva las administraciones anteriores que aún caen dentro
+    de la más amplia. Devuelve las estadísticas del pool cuando ``workers > 1``.
+    Con ``combine=False`` los pacientes sólo pasan por la exportación XML, el
+    cribado y la salida columnar, y ``results`` queda vacío. Con
+    ``statistics`` cada paciente se cuenta además en las estadísticas de
+    cohorte (etapa ``pair_stats``).
+    """
+
+    stream: Iterable[PatientSchedule] = schedules
+    if xml_writer is not None:
+        stream = _exported(stream, xml_writer, report)
+    if screening is not None:
+        stream = _screened(stream, screening, report)
+    if columnar is not None:
+        stream = _recorded(stream, columnar, report)
+    if state is not None:
+        horizon_hours, horizon_days = widest_horizon(rolling_hours, offset_days, results.windows)
+        stream = _pending(stream, state, horizon_hours, horizon_days, report)
+
+    stats = None
+    if not combine:
+        for _ in stream:
+            pass
+        return None
+    if workers > 1:
+        # multiprocessing sólo se importa cuando se reparten pacientes entre procesos.
+        from pharmprofile.parallel import PoolStats, chunked, ordered_map
+
+        stats = PoolStats(workers)
+        windows = tuple(results.windows)
+        tasks = (
+            (
+                chunk,
+                results.vocabulary.snapshot(),
+                profile,
+                rolling_hours,
+                offset_days,
+                vectorized,
+                windows,
+                statistics is not None,
+            )
+            for chunk in chunked(stream)
+        )
+        # La lectura y las etapas anteriores ocurren al pedir tareas y se descuentan de esta etapa.
+        with report.stage("combinations") as stage:
+            for exported, tallies in ordered_map(combination_chunk, tasks, workers, stats):
+                results.merge(exported)
+                if statistics is not None:
+                    with report.stage("pair_stats"):
+                        for counts in tallies:
+                            statistics.add_patient(counts)
+            stage.counters["worker_busy_ms"] = round(stats.busy_seconds * 1000)
+            stage.counters["estimated_speedup"] = round(stats.speedup, 3)
+            stage.counters["parallel_efficiency"] = round(stats.parallel_efficiency, 3)
+    elif statistics is not None:
+        for schedule in stream:
+            with report.stage("combinations"):
+                counts = tally_combinations(schedule, results, profile, rolling_hours, offset_days, vectorized)
+                with report.stage("pair_stats"):
+                    statistics.add_patient(counts)
+    else:
+        for schedule in stream:
+            with report.stage("combinations"):
+                add_combinations(schedule, results, profile, rolling_hours, offset_days, vectorized)
+    finish_combinations(results, profile)
+    return stats
+
+
+def profile_interactions(
+    index: DrugBankIndex,
+    drugs: Sequence[str],
+    profile: CompatibilityProfile,
+    match_policy: Optional[str] = None,
+    report: Optional[RunReport] = None,
+) -> Tuple[List[str], Set[str]]:
+    """Interacciones ``a_b<TAB>descripción`` de los fármacos ``drugs`` y los que no se encontraron.
+
+    Sin ``first_entry_only`` las entradas se recorren en el orden del XML;
+    con él, en el orden de ``drugs``.
+    """
+
+    from pharmprofile.name_resolver import NameResolver
+
+    resolver = NameResolver(index, match_policy or profile.match_policy)
+    not_found: Set[str] = set()
+    matches: List[Tuple[int, str]] = []
+    if profile.first_entry_only:
+        for drug in drugs:
+            query = drug.lower()
+            # La primera entrada con nombre (en el orden del XML) que coincide.
+            entry_id = next((drug_id for drug_id in resolver.resolve(query) if index.name(drug_id)), None)
+            if entry_id is None:
+                not_found.add(query)
+            else:
+                matches.append((entry_id, query))
+    else:
+        resolved = resolver.resolve_profile(drugs)
+        matches = [(drug_id, drugs[position].lower()) for drug_id, position in resolved]
+        positions = {position for _, position in resolved}
+        not_found = {drug.lower() for position, drug in enumerate(drugs) if position not in positions}
+
+    interactions: List[str] = []
+    for drug_id, query in matches:
+        own = query if profile.pair_with_query else index.name(drug_id).lower()
+        for partner, description in index.interactions(drug_id):
+            if not partner:
+                continue
+            if profile.lowercase_descriptions:
+                description = description.lower()
+            else:
+                if not description:
+                    continue
+                description = description.strip()
+            pair = "_".join(sorted((partner.lower(), own), key=str.lower))
+            interactions.append(f"{pair}\t{description}")
+    if report is not None:
+        report.count("drugbank", "cache_hits", resolver.hits)
+        report.count("drugbank", "cache_misses", resolver.misses)
+    return interactions, not_found
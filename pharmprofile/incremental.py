@@ -0,0 +1,179 @@
+"""Estado persistente para reanalizar sólo las administraciones nuevas.
+
+El plan de medicación crece cada día añadiendo filas posteriores. El estado
+guarda, en una base SQLite junto a los resultados, la última fecha procesada
+de cada paciente y los pares acumulados por ventana. En la siguiente
+ejecución sólo se combinan las administraciones posteriores a esa fecha,
+junto con las anteriores que aún caen dentro del horizonte de la ventana más
+amplia (por defecto 48h), y los pares nuevos se suman a los acumulados.
+
+Se asume que los datos se añaden en orden temporal: una fila con fecha
+anterior a la última procesada de su paciente se considera ya analizada.
+Las filas añadidas con esa misma fecha sí se analizan: el estado guarda
+cuántos medicamentos de esa fecha se procesaron, y la administración se parte
+en la parte ya procesada y la nueva (:func:`select_new`). Para validar,
+``--full-rebuild`` descarta el estado y recalcula todo. Si cambian los
+parámetros de las ventanas o el formato del estado, éste se descarta
+automáticamente.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+from collections import Counter
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Se guarda con los parámetros: un estado de otra versión se descarta.
+STATE_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS patients (
+    patient TEXT PRIMARY KEY,
+    last_timestamp TEXT NOT NULL,
+    last_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    window TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (window, pair)
+) WITHOUT ROWID;
+"""
+
+
+def horizon_start(first_new: datetime, rolling_hours: float, offset_days: int) -> datetime:
+    """Primer instante que aún puede formar par con ``first_new``.
+
+    Cubre el mismo día calendario, el día situado ``offset_days`` antes y la
+    ventana móvil de ``rolling_hours`` horas.
+    """
+
+    day_start = datetime.combine(first_new.date() - timedelta(days=offset_days), time.min)
+    return min(day_start, first_new - timedelta(hours=rolling_hours))
+
+
+def select_new(
+    timestamps: Sequence[datetime],
+    medications: Sequence[List[int]],
+    last_processed: Optional[Tuple[datetime, int]],
+    rolling_hours: float,
+    offset_days: int,
+) -> Tuple[List[datetime], List[List[int]], List[bool]]:
+    """Administraciones a analizar (fechas y medicamentos) y, para cada una, si es nueva.
+
+    ``last_processed`` es la última fecha procesada del paciente y cuántos
+    medicamentos tenía entonces. Las administraciones posteriores son nuevas.
+    Las de esa misma fecha se recorren en orden: sus primeros medicamentos,
+    hasta ese número, ya se procesaron, y los siguientes (filas añadidas en el
+    mismo segundo, que ``cic`` acumula en la misma administración) se separan
+    en una administración nueva con la misma fecha. Se conservan además las ya
+    procesadas que siguen dentro del horizonte de la primera nueva; si no hay
+    nuevas, no se conserva ninguna.
+    """
+
+    if last_processed is None:
+        return list(timestamps), list(medications), [True] * len(timestamps)
+    last, remaining = last_processed
+    split_timestamps: List[datetime] = []
+    split_medications: List[List[int]] = []
+    new: List[bool] = []
+    for timestamp, meds in zip(timestamps, medications):
+        if timestamp != last:
+            parts = [(meds, timestamp > last)]
+        else:
+            done = min(remaining, len(meds))
+            remaining -= done
+            if done == len(meds):
+                parts = [(meds, False)]
+            elif not done:
+                parts = [(meds, True)]
+            else:
+                parts = [(meds[:done], False), (meds[done:], True)]
+        for part, is_new in parts:
+            split_timestamps.append(timestamp)
+            split_medications.append(part)
+            new.append(is_new)
+    if not any(new):
+        return [], [], []
+    start = horizon_start(min(t for t, is_new in zip(split_timestamps, new) if is_new), rolling_hours, offset_days)
+    keep = [i for i, timestamp in enumerate(split_timestamps) if new[i] or timestamp >= start]
+    return [split_timestamps[i] for i in keep], [split_medications[i] for i in keep], [new[i] for i in keep]
+
+
+class IncrementalState:
+    """Fechas procesadas por paciente y conteo acumulado de pares por ventana."""
+
+    def __init__(self, path: Path, settings: Mapping[str, object], rebuild: bool = False) -> None:
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        signature = json.dumps({**settings, "state_version": STATE_VERSION}, sort_keys=True)
+        stored = self._connection.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+        if rebuild or stored is None or stored[0] != signature:
+            if stored is not None and not rebuild:
+                LOGGER.warning(
+                    "Cambiaron los parámetros de las ventanas o el formato del estado; se descarta el estado de %s", path
+                )
+            self._connection.executescript("DROP TABLE patients; DROP TABLE pairs; DELETE FROM meta;")
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute("INSERT INTO meta (key, value) VALUES ('settings', ?)", (signature,))
+            self.fresh = True
+        else:
+            self.fresh = False
+        self._last: Dict[str, Tuple[datetime, int]] = {
+            patient: (datetime.fromisoformat(value), count)
+            for patient, value, count in self._connection.execute(
+                "SELECT patient, last_timestamp, last_count FROM patients"
+            )
+        }
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "IncrementalState":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self._connection.commit()
+        self.close()
+
+    def last_processed(self, patient: str) -> Optional[Tuple[datetime, int]]:
+        """Última fecha procesada del paciente y cuántos medicamentos tenía."""
+
+        return self._last.get(patient)
+
+    def mark_processed(self, patient: str, timestamps: Sequence[datetime], medications: Sequence[List[int]]) -> None:
+        latest = max(timestamps, default=None)
+        if latest is None:
+            return
+        count = sum(len(meds) for timestamp, meds in zip(timestamps, medications) if timestamp == latest)
+        previous = self._last.get(patient)
+        if previous is None or (latest, count) > previous:
+            self._last[patient] = (latest, count)
+            self._connection.execute(
+                "REPLACE INTO patients (patient, last_timestamp, last_count) VALUES (?, ?, ?)",
+                (patient, latest.isoformat(), count),
+            )
+
+    def add_pairs(self, window: str, pairs: Iterable[str]) -> None:
+        """Suma las apariciones de ``pairs`` (texto ``a_b``) al acumulado de ``window``."""
+
+        self._connection.executemany(
+            "INSERT INTO pairs (window, pair, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (window, pair) DO UPDATE SET count = count + excluded.count",
+            ((window, pair, count) for pair, count in Counter(pairs).items()),
+        )
+
+    def pair_counts(self, window: str) -> Iterator[Tuple[str, int]]:
+        """Pares acumulados de ``window`` ordenados por su texto."""
+
+        return iter(
+            self._connection.execute("SELECT pair, count FROM pairs WHERE window = ? ORDER BY pair", (window,))
+        )
@@ -0,0 +1,148 @@
+"""Cliente de carga para ``lookup_server.py``.
+
+Abre varias conexiones concurrentes, envía lotes de pares aleatorios
+formados con nombres del propio índice (operación ``names``) y mide la
+latencia de cada petición y el rendimiento total en pares por segundo.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pharmprofile.lookup_server import DEFAULT_HOST, DEFAULT_PORT, STREAM_LIMIT
+
+LOGGER = logging.getLogger(__name__)
+
+
+async def _connect(
+    socket_path: Optional[Path], host: str, port: int
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if socket_path is not None:
+        return await asyncio.open_unix_connection(str(socket_path), limit=STREAM_LIMIT)
+    return await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Envía una petición y espera su respuesta."""
+
+    writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response
+
+
+async def _worker(
+    socket_path: Optional[Path],
+    host: str,
+    port: int,
+    names: Sequence[str],
+    batches: int,
+    batch_size: int,
+    seed: int,
+) -> Tuple[List[float], int]:
+    generator = random.Random(seed)
+    reader, writer = await _connect(socket_path, host, port)
+    latencies: List[float] = []
+    flagged = 0
+    try:
+        for _ in range(batches):
+            pairs = [generator.sample(names, 2) for _ in range(batch_size)]
+            start = time.perf_counter()
+            response = await request(reader, writer, {"op": "interactions", "pairs": pairs})
+            latencies.append(time.perf_counter() - start)
+            flagged += sum(result is not None for result in response["results"])
+    finally:
+        writer.close()
+    return latencies, flagged
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_load(
+    socket_path: Optional[Path],
+    host: str,
+    port: int,
+    connections: int,
+    batches: int,
+    batch_size: int,
+    names_limit: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """Lanza la carga y devuelve un resumen de latencias y rendimiento."""
+
+    reader, writer = await _connect(socket_path, host, port)
+    try:
+        names = (await request(reader, writer, {"op": "names", "limit": names_limit}))["names"]
+    finally:
+        writer.close()
+    if len(names) < 2:
+        raise RuntimeError("El índice necesita al menos dos entradas para generar pares")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            _worker(socket_path, host, port, names, batches, batch_size, seed + worker)
+            for worker in range(connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    pairs = len(latencies) * batch_size
+    return {
+        "requests": len(latencies),
+        "pairs": pairs,
+        "flagged": sum(flagged for _, flagged in results),
+        "seconds": elapsed,
+        "pairs_per_second": pairs / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "per_pair_us": _percentile(latencies, 0.50) / batch_size * 1e6,
+    }
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de interacciones")
+    parser.add_argument("--socket", type=Path, default=None, help="Socket Unix del servidor (en lugar de TCP)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Dirección TCP del servidor")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto TCP del servidor")
+    parser.add_argument("--connections", type=int, default=4, help="Conexiones concurrentes")
+    parser.add_argument("--batches", type=int, default=200, help="Peticiones por conexión")
+    parser.add_argument("--batch-size", type=int, default=100, help="Pares por petición")
+    parser.add_argument("--names", type=int, default=None, help="Usar sólo los primeros N nombres del índice")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de los pares aleatorios")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+    logging.basicConfig(level=logging.INFO)
+    summary = asyncio.run(
+        run_load(args.socket, args.host, args.port, args.connections, args.batches, args.batch_size, args.names, args.seed)
+    )
+    LOGGER.info(
+        "%s peticiones, %s pares (%s con interacción) en %.2fs: %.0f pares/s, "
+        "latencia p50 %.2f ms, p99 %.2f ms, %.1f µs por par (mediana)",
+        summary["requests"],
+        summary["pairs"],
+        summary["flagged"],
+        summary["seconds"],
+        summary["pairs_per_second"],
+        summary["p50_ms"],
+        summary["p99_ms"],
+        summary["per_pair_us"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Servicio local de consultas de interacciones con el índice de DrugBank en caliente.
+
+Cada ejecución de los scripts paga el arranque del intérprete, la importación
+de openpyxl y la apertura del índice. Este servidor abre el índice una sola
+vez, mantiene en memoria la tabla de interacciones de
+:class:`screening.InteractionLookup` y atiende peticiones por un socket Unix o
+por TCP en ``localhost`` con :mod:`asyncio`.
+
+El protocolo es JSON por líneas: cada línea enviada es un objeto con la
+operación en ``op`` y cada respuesta es una línea JSON. Si la petición
+incluye ``id``, la respuesta lo repite.
+
+``{"op": "interactions", "pairs": [["aspirin", "warfarin"], ...]}``
+    Devuelve ``{"results": [descripción o null, ...]}`` en el mismo orden.
+``{"op": "screen", "patient": "P1", "administrations": [{"time": "2023-01-01T08:00:00", "medications": ["a", "b"]}, ...]}``
+    Criba el plan de un paciente igual que ``--screen`` y devuelve
+    ``{"records": [...]}``. Acepta ``window_hours``, ``offset_days`` y
+    ``exact_offset`` (por defecto los de ``drug_drug_interact_cic.py``).
+``{"op": "names", "limit": 100}``
+    Nombres de entradas del índice, útil para generar carga.
+``{"op": "stats"}``
+    Peticiones y pares atendidos desde el arranque.
+
+Los nombres que envían los clientes no se internan en un vocabulario
+compartido: ``interactions`` los consulta por nombre y ``screen`` usa un
+vocabulario propio de la petición. Las cachés de la tabla son LRU acotadas
+(``--cache-size``), así que la memoria no crece con los nombres recibidos.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import stat
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from pharmprofile.drugbank_index import DrugBankIndex
+from pharmprofile.name_resolver import MATCH_EXACT, MATCH_POLICIES
+from pharmprofile.screening import PAIR_CACHE_SIZE, InteractionLookup, screen_patient
+from pharmprofile.vocabulary import Vocabulary
+from pharmprofile.window_engine import DEFAULT_OFFSET_DAYS, DEFAULT_ROLLING_HOURS
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Las peticiones por lotes pueden ser largas; el límite por defecto de asyncio es 64 KiB.
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class LookupService:
+    """Atiende peticiones ya decodificadas contra un índice abierto."""
+
+    def __init__(self, index: DrugBankIndex, policy: str = MATCH_EXACT, cache_size: int = PAIR_CACHE_SIZE) -> None:
+        self.index = index
+        self.lookup = InteractionLookup(index, Vocabulary(), policy, cache_size)
+        self.requests = 0
+        self.pairs = 0
+
+    def warm(self) -> int:
+        """Carga las interacciones de todas las entradas del índice; devuelve cuántas."""
+
+        names = self.index.drug_names()
+        self.lookup.preload_names(names)
+        return len(names)
+
+    def interactions(self, pairs: Sequence[Sequence[str]]) -> List[Optional[str]]:
+        describe = self.lookup.describe_names
+        self.pairs += len(pairs)
+        return [describe(first, second) for first, second in pairs]
+
+    def screen(
+        self,
+        patient: str,
+        administrations: Sequence[Dict[str, Any]],
+        window_hours: int = DEFAULT_ROLLING_HOURS,
+        offset_days: int = DEFAULT_OFFSET_DAYS,
+        exact_offset: bool = True,
+    ) -> List[Dict[str, str]]:
+        timestamps = [datetime.fromisoformat(item["time"]) for item in administrations]
+        vocabulary = Vocabulary()
+        medications = [vocabulary.intern_all(item["medications"]) for item in administrations]
+        records = screen_patient(
+            patient,
+            timestamps,
+            medications,
+            self.lookup.for_vocabulary(vocabulary),
+            window_hours,
+            offset_days,
+            exact_offset,
+        )
+        return [
+            {
+                "window": record.window,
+                "first_time": record.first_time.isoformat(),
+                "second_time": record.second_time.isoformat(),
+                "first": record.first,
+                "second": record.second,
+                "description": record.description,
+            }
+            for record in records
+        ]
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests += 1
+        operation = request.get("op")
+        if operation == "interactions":
+            response: Dict[str, Any] = {"results": self.interactions(request["pairs"])}
+        elif operation == "screen":
+            response = {
+                "records": self.screen(
+                    str(request["patient"]),
+                    request["administrations"],
+                    int(request.get("window_hours", DEFAULT_ROLLING_HOURS)),
+                    int(request.get("offset_days", DEFAULT_OFFSET_DAYS)),
+                    bool(request.get("exact_offset", True)),
+                )
+            }
+        elif operation == "names":
+            names = self.index.drug_names()
+            limit = request.get("limit")
+            response = {"names": names if limit is None else names[: int(limit)]}
+        elif operation == "stats":
+            response = {
+                "requests": self.requests,
+                "pairs": self.pairs,
+                "medications": self.lookup.cached_medications,
+                "cached_pairs": self.lookup.cached_pairs,
+            }
+        else:
+            raise ValueError(f"Operación desconocida: {operation!r}")
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+
+async def _serve_client(service: LookupService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                response = service.handle(json.loads(line))
+            except Exception as exc:  # pylint: disable=broad-except
+                response = {"error": str(exc)}
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def _is_socket(path: Path) -> bool:
+    try:
+        return stat.S_ISSOCK(path.lstat().st_mode)
+    except FileNotFoundError:
+        return False
+
+
+async def serve(
+    service: LookupService,
+    socket_path: Optional[Path] = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+) -> None:
+    """Atiende conexiones hasta que se cancela la tarea.
+
+    Un socket que quedó de una ejecución anterior en ``socket_path`` se
+    reemplaza; cualquier otro archivo en esa ruta es un error.
+    """
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await _serve_client(service, reader, writer)
+
+    if socket_path is not None:
+        if _is_socket(socket_path):
+            socket_path.unlink()
+        elif socket_path.exists() or socket_path.is_symlink():
+            raise FileExistsError(f"{socket_path} existe y no es un socket; no se reemplaza")
+        server = await asyncio.start_unix_server(handler, path=str(socket_path), limit=STREAM_LIMIT)
+        LOGGER.info("Escuchando en el socket %s", socket_path)
+    else:
+        server = await asyncio.start_server(handler, host=host, port=port, limit=STREAM_LIMIT)
+        LOGGER.info("Escuchando en %s:%s", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor local de consultas de interacciones de DrugBank")
+    parser.add_argument("drugbank", type=Path, help="Archivo XML de DrugBank")
+    parser.add_argument("--index", type=Path, default=None, help="Ruta del índice (por defecto junto al XML)")
+    parser.add_argument("--rebuild-index", action="store_true", help="Reconstruir el índice antes de arrancar")
+    parser.add_argument("--match", default=MATCH_EXACT, choices=MATCH_POLICIES, help="Política de coincidencia de nombres")
+    parser.add_argument("--socket", type=Path, default=None, help="Socket Unix en el que escuchar (en lugar de TCP)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Dirección TCP (por defecto sólo localhost)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto TCP")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=PAIR_CACHE_SIZE,
+        help="Pares cuyo resultado se memoriza como máximo (caché LRU)",
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="Cargar al arrancar las interacciones de todas las entradas en lugar de bajo demanda",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+    logging.basicConfig(level=logging.INFO)
+    with DrugBankIndex.open(args.drugbank, args.index, rebuild=args.rebuild_index) as index:
+        service = LookupService(index, args.match, args.cache_size)
+        if args.warm:
+            start = time.perf_counter()
+            loaded = service.warm()
+            LOGGER.info("Interacciones de %s entradas cargadas en %.2fs", loaded, time.perf_counter() - start)
+        try:
+            asyncio.run(serve(service, args.socket, args.host, args.port))
+        except KeyboardInterrupt:
+            LOGGER.info("Servidor detenido: %s peticiones, %s pares", service.requests, service.pairs)
+        except FileExistsError as exc:
+            LOGGER.error("%s", exc)
+            raise SystemExit(1) from exc
+        finally:
+            if args.socket is not None and _is_socket(args.socket):
+                args.socket.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Resolución de nombres de fármacos contra el índice de DrugBank.
+
+Cada nombre del perfil se normaliza y se resuelve una sola vez; el resultado
+queda en un diccionario, de modo que el coste depende del tamaño del perfil
+y no del de DrugBank. Hay dos políticas de coincidencia:
+
+``exact``
+    El nombre normalizado debe ser igual al nombre o a un sinónimo de la
+    entrada (búsqueda por clave en el índice).
+``substring``
+    Semántica histórica de ``drug_drug_interact_cic.py``: basta con que el
+    nombre aparezca dentro del nombre o de algún sinónimo. Se resuelve con el
+    índice de trigramas del compilado.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from pharmprofile.drugbank_index import DrugBankIndex
+
+MATCH_EXACT = "exact"
+MATCH_SUBSTRING = "substring"
+MATCH_POLICIES = (MATCH_EXACT, MATCH_SUBSTRING)
+
+
+class NameResolver:
+    """Traduce nombres de fármacos a identificadores de entradas de DrugBank.
+
+    ``cache_size`` limita los nombres memorizados (``None``: sin límite, lo
+    adecuado cuando los nombres salen de un plan o de un perfil).
+    """
+
+    def __init__(self, index: DrugBankIndex, policy: str = MATCH_EXACT, cache_size: Optional[int] = None) -> None:
+        if policy not in MATCH_POLICIES:
+            raise ValueError(f"Política de coincidencia desconocida: {policy}")
+        # Las constantes de política se leen al analizar los argumentos; el
+        # módulo del índice (y sqlite3) sólo se carga cuando hay un índice.
+        from pharmprofile.drugbank_index import normalize_name
+
+        self._normalize = normalize_name
+        self.policy = policy
+        self._lookup = lru_cache(maxsize=cache_size)(
+            index.exact_matches if policy == MATCH_EXACT else index.substring_matches
+        )
+
+    @property
+    def hits(self) -> int:
+        return self._lookup.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._lookup.cache_info().misses
+
+    def resolve(self, name: str) -> List[int]:
+        """Identificadores coincidentes, en el orden de las entradas del XML."""
+
+        return self._lookup(self._normalize(name))
+
+    def resolve_profile(self, profile: Sequence[str]) -> List[Tuple[int, int]]:
+        """Pares ``(drug_id, posición en el perfil)`` ordenados por entrada y posición."""
+
+        return sorted(
+            (drug_id, position) for position, name in enumerate(profile) for drug_id in self.resolve(name)
+        )
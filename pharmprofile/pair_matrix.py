@@ -0,0 +1,113 @@
+"""Matrices dispersas de conteo de pares de medicamentos.
+
+En lugar de escribir una línea por cada aparición de un par, los pares de
+una ventana se agregan en una matriz fármaco × fármaco en formato CSR: la
+celda ``[a, b]`` cuenta cuántas veces aparece la línea ``a_b`` en la lista
+de texto equivalente. Opcionalmente se genera una segunda matriz con el
+número de pacientes distintos que presentan cada par.
+
+Los archivos ``.npz`` siguen la disposición de ``scipy.sparse.save_npz``
+(``data``, ``indices``, ``indptr``, ``shape`` y ``format``), por lo que se
+cargan con ``scipy.sparse.load_npz``; además incluyen ``labels`` con el
+nombre de cada fila/columna. Requiere ``numpy``.
+"""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Tuple
+
+from pharmprofile.vocabulary import PAIR_MASK, PAIR_SHIFT, PairList, Vocabulary
+
+if TYPE_CHECKING:
+    import numpy
+
+LOGGER = logging.getLogger(__name__)
+
+PATIENTS_SUFFIX = "_pacientes"
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - dependencia opcional
+        raise RuntimeError("La salida matricial requiere numpy (pip install numpy)") from exc
+    return numpy
+
+
+def count_pairs(pairs: PairList) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """Códigos de par distintos y el número de apariciones de cada uno."""
+
+    np = _numpy()
+    codes = np.frombuffer(pairs.codes, dtype=np.int64) if len(pairs.codes) else np.empty(0, dtype=np.int64)
+    return np.unique(codes, return_counts=True)
+
+
+def count_patients(pairs: PairList) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """Códigos de par distintos y el número de pacientes que presentan cada uno."""
+
+    np = _numpy()
+    codes = np.frombuffer(pairs.codes, dtype=np.int64) if len(pairs.codes) else np.empty(0, dtype=np.int64)
+    per_patient = []
+    start = 0
+    for stop in pairs.boundaries:
+        if stop > start:
+            per_patient.append(np.unique(codes[start:stop]))
+        start = stop
+    if start < len(codes):
+        per_patient.append(np.unique(codes[start:]))
+    if not per_patient:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(per_patient), return_counts=True)
+
+
+def save_pair_matrix(path: Path, codes, counts, labels) -> None:
+    """Guarda los conteos por código de par como matriz CSR cuadrada."""
+
+    np = _numpy()
+    size = len(labels)
+    rows = (codes >> PAIR_SHIFT).astype(np.int64)
+    cols = (codes & PAIR_MASK).astype(np.int32)
+    # ``np.unique`` devuelve los códigos ordenados, es decir, por fila y luego por columna.
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    np.savez_compressed(
+        path,
+        data=counts.astype(np.int64),
+        indices=cols,
+        indptr=indptr,
+        shape=np.array([size, size]),
+        format=np.array("csr"),
+        labels=np.array(labels, dtype=str),
+    )
+    LOGGER.info("Matriz de %s pares distintos guardada en %s", len(codes), path)
+
+
+def write_pair_matrices(path: Path, pairs: PairList, patient_counts: bool = False) -> None:
+    """Escribe la matriz de apariciones y, si se pide, la de pacientes distintos."""
+
+    labels = pairs.vocabulary.names
+    save_pair_matrix(path, *count_pairs(pairs), labels)
+    if patient_counts:
+        patients_path = path.with_name(path.stem + PATIENTS_SUFFIX + path.suffix)
+        save_pair_matrix(patients_path, *count_patients(pairs), labels)
+
+
+def write_count_matrix(path: Path, pair_counts: Iterable[Tuple[str, int]]) -> None:
+    """Escribe la matriz de apariciones a partir de conteos ya agregados de pares ``a_b``.
+
+    Se usa con el estado incremental, que guarda los pares como texto; los
+    nombres nunca contienen guiones bajos porque éstos los separan en el plan.
+    """
+
+    np = _numpy()
+    vocabulary = Vocabulary()
+    codes = []
+    counts = []
+    for pair, count in pair_counts:
+        first, second = pair.split("_", 1)
+        codes.append(vocabulary.intern(first) << PAIR_SHIFT | vocabulary.intern(second))
+        counts.append(count)
+    codes_array = np.array(codes, dtype=np.int64)
+    order = np.argsort(codes_array, kind="stable")
+    save_pair_matrix(path, codes_array[order], np.array(counts, dtype=np.int64)[order], vocabulary.names)
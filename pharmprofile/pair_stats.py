@@ -0,0 +1,387 @@
+"""Estadísticas de cohorte de los pares coadministrados.
+
+Para la vigilancia a escala de hospital no hacen falta las listas completas
+de pares, sino los pares más frecuentes de cada ventana y cuántos pacientes
+distintos los presentan. :class:`PairStatistics` se alimenta durante el
+cálculo de combinaciones (:func:`engine.analyse`) con las apariciones de
+cada par en un paciente. Como los pacientes se leen agrupados
+(:func:`engine.group_schedules`), cada uno se presenta una sola vez y contar
+pacientes por par se reduce a sumar uno por cada par distinto del paciente,
+sin guardar conjuntos de pacientes.
+
+Hay dos modos:
+
+``exact``
+    Un contador ``par -> apariciones`` y otro ``par -> pacientes`` por
+    ventana. La memoria crece con el número de pares distintos.
+``sketch``
+    Por ventana, un Count-Min Sketch con dos tablas (apariciones y
+    pacientes) que comparten las funciones hash, una lista acotada de
+    candidatos al top-K y un HyperLogLog que estima el número de pares
+    distintos. Los conteos se acumulan en un búfer de tamaño fijo y se
+    vuelcan en bloque con NumPy (requiere ``numpy``). El tamaño de las tablas
+    se deduce de un límite de memoria que cubre también los registros, los
+    búferes, los candidatos y los temporales de un volcado, y no depende de
+    los datos.
+
+El Count-Min Sketch nunca subestima: con anchura ``w`` y profundidad ``d``,
+la estimación de un par supera al valor real en menos de ``e / w`` veces el
+total de la tabla con probabilidad al menos ``1 - e^-d``. Ese margen es el
+error que se informa, de modo que el valor real está entre ``estimación -
+error`` y la estimación. El HyperLogLog de ``2^p`` registros tiene un error
+típico relativo de ``1.04 / sqrt(2^p)``.
+"""
+from __future__ import annotations
+
+import csv
+import heapq
+import math
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Mapping, Sequence, Tuple, Union
+
+from pharmprofile.vocabulary import Vocabulary
+from pharmprofile.window_engine import WindowSpec, window_labels
+
+STATS_EXACT = "exact"
+STATS_SKETCH = "sketch"
+STATS_MODES = (STATS_EXACT, STATS_SKETCH)
+DEFAULT_TOP_K = 20
+DEFAULT_MEMORY_MB = 16
+SKETCH_DEPTH = 5
+HLL_PRECISION = 14
+MIN_SKETCH_WIDTH = 256
+# Conteos de pacientes que se acumulan antes de volcarlos en las tablas (código y apariciones, 16 bytes).
+SKETCH_BUFFER = 1 << 14
+# Pico medido de los temporales de NumPy de un volcado (únicos, hashes, columnas, candidatos), por entrada.
+FLUSH_BYTES_PER_ENTRY = 288
+# Los candidatos al top-K se podan a K cuando superan este múltiplo de K.
+CANDIDATE_FACTOR = 4
+SLOT_LABEL = "slot"
+EXTRA_LABEL = "ventana_{label}"
+STATISTICS_COLUMNS = ("window", "rank", "pair", "occurrences", "occurrences_error", "patients", "patients_error")
+
+_MASK32 = (1 << 32) - 1
+
+# Conteo de un par: código, apariciones, error, pacientes, error.
+PairCount = Tuple[int, int, int, int, int]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - dependencia opcional
+        raise RuntimeError("El modo sketch de --pair-stats requiere numpy (pip install numpy)") from exc
+    return numpy
+
+
+def _mix64_array(np, values):
+    """Mezcla ``splitmix64`` de códigos ``uint64``: reparte sus bits en 64 bits bien mezclados."""
+
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _ranking(count: PairCount) -> Tuple[int, int, int]:
+    """Más apariciones primero, luego más pacientes; a igualdad, el código menor."""
+
+    code, occurrences, _, patients, _ = count
+    return occurrences, patients, -code
+
+
+def statistics_labels(
+    rolling_hours: int, offset_days: int, same_slot: bool = False, windows: Iterable[WindowSpec] = ()
+) -> List[str]:
+    """Etiquetas de las ventanas en el orden de :attr:`engine.CombinationResults.collections`."""
+
+    labels = list(window_labels(rolling_hours, offset_days))
+    if same_slot:
+        labels.append(SLOT_LABEL)
+    labels.extend(EXTRA_LABEL.format(label=spec.label) for spec in windows)
+    return labels
+
+
+def sketch_footprint(
+    width: int, windows: int, top_k: int = DEFAULT_TOP_K, depth: int = SKETCH_DEPTH, precision: int = HLL_PRECISION
+) -> int:
+    """Bytes del modo sketch: por ventana, las dos tablas de ``depth`` filas de
+    enteros de 8 bytes, los registros del HyperLogLog, el búfer y los
+    candidatos; además, los temporales del volcado de un búfer lleno (las
+    ventanas se vuelcan de una en una)."""
+
+    per_window = 2 * depth * width * 8 + (1 << precision) + SKETCH_BUFFER * 16 + CANDIDATE_FACTOR * top_k * 8
+    return max(windows, 1) * per_window + SKETCH_BUFFER * FLUSH_BYTES_PER_ENTRY
+
+
+def minimum_sketch_memory_mb(windows: int, top_k: int = DEFAULT_TOP_K) -> float:
+    """Menor límite de memoria con el que caben tablas de ``MIN_SKETCH_WIDTH``."""
+
+    return sketch_footprint(MIN_SKETCH_WIDTH, windows, top_k) / (1024 * 1024)
+
+
+def sketch_width(
+    memory_mb: float,
+    windows: int,
+    top_k: int = DEFAULT_TOP_K,
+    depth: int = SKETCH_DEPTH,
+    precision: int = HLL_PRECISION,
+) -> int:
+    """Mayor anchura de las tablas con la que todo el modo sketch cabe en ``memory_mb``.
+
+    Lanza ``ValueError`` si no caben ni las tablas de ``MIN_SKETCH_WIDTH``.
+    """
+
+    free = memory_mb * 1024 * 1024 - sketch_footprint(0, windows, top_k, depth, precision)
+    width = int(free // (max(windows, 1) * 2 * depth * 8))
+    if width < MIN_SKETCH_WIDTH:
+        raise ValueError(
+            f"{memory_mb:g} MB no bastan para {windows} ventanas; "
+            f"el mínimo es {minimum_sketch_memory_mb(windows, top_k):.1f} MB"
+        )
+    return width
+
+
+@dataclass(frozen=True)
+class PairEstimate:
+    """Un par del top-K; el valor real está entre ``conteo - error`` y ``conteo``."""
+
+    window: str
+    rank: int
+    code: int
+    occurrences: int
+    occurrences_error: int
+    patients: int
+    patients_error: int
+
+
+@dataclass(frozen=True)
+class WindowSummary:
+    """Totales de una ventana; ``distinct_pairs_error`` es el error típico de la estimación."""
+
+    window: str
+    patients: int
+    occurrences: int
+    distinct_pairs: int
+    distinct_pairs_error: int
+
+
+class ExactWindow:
+    """Apariciones y pacientes exactos por par."""
+
+    def __init__(self) -> None:
+        self.occurrences: Counter = Counter()
+        self.patients: Counter = Counter()
+        self.total = 0
+        self.exposed = 0
+
+    def add(self, counts: Mapping[int, int]) -> None:
+        self.occurrences.update(counts)
+        self.patients.update(counts.keys())
+        self.total += sum(counts.values())
+        self.exposed += 1
+
+    def top(self, k: int) -> List[PairCount]:
+        patients = self.patients
+        counts = ((code, count, 0, patients[code], 0) for code, count in self.occurrences.items())
+        return heapq.nlargest(k, counts, key=_ranking)
+
+    def distinct(self) -> Tuple[int, int]:
+        return len(self.occurrences), 0
+
+
+class SketchWindow:
+    """Count-Min Sketch de apariciones y pacientes, candidatos al top-K y HyperLogLog de pares.
+
+    Los conteos de cada paciente se añaden a un búfer de códigos y
+    apariciones; al llenarse, los códigos repetidos se agregan con NumPy y
+    cada par distinto se vuelca una sola vez en las tablas. Un paciente suma
+    uno por par, así que los pacientes de un par en el búfer son las veces que
+    aparece su código. Las ``depth`` columnas de un par salen de un único hash
+    de 64 bits por doble hashing (``h1 + fila * h2``); sus bits altos eligen
+    además el registro del HyperLogLog.
+    """
+
+    def __init__(self, width: int, top_k: int, depth: int = SKETCH_DEPTH, precision: int = HLL_PRECISION) -> None:
+        np = self._np = _numpy()
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.precision = precision
+        self._occurrences = np.zeros((depth, width), dtype=np.int64)
+        self._patients = np.zeros((depth, width), dtype=np.int64)
+        self._registers = np.zeros(1 << precision, dtype=np.uint8)
+        self._candidates = np.empty(0, dtype=np.int64)
+        self._floor = 0
+        self._codes = array("q")
+        self._counts = array("q")
+        self.total = 0
+        self.exposures = 0
+        self.exposed = 0
+
+    def add(self, counts: Mapping[int, int]) -> None:
+        self._codes.extend(counts.keys())
+        self._counts.extend(counts.values())
+        self.total += sum(counts.values())
+        self.exposures += len(counts)
+        self.exposed += 1
+        if len(self._codes) >= SKETCH_BUFFER:
+            self.flush()
+
+    def _columns(self, codes):
+        np = self._np
+        hashed = _mix64_array(np, codes.astype(np.uint64))
+        first = (hashed & np.uint64(_MASK32)).astype(np.int64)
+        step = ((hashed >> np.uint64(32)) | np.uint64(1)).astype(np.int64)
+        return hashed, [(first + row * step) % self.width for row in range(self.depth)]
+
+    def _estimate(self, table, columns):
+        return self._np.min([table[row, column] for row, column in enumerate(columns)], axis=0)
+
+    def flush(self) -> None:
+        """Vuelca el búfer en las tablas, el HyperLogLog y los candidatos."""
+
+        if not self._codes:
+            return
+        np = self._np
+        codes, inverse = np.unique(np.frombuffer(self._codes, dtype=np.int64), return_inverse=True)
+        occurrences = np.bincount(inverse, weights=np.frombuffer(self._counts, dtype=np.int64)).astype(np.int64)
+        patients = np.bincount(inverse)
+        self._codes = array("q")
+        self._counts = array("q")
+
+        hashed, columns = self._columns(codes)
+        shift = 64 - self.precision
+        # Posición del primer bit a uno de los bits restantes; ``frexp`` es exacto por debajo de 2^53.
+        rest = (hashed & np.uint64((1 << shift) - 1)).astype(np.float64)
+        ranks = (shift + 1 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self._registers, (hashed >> np.uint64(shift)).astype(np.intp), ranks)
+        for row, column in enumerate(columns):
+            np.add.at(self._occurrences[row], column, occurrences)
+            np.add.at(self._patients[row], column, patients)
+
+        estimates = self._estimate(self._occurrences, columns)
+        pool = np.union1d(self._candidates, codes[estimates >= self._floor])
+        if len(pool) > CANDIDATE_FACTOR * self.top_k:
+            pool_columns = self._columns(pool)[1]
+            pool_estimates = self._estimate(self._occurrences, pool_columns)
+            # El mismo orden que :func:`_ranking`: apariciones, pacientes y código menor.
+            order = np.lexsort((-pool, self._estimate(self._patients, pool_columns), pool_estimates))
+            kept = order[-self.top_k :]
+            pool = pool[kept]
+            self._floor = int(pool_estimates[kept[0]])
+        self._candidates = pool
+
+    def top(self, k: int) -> List[PairCount]:
+        self.flush()
+        occurrences_error = math.ceil(math.e / self.width * self.total)
+        patients_error = math.ceil(math.e / self.width * self.exposures)
+        columns = self._columns(self._candidates)[1]
+        occurrences = self._estimate(self._occurrences, columns).tolist()
+        patients = self._estimate(self._patients, columns).tolist()
+        counts = [
+            (code, occurrence, min(occurrences_error, occurrence), patient, min(patients_error, patient))
+            for code, occurrence, patient in zip(self._candidates.tolist(), occurrences, patients)
+        ]
+        return heapq.nlargest(k, counts, key=_ranking)
+
+    def distinct(self) -> Tuple[int, int]:
+        """Estimación HyperLogLog de los pares distintos y su error típico."""
+
+        self.flush()
+        np = self._np
+        size = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / float(np.exp2(-self._registers.astype(np.float64)).sum())
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if estimate <= 2.5 * size and zeros:
+            # Corrección para pocos elementos: conteo lineal de registros vacíos.
+            estimate = size * math.log(size / zeros)
+        return round(estimate), math.ceil(1.04 / math.sqrt(size) * estimate)
+
+
+class PairStatistics:
+    """Top-K de pares y pacientes expuestos por ventana, exacto o aproximado.
+
+    ``labels`` nombra las ventanas en el orden en que :meth:`add_patient`
+    recibe sus conteos (:func:`statistics_labels`). Con ``mode ==
+    STATS_SKETCH`` la memoria del modo (:func:`sketch_footprint`) queda por
+    debajo de ``memory_mb``.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        mode: str = STATS_EXACT,
+        top_k: int = DEFAULT_TOP_K,
+        memory_mb: float = DEFAULT_MEMORY_MB,
+    ) -> None:
+        if mode not in STATS_MODES:
+            raise ValueError(f"Modo de estadísticas desconocido {mode!r}")
+        self.labels = list(labels)
+        self.mode = mode
+        self.top_k = top_k
+        self.patients = 0
+        self.windows: List[Union[ExactWindow, SketchWindow]]
+        if mode == STATS_SKETCH:
+            self.width = sketch_width(memory_mb, len(self.labels), top_k)
+            self.windows = [SketchWindow(self.width, top_k) for _ in self.labels]
+        else:
+            self.width = 0
+            self.windows = [ExactWindow() for _ in self.labels]
+
+    @property
+    def confidence(self) -> float:
+        """Probabilidad con la que se cumplen los márgenes de error del Count-Min Sketch."""
+
+        return 1.0 if self.mode == STATS_EXACT else 1 - math.exp(-SKETCH_DEPTH)
+
+    def add_patient(self, counts: Sequence[Mapping[int, int]]) -> None:
+        """Añade las apariciones de cada par de un paciente, una colección por ventana."""
+
+        self.patients += 1
+        for window, window_counts in zip(self.windows, counts):
+            if window_counts:
+                window.add(window_counts)
+
+    def summaries(self) -> List[WindowSummary]:
+        summaries = []
+        for label, window in zip(self.labels, self.windows):
+            distinct, error = window.distinct()
+            summaries.append(WindowSummary(label, window.exposed, window.total, distinct, error))
+        return summaries
+
+    def top_pairs(self) -> List[PairEstimate]:
+        """Los ``top_k`` pares con más apariciones de cada ventana."""
+
+        estimates = []
+        for label, window in zip(self.labels, self.windows):
+            for rank, counts in enumerate(window.top(self.top_k), start=1):
+                estimates.append(PairEstimate(label, rank, *counts))
+        return estimates
+
+
+def write_pair_statistics(path: Path, statistics: PairStatistics, vocabulary: Vocabulary) -> List[PairEstimate]:
+    """Escribe el top-K de cada ventana como TSV y devuelve sus filas."""
+
+    estimates = statistics.top_pairs()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle, delimiter="\t", lineterminator="\n")
+        writer.writerow(STATISTICS_COLUMNS)
+        for estimate in estimates:
+            writer.writerow(
+                [
+                    estimate.window,
+                    estimate.rank,
+                    vocabulary.render_pair(estimate.code),
+                    estimate.occurrences,
+                    estimate.occurrences_error,
+                    estimate.patients,
+                    estimate.patients_error,
+                ]
+            )
+    return estimates
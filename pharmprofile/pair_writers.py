@@ -0,0 +1,290 @@
+"""Escritores de resultados de combinaciones.
+
+Las listas de texto se escribían construyendo una única cadena con
+``"\\n".join(...)`` (y, en ``Interact_Detect.py``, ordenando antes el
+conjunto completo), de modo que el pico de memoria duplicaba el tamaño de
+la salida. Aquí se ofrecen tres escritores intercambiables:
+
+* :func:`write_lines` vuelca las líneas por bloques a un archivo con búfer,
+  con el mismo contenido byte a byte que la versión con ``join``.
+* :func:`external_sort` ordena por tramos: cada tramo se ordena en memoria y,
+  si hay más de uno, se vuelca a un temporal y se mezclan con
+  :func:`heapq.merge`. Con un único tramo no se toca el disco.
+* :class:`ColumnarPairWriter` guarda cada aparición de un par en Parquet o
+  Arrow con columnas de paciente, ventana, fechas y medicamentos (código y
+  nombre), listas para cargarse sin analizar texto. Requiere ``pyarrow`` y,
+  para clasificar los pares por ventana, ``numpy``.
+"""
+from __future__ import annotations
+
+import logging
+from array import array
+from datetime import datetime
+from itertools import chain, islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from pharmprofile.vocabulary import PAIR_MASK, PAIR_SHIFT, Vocabulary
+from pharmprofile.window_engine import (
+    DEFAULT_OFFSET_DAYS,
+    DEFAULT_ROLLING_HOURS,
+    bucket_pairs,
+    hours_to_microseconds,
+    window_labels,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+TEXT_BUFFER_SIZE = 1 << 20
+TEXT_CHUNK_LINES = 65_536
+DEFAULT_RUN_SIZE = 1_000_000
+MERGE_FAN_IN = 64
+COLUMNAR_BATCH_ROWS = 65_536
+PARQUET_SUFFIX = ".parquet"
+_SPILL_BATCH_SIZE = 10_000
+
+
+def write_lines(
+    path: Path,
+    values: Iterable[str],
+    append: bool = False,
+    encoding: Optional[str] = None,
+    buffer_size: int = TEXT_BUFFER_SIZE,
+) -> int:
+    """Escribe ``values`` separados por saltos de línea, sin salto final.
+
+    Las líneas se escriben en bloques de ``TEXT_CHUNK_LINES``, así que nunca
+    se construye la salida completa en memoria. Con ``append`` y un archivo
+    existente, las líneas se añaden al final (con un salto de línea delante si
+    el archivo no está vacío). Devuelve el número de líneas escritas.
+    """
+
+    append = append and path.exists()
+    separator = append and path.stat().st_size > 0
+    iterator = iter(values)
+    written = 0
+    with path.open("a" if append else "w", encoding=encoding, buffering=buffer_size) as handle:
+        while True:
+            chunk = list(islice(iterator, TEXT_CHUNK_LINES))
+            if not chunk:
+                break
+            if separator:
+                handle.write("\n")
+            handle.write("\n".join(chunk))
+            separator = True
+            written += len(chunk)
+    return written
+
+
+def external_sort(values: Iterable[str], run_size: int = DEFAULT_RUN_SIZE) -> Iterator[str]:
+    """Devuelve ``values`` ordenados con como mucho ``run_size`` elementos en memoria.
+
+    Si todo cabe en un tramo se ordena en memoria sin más; si no, cada tramo
+    ordenado se vuelca a un directorio temporal que se borra al agotar (o
+    cerrar) el iterador devuelto.
+    """
+
+    iterator = iter(values)
+    first = sorted(islice(iterator, run_size))
+    sentinel = object()
+    following = next(iterator, sentinel)
+    if following is sentinel:
+        return iter(first)
+    return _merge_runs(first, chain([following], iterator), run_size)
+
+
+def _merge_runs(first: List[str], iterator: Iterator[str], run_size: int) -> Iterator[str]:
+    # Los temporales y la mezcla sólo se cargan cuando la lista no cabe en un tramo.
+    import heapq
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="orden_externo_") as directory:
+        paths = []
+        run = first
+        while run:
+            paths.append(Path(directory) / f"tramo_{len(paths)}.pickle")
+            _spill_run(paths[-1], run)
+            run = sorted(islice(iterator, run_size))
+        LOGGER.debug("Mezclando %s tramos ordenados de hasta %s elementos", len(paths), run_size)
+        # Con muchos tramos se mezclan por grupos para no agotar los descriptores de archivo.
+        generation = 0
+        while len(paths) > MERGE_FAN_IN:
+            generation += 1
+            merged = []
+            for start in range(0, len(paths), MERGE_FAN_IN):
+                merged.append(Path(directory) / f"mezcla_{generation}_{len(merged)}.pickle")
+                _spill_run(merged[-1], heapq.merge(*(_read_run(path) for path in paths[start : start + MERGE_FAN_IN])))
+                for path in paths[start : start + MERGE_FAN_IN]:
+                    path.unlink()
+            paths = merged
+        yield from heapq.merge(*(_read_run(path) for path in paths))
+
+
+def _spill_run(path: Path, run: Iterable[str]) -> None:
+    import pickle
+
+    iterator = iter(run)
+    with path.open("wb") as handle:
+        while True:
+            batch = list(islice(iterator, _SPILL_BATCH_SIZE))
+            if not batch:
+                break
+            pickle.dump(batch, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path: Path) -> Iterator[str]:
+    import pickle
+
+    with path.open("rb") as handle:
+        while True:
+            try:
+                batch = pickle.load(handle)
+            except EOFError:
+                return
+            yield from batch
+
+
+# Módulos opcionales que necesita :class:`ColumnarPairWriter`.
+COLUMNAR_REQUIREMENTS = ("pyarrow", "numpy")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:  # pragma: no cover - dependencia opcional
+        raise RuntimeError("La salida columnar requiere pyarrow (pip install pyarrow)") from exc
+    return pyarrow
+
+
+class ColumnarPairWriter:
+    """Escribe en Parquet (``.parquet``) o Arrow IPC (cualquier otra extensión) los pares de cada paciente.
+
+    Cada fila es la aparición de un par de medicamentos entre dos
+    administraciones: paciente, ventana (``24h``, desplazamiento o ventana
+    móvil), instante de cada administración, código de cada medicamento en el
+    vocabulario de la ejecución (el mismo que numera las etiquetas de las
+    matrices ``.npz``) y su nombre. El par sigue el orden de las listas de
+    texto y cada fecha acompaña a su medicamento.
+
+    Los pares de administraciones se clasifican con
+    :func:`window_engine.bucket_pairs` (NumPy); ``exact_offset`` y ``forward_only``
+    tienen el mismo significado allí. Con ``fold_case`` se descartan los
+    medicamentos iguales salvo mayúsculas; sin él, sólo los idénticos.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        vocabulary: Vocabulary,
+        rolling_hours: int = DEFAULT_ROLLING_HOURS,
+        offset_days: int = DEFAULT_OFFSET_DAYS,
+        exact_offset: bool = True,
+        forward_only: bool = False,
+        fold_case: bool = False,
+        batch_rows: int = COLUMNAR_BATCH_ROWS,
+    ) -> None:
+        pa = self._pa = _pyarrow()
+        self.path = path
+        self.vocabulary = vocabulary
+        self.offset_days = offset_days
+        self.exact_offset = exact_offset
+        self.forward_only = forward_only
+        self.fold_case = fold_case
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self.patients = 0
+        self._rolling = hours_to_microseconds(rolling_hours)
+        self._labels = pa.array(window_labels(rolling_hours, offset_days), pa.string())
+        self._names = pa.array([], pa.string())
+        self._pending: list = []
+        self._pending_rows = 0
+        self.schema = pa.schema(
+            [
+                ("patient", pa.string()),
+                ("window", pa.dictionary(pa.int8(), pa.string())),
+                ("first_time", pa.timestamp("us")),
+                ("second_time", pa.timestamp("us")),
+                ("first_id", pa.int32()),
+                ("second_id", pa.int32()),
+                ("first", pa.string()),
+                ("second", pa.string()),
+            ]
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix.lower() == PARQUET_SUFFIX:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self.schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), self.schema)
+
+    def __enter__(self) -> "ColumnarPairWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+    def write_patient(self, patient: str, timestamps: Sequence[datetime], medications: Sequence[Sequence[int]]) -> int:
+        """Añade las filas de un paciente; devuelve cuántas son."""
+
+        first, second, buckets = bucket_pairs(
+            timestamps, self._rolling, self.offset_days, self.exact_offset, self.forward_only
+        )
+        pack = self.vocabulary.pack_pair
+        key = self.vocabulary.folded if self.fold_case else None
+        first_rows, second_rows, codes, windows = array("q"), array("q"), array("q"), array("b")
+        for index_a, index_b, bucket in zip(first.tolist(), second.tolist(), buckets.tolist()):
+            for med_a in medications[index_a]:
+                for med_b in medications[index_b]:
+                    if med_a == med_b or (key is not None and key[med_a] == key[med_b]):
+                        continue
+                    code = pack(med_a, med_b)
+                    swapped = code >> PAIR_SHIFT != med_a
+                    first_rows.append(index_b if swapped else index_a)
+                    second_rows.append(index_a if swapped else index_b)
+                    codes.append(code)
+                    windows.append(bucket)
+        if not codes:
+            return 0
+
+        # ``bucket_pairs`` ya ha comprobado que numpy está disponible.
+        import numpy as np
+
+        pa = self._pa
+        code_array = np.frombuffer(codes, dtype=np.int64)
+        first_ids = (code_array >> PAIR_SHIFT).astype(np.int32)
+        second_ids = (code_array & PAIR_MASK).astype(np.int32)
+        if len(self._names) != len(self.vocabulary):
+            self._names = pa.array(self.vocabulary.names, pa.string())
+        times = pa.array(timestamps, pa.timestamp("us"))
+        batch = pa.record_batch(
+            [
+                pa.array([patient] * len(codes), pa.string()),
+                pa.DictionaryArray.from_arrays(pa.array(np.frombuffer(windows, dtype=np.int8)), self._labels),
+                times.take(pa.array(np.frombuffer(first_rows, dtype=np.int64))),
+                times.take(pa.array(np.frombuffer(second_rows, dtype=np.int64))),
+                pa.array(first_ids),
+                pa.array(second_ids),
+                self._names.take(pa.array(first_ids)),
+                self._names.take(pa.array(second_ids)),
+            ],
+            schema=self.schema,
+        )
+        self._pending.append(batch)
+        self._pending_rows += len(codes)
+        self.rows += len(codes)
+        self.patients += 1
+        if self._pending_rows >= self.batch_rows:
+            self._flush()
+        return len(codes)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        self._writer.write_table(self._pa.Table.from_batches(self._pending, self.schema))
+        self._pending = []
+        self._pending_rows = 0
@@ -0,0 +1,380 @@
+"""Orquestación de las etapas comunes a ``cic`` y ``detect``.
+
+Ambos scripts leen el plan paciente a paciente, exportan ``drug.xml``,
+calculan las combinaciones con :func:`engine.analyse` y, según la orden y las
+opciones, abren el estado incremental, el cribado, la salida columnar y las
+estadísticas de pares; en modo lote repiten lo mismo para cada plan. Este
+módulo hace ese recorrido una sola vez. Lo que distingue a cada script (su
+:class:`~pharmprofile.engine.CompatibilityProfile`, el lector del plan, los
+nombres de archivo, cómo se escriben las listas de pares y el idioma de los
+mensajes) llega en un :class:`Pipeline`; los módulos ``cic`` y ``detect`` se
+quedan con la línea de órdenes y sus formatos de salida.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import partial
+from importlib.util import find_spec
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+from pharmprofile.batch import (
+    STATUS_EMPTY,
+    STATUS_FAILED,
+    STATUS_OK,
+    expand_sources,
+    open_shared_index,
+    run_sources,
+    write_cohort_summary,
+)
+from pharmprofile.engine import (
+    COMMAND_ALL,
+    COMMAND_COMBOS,
+    COMMAND_INGEST,
+    COMMAND_INTERACTIONS,
+    COMMAND_SCREEN,
+    CombinationResults,
+    CompatibilityProfile,
+    DrugXmlWriter,
+    PatientSchedule,
+    analyse,
+)
+from pharmprofile.pair_stats import STATS_SKETCH, minimum_sketch_memory_mb, statistics_labels
+from pharmprofile.pair_writers import COLUMNAR_REQUIREMENTS, ColumnarPairWriter
+from pharmprofile.run_report import RunReport
+from pharmprofile.vocabulary import Vocabulary
+
+if TYPE_CHECKING:
+    from pharmprofile.incremental import IncrementalState
+    from pharmprofile.pair_stats import PairStatistics
+    from pharmprofile.screening import Screening
+    from pharmprofile.timestamps import TimestampParser
+
+ScheduleReader = Callable[[Path, str, Vocabulary, bool, "TimestampParser"], Iterator[PatientSchedule]]
+CombinationWriter = Callable[[argparse.Namespace, CombinationResults, Optional["IncrementalState"]], None]
+# Escribe las interacciones del perfil; un valor verdadero indica un error.
+InteractionWriter = Callable[[argparse.Namespace, RunReport], Any]
+
+
+@dataclass(frozen=True)
+class Messages:
+    """Textos de registro y de error de la línea de órdenes de un script.
+
+    Los mensajes de registro usan el formato de ``logging`` con los argumentos
+    en el orden indicado; los de error de argumentos, ``str.format``.
+    """
+
+    no_events: str
+    missing_drugbank: str  # ruta de DrugBank
+    pool: str  # tareas, procesos, segundos de cálculo, segundos de reloj, aceleración estimada, eficiencia en %
+    xml_written: str  # ruta
+    columnar_written: str  # filas, pacientes, ruta
+    screening_written: str  # registros, pacientes, ruta
+    window_summary: str  # ventana, apariciones, pares distintos, error, pacientes
+    top_pairs: str  # top-k, modo, confianza, ruta
+    no_sources: str
+    batch_start: str  # planes, procesos
+    source_status: str  # subdirectorio, ruta, hoja, estado
+    source_failed: str  # ruta, hoja, excepción
+    summary_written: str  # planes, ruta
+    requires_incremental: str  # {option}
+    not_incremental: str  # {option}
+    not_positive: str
+    sketch_memory: str  # {memory}, {windows}, {top_k}, {minimum}
+    missing_modules: str  # {option}, {modules}
+
+
+@dataclass(frozen=True)
+class Pipeline:
+    """Lo que cada script aporta a las etapas comunes.
+
+    ``read`` produce los pacientes del plan; ``write_combinations`` escribe
+    las listas de pares dentro de la etapa ``write``. Con ``require_events``
+    un plan sin eventos se da por vacío y no escribe nada; con
+    ``optional_drugbank`` el cribado se omite con un aviso si falta el XML
+    de DrugBank en lugar de fallar. Todo el objeto se envía a los procesos
+    del lote, así que sus funciones deben ser de nivel de módulo.
+    """
+
+    profile: CompatibilityProfile
+    read: ScheduleReader
+    write_combinations: CombinationWriter
+    messages: Messages
+    logger: logging.Logger
+    xml_filename: str
+    state_filename: str
+    screening_filename: str
+    pair_stats_filename: str
+    summary_filename: str
+    require_events: bool
+    optional_drugbank: bool
+
+
+def validate_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace, pipeline: Pipeline) -> None:
+    """Rechaza con ``parser.error`` las combinaciones de opciones no admitidas."""
+
+    messages = pipeline.messages
+    if args.full_rebuild and not args.incremental:
+        parser.error(messages.requires_incremental.format(option="--full-rebuild"))
+    if args.incremental:
+        for option, value in (
+            ("--patient-counts", getattr(args, "patient_counts", False)),
+            ("--columnar", args.columnar is not None),
+            ("--pair-stats", args.pair_stats is not None),
+        ):
+            if value:
+                parser.error(messages.not_incremental.format(option=option))
+    if args.columnar is not None:
+        # ``find_spec`` localiza los módulos sin importarlos.
+        missing = [name for name in COLUMNAR_REQUIREMENTS if find_spec(name) is None]
+        if missing:
+            parser.error(messages.missing_modules.format(option="--columnar", modules=" ".join(missing)))
+    if args.top_k < 1 or args.pair_stats_memory <= 0:
+        parser.error(messages.not_positive)
+    if args.pair_stats == STATS_SKETCH:
+        windows = len(
+            statistics_labels(
+                args.window_hours, args.offset_days, pipeline.profile.same_slot_pairs, dict.fromkeys(args.window)
+            )
+        )
+        minimum = minimum_sketch_memory_mb(windows, args.top_k)
+        if args.pair_stats_memory < minimum:
+            parser.error(
+                messages.sketch_memory.format(
+                    memory=args.pair_stats_memory, windows=windows, top_k=args.top_k, minimum=minimum
+                )
+            )
+
+
+def analyse_schedule(args: argparse.Namespace, report: RunReport, pipeline: Pipeline) -> bool:
+    """Lee el plan y ejecuta las etapas de ``args.command``; ``False`` si el plan está vacío.
+
+    Los errores se propagan; los escritores abiertos se cierran antes.
+    """
+
+    from pharmprofile.timestamps import TimestampParser
+
+    profile, messages, log = pipeline.profile, pipeline.messages, pipeline.logger
+    combine = args.command in (COMMAND_ALL, COMMAND_COMBOS)
+    export_xml = getattr(args, "xml", True) and args.command in (COMMAND_ALL, COMMAND_INGEST)
+    screen = args.command == COMMAND_SCREEN or (args.screen and combine)
+    vocabulary = Vocabulary()
+    parser = TimestampParser()
+    schedules = report.iterate(
+        "read",
+        pipeline.read(args.excel, args.sheet, vocabulary, args.grouped_input, parser),
+        "patients",
+        lambda schedule: len(schedule.timestamps),
+        "administrations",
+    )
+    if pipeline.require_events:
+        first = next(schedules, None)
+        if first is None:
+            log.error(messages.no_events)
+            return False
+        schedules = chain([first], schedules)
+
+    output_dir = args.output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Cada paciente se exporta y se analiza antes de leer el siguiente.
+    combinations = CombinationResults.empty(vocabulary, profile, args.window)
+    xml_path = output_dir / pipeline.xml_filename
+    state = _open_state(args, combinations, pipeline) if args.incremental and combine else None
+    screening = _open_screening(args, vocabulary, pipeline) if screen else None
+    columnar = (
+        ColumnarPairWriter(
+            args.columnar,
+            vocabulary,
+            args.window_hours,
+            args.offset_days,
+            profile.exact_offset,
+            profile.forward_only,
+            profile.fold_case,
+        )
+        if args.columnar is not None and combine
+        else None
+    )
+    statistics = _open_statistics(args, combinations) if args.pair_stats is not None and combine else None
+    with state if state is not None else nullcontext(), screening if screening is not None else nullcontext():
+        xml_context = DrugXmlWriter(xml_path, vocabulary, profile.sort_xml_by_time) if export_xml else nullcontext()
+        with xml_context as xml_writer, columnar if columnar is not None else nullcontext():
+            stats = analyse(
+                schedules,
+                combinations,
+                profile,
+                report,
+                args.window_hours,
+                args.offset_days,
+                xml_writer=xml_writer,
+                screening=screening,
+                columnar=columnar,
+                state=state,
+                workers=args.workers,
+                vectorized=args.vectorized,
+                combine=combine,
+                statistics=statistics,
+            )
+        if stats is not None:
+            log.info(
+                messages.pool,
+                stats.tasks,
+                stats.workers,
+                stats.busy_seconds,
+                stats.wall_seconds,
+                stats.speedup,
+                stats.parallel_efficiency * 100,
+            )
+        report.count("read", "timestamp_failures", parser.failures)
+        report.count("read", "timestamp_cache_hits", parser.hits)
+        report.count("read", "timestamp_cache_misses", parser.misses)
+        if export_xml:
+            log.info(messages.xml_written, xml_path)
+        if columnar is not None:
+            log.info(messages.columnar_written, columnar.rows, columnar.patients, columnar.path)
+            report.count("columnar", "rows", columnar.rows)
+        if screening is not None:
+            log.info(
+                messages.screening_written, screening.writer.records, screening.writer.patients, screening.writer.path
+            )
+            report.count("screening", "records", screening.writer.records)
+            report.count("screening", "cache_hits", screening.lookup.hits)
+            report.count("screening", "cache_misses", screening.lookup.misses)
+        if not combine:
+            return True
+        if statistics is not None:
+            write_statistics(statistics, vocabulary, output_dir / pipeline.pair_stats_filename, report, pipeline)
+
+        with report.stage("write") as stage:
+            pipeline.write_combinations(args, combinations, state)
+            stage.counters["pairs_24h"] = len(combinations.same_day)
+            stage.counters["pairs_offset"] = len(combinations.offset)
+            stage.counters["pairs_rolling"] = len(combinations.rolling)
+            if combinations.same_slot is not None:
+                stage.counters["pairs_same_slot"] = len(combinations.same_slot)
+            for spec, pairs in combinations.windows.items():
+                stage.counters[f"pairs_{spec.label}"] = len(pairs)
+    return True
+
+
+def _open_state(args: argparse.Namespace, combinations: CombinationResults, pipeline: Pipeline) -> IncrementalState:
+    from pharmprofile.incremental import IncrementalState
+
+    settings = {
+        "excel": str(args.excel.resolve()),
+        "sheet": args.sheet,
+        "window_hours": args.window_hours,
+        "offset_days": args.offset_days,
+    }
+    if combinations.windows:
+        settings["windows"] = [spec.label for spec in combinations.windows]
+    return IncrementalState(args.output_dir / pipeline.state_filename, settings, rebuild=args.full_rebuild)
+
+
+def _open_screening(args: argparse.Namespace, vocabulary: Vocabulary, pipeline: Pipeline) -> Optional[Screening]:
+    if pipeline.optional_drugbank and not args.drugbank.exists():
+        pipeline.logger.warning(pipeline.messages.missing_drugbank, args.drugbank)
+        return None
+    from pharmprofile.screening import Screening
+
+    return Screening.open(
+        args.drugbank,
+        args.output_dir / pipeline.screening_filename,
+        vocabulary,
+        args.drugbank_index,
+        args.rebuild_index,
+        policy=args.screen_match,
+        rolling_hours=args.window_hours,
+        offset_days=args.offset_days,
+        exact_offset=pipeline.profile.exact_offset,
+    )
+
+
+def _open_statistics(args: argparse.Namespace, combinations: CombinationResults) -> PairStatistics:
+    from pharmprofile.pair_stats import PairStatistics
+
+    labels = statistics_labels(
+        args.window_hours, args.offset_days, combinations.same_slot is not None, combinations.windows
+    )
+    return PairStatistics(labels, args.pair_stats, args.top_k, args.pair_stats_memory)
+
+
+def write_statistics(
+    statistics: PairStatistics, vocabulary: Vocabulary, path: Path, report: RunReport, pipeline: Pipeline
+) -> None:
+    """Escribe las estadísticas de pares y registra el resumen de cada ventana."""
+
+    from pharmprofile.pair_stats import write_pair_statistics
+
+    messages, log = pipeline.messages, pipeline.logger
+    with report.stage("pair_stats") as stage:
+        write_pair_statistics(path, statistics, vocabulary)
+        for summary in statistics.summaries():
+            log.info(
+                messages.window_summary,
+                summary.window,
+                summary.occurrences,
+                summary.distinct_pairs,
+                summary.distinct_pairs_error,
+                summary.patients,
+            )
+            stage.counters[f"distinct_pairs_{summary.window}"] = summary.distinct_pairs
+        stage.counters["patients"] = statistics.patients
+    log.info(messages.top_pairs, statistics.top_k, statistics.mode, statistics.confidence, path)
+
+
+def run_batch(
+    args: argparse.Namespace, report: RunReport, pipeline: Pipeline, write_interactions: InteractionWriter
+) -> int:
+    """Analiza cada plan del lote en su subdirectorio y escribe el resumen de la cohorte.
+
+    Las interacciones del perfil no dependen del plan: ``write_interactions``
+    las escribe una sola vez en ``--output-dir``. Devuelve 1 si no hay planes,
+    si fallan las interacciones o si falla algún plan.
+    """
+
+    messages, log = pipeline.messages, pipeline.logger
+    sources = expand_sources(args.batch, args.batch_manifest, args.sheet)
+    if not sources:
+        log.error(messages.no_sources)
+        return 1
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    args = open_shared_index(args, report)
+    if args.command in (COMMAND_ALL, COMMAND_INTERACTIONS) and write_interactions(args, report):
+        return 1
+    if args.command == COMMAND_INTERACTIONS:
+        return 0
+
+    log.info(messages.batch_start, len(sources), args.workers)
+    results = []
+    with report.stage("batch") as stage:
+        for result in run_sources(partial(analyse_source, pipeline=pipeline), args, sources, args.workers):
+            source = result.source
+            log.info(messages.source_status, source.label, source.path, source.sheet, result.status)
+            results.append(result)
+        failed = sum(result.status == STATUS_FAILED for result in results)
+        stage.counters["sources"] = len(results)
+        stage.counters["failed"] = failed
+    summary_path = args.output_dir / pipeline.summary_filename
+    write_cohort_summary(summary_path, results)
+    log.info(messages.summary_written, len(results), summary_path)
+    return 1 if failed else 0
+
+
+def analyse_source(args: argparse.Namespace, pipeline: Pipeline) -> Tuple[str, Dict[str, Any]]:
+    """Tarea de un plan del lote: devuelve su estado y su informe de ejecución.
+
+    Un error en cualquier etapa del plan lo marca como fallido sin detener el lote.
+    """
+
+    report = RunReport(args.trace_memory)
+    try:
+        status = STATUS_OK if analyse_schedule(args, report, pipeline) else STATUS_EMPTY
+    except Exception as exc:  # pylint: disable=broad-except
+        pipeline.logger.error(pipeline.messages.source_failed, args.excel, args.sheet, exc)
+        status = STATUS_FAILED
+    return status, report.as_dict()
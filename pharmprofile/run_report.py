@@ -0,0 +1,196 @@
+"""Instrumentación por etapas e informe de ejecución en JSON.
+
+Cada etapa del pipeline (lectura, XML, combinaciones, escritura, DrugBank...)
+se mide con :meth:`RunReport.stage`, un gestor de contexto que acumula el
+tiempo de todas sus entradas, de modo que sirve también para etapas que se
+intercalan paciente a paciente. El tiempo es *propio*: si una etapa se abre
+dentro de otra (por ejemplo, la lectura de la hoja mientras se combinan
+pacientes), su duración se descuenta de la exterior. :meth:`RunReport.iterate`
+mide el tiempo pasado dentro de un iterador, como la lectura en streaming.
+
+La memoria se muestrea al salir de las etapas de primer nivel: el RSS máximo
+del proceso se consulta una vez y se asigna a la etapa y a todas las que se
+abrieron dentro de ella. Si se activa ``trace_memory``, cada etapa guarda
+además el pico de ``tracemalloc`` durante la etapa; una etapa anidada
+reinicia el pico, así que el de la exterior se guarda antes y se combina al
+salir.
+Además de tiempos y memoria, cada etapa guarda contadores libres (filas,
+pares emitidos, aciertos de caché...).
+"""
+from __future__ import annotations
+
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - no disponible en Windows
+    resource = None
+
+T = TypeVar("T")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Memoria residente máxima del proceso en MB, si la plataforma la expone."""
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB y macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class StageStats:
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    peak_traced_mb: Optional[float] = None
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_traced_mb": self.peak_traced_mb,
+            "counters": self.counters,
+        }
+
+
+class RunReport:
+    """Tiempos, memoria y contadores por etapa de una ejecución."""
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self._stages: Dict[str, StageStats] = {}
+        # Pila de [etapa, instante de entrada, tiempo de las etapas anidadas, pico anidado].
+        self._stack: List[list] = []
+        # Etapas abiertas dentro de la de primer nivel en curso; reciben su muestra de RSS.
+        self._nested: Dict[str, StageStats] = {}
+        # tracemalloc sólo se carga si se pide medir la memoria Python.
+        self._tracemalloc = None
+        if trace_memory:
+            import tracemalloc
+
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def _stats(self, name: str) -> StageStats:
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = StageStats(name)
+        return stats
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stats = self._stats(name)
+        if self.trace_memory:
+            if self._stack:
+                # reset_peak también borra el pico de la etapa exterior: se guarda antes.
+                parent = self._stack[-1]
+                parent[3] = max(parent[3], self._tracemalloc.get_traced_memory()[1])
+            self._tracemalloc.reset_peak()
+        if self._stack:
+            self._nested[name] = stats
+        frame = [stats, time.perf_counter(), 0.0, 0]
+        self._stack.append(frame)
+        try:
+            yield stats
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            stats.calls += 1
+            stats.seconds += elapsed - frame[2]
+            if not self._stack:
+                stats.peak_rss_mb = peak_rss_mb()
+                for nested in self._nested.values():
+                    nested.peak_rss_mb = stats.peak_rss_mb
+                self._nested.clear()
+            traced_peak = 0
+            if self.trace_memory:
+                traced_peak = max(self._tracemalloc.get_traced_memory()[1], frame[3])
+                megabytes = round(traced_peak / (1024 * 1024), 3)
+                stats.peak_traced_mb = max(stats.peak_traced_mb or 0.0, megabytes)
+            if self._stack:
+                parent = self._stack[-1]
+                parent[2] += elapsed
+                parent[3] = max(parent[3], traced_peak)
+
+    def iterate(
+        self,
+        name: str,
+        iterable: Iterable[T],
+        counter: str = "items",
+        size: Optional[Callable[[T], int]] = None,
+        size_counter: str = "size",
+    ) -> Iterator[T]:
+        """Recorre ``iterable`` contando como etapa ``name`` el tiempo de cada ``next``.
+
+        El número de elementos producidos se acumula en el contador ``counter``
+        y, si se indica ``size``, la suma de ``size(elemento)`` en ``size_counter``.
+        """
+
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stats:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                stats.counters[counter] = stats.counters.get(counter, 0) + 1
+                if size is not None:
+                    stats.counters[size_counter] = stats.counters.get(size_counter, 0) + size(item)
+            yield item
+
+    def count(self, stage: str, counter: str, value: int = 1) -> None:
+        counters = self._stats(stage).counters
+        counters[counter] = counters.get(counter, 0) + value
+
+    def as_dict(self) -> Dict[str, object]:
+        import platform
+
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "command": sys.argv,
+            "python": platform.python_version(),
+            "total_seconds": round(time.perf_counter() - self._start, 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "trace_memory": self.trace_memory,
+            "stages": [stats.as_dict() for stats in self._stages.values()],
+        }
+
+    def write(self, path: Path) -> None:
+        import json
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.as_dict(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+@contextmanager
+def profiled(path: Optional[Path]) -> Iterator[None]:
+    """Ejecuta el bloque bajo ``cProfile`` y vuelca las estadísticas en ``path`` (si se indica)."""
+
+    if path is None:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(path))
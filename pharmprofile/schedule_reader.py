@@ -0,0 +1,188 @@
+"""Lectura en streaming del plan de medicación por lotes de paciente.
+
+El plan tiene siempre la misma disposición de cuatro columnas (fecha, hora,
+paciente y medicamentos separados por guiones bajos) y puede venir de un
+libro de Excel, de un CSV o de un Parquet exportado. Las filas se leen de una
+en una (openpyxl en modo ``read_only``, ``csv`` y ``iter_batches`` de
+pyarrow) y :func:`group_by_patient` las reparte en lotes por paciente para que
+el análisis avance paciente a paciente con memoria acotada.
+
+Si las filas no vienen agrupadas por paciente, los registros se vuelcan a una
+base SQLite temporal y se releen ordenados por primera aparición del paciente
+y por orden de fila; así sólo el lote del paciente en curso vive en memoria.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+CSV_SUFFIX = ".csv"
+PARQUET_SUFFIX = ".parquet"
+ROW_WIDTH = 4
+PARQUET_BATCH_SIZE = 65_536
+_SPILL_BATCH_SIZE = 10_000
+
+Row = Tuple[Any, Any, Any, Any]
+T = TypeVar("T")
+
+
+def iter_schedule_rows(path: Path, sheet_name: Optional[str] = None, skip_header: bool = False) -> Iterator[Row]:
+    """Devuelve un iterador sobre las cuatro primeras columnas de cada fila.
+
+    El formato se elige por la extensión. Las comprobaciones (archivo y hoja
+    existentes) se hacen al llamar a la función, no al empezar a iterar.
+    ``skip_header`` descarta la primera fila de Excel y CSV; en Parquet los
+    nombres de columna nunca forman parte de los datos.
+    """
+
+    if not path.exists():
+        raise FileNotFoundError(f"Schedule file not found: {path}")
+    suffix = path.suffix.lower()
+    if suffix == CSV_SUFFIX:
+        return _iter_csv_rows(path, skip_header)
+    if suffix == PARQUET_SUFFIX:
+        return _iter_parquet_rows(path)
+    return _iter_excel_rows(path, sheet_name, skip_header)
+
+
+def list_sheets(path: Path) -> List[str]:
+    """Hojas de un libro de Excel; los CSV y Parquet no tienen hojas."""
+
+    if path.suffix.lower() in (CSV_SUFFIX, PARQUET_SUFFIX):
+        return []
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename=path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _pad(row: Iterable[Any]) -> Row:
+    values = tuple(row)[:ROW_WIDTH]
+    return values + (None,) * (ROW_WIDTH - len(values))  # type: ignore[return-value]
+
+
+def _iter_excel_rows(path: Path, sheet_name: Optional[str], skip_header: bool) -> Iterator[Row]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename=path, read_only=True, data_only=True)
+    if sheet_name is not None and sheet_name not in workbook.sheetnames:
+        workbook.close()
+        raise ValueError(f"Sheet '{sheet_name}' not found in {path}")
+    sheet = workbook[sheet_name] if sheet_name is not None else workbook.active
+
+    def rows() -> Iterator[Row]:
+        try:
+            for row in sheet.iter_rows(min_row=2 if skip_header else 1, values_only=True):
+                yield _pad(row)
+        finally:
+            workbook.close()
+
+    return rows()
+
+
+def _iter_csv_rows(path: Path, skip_header: bool) -> Iterator[Row]:
+    with path.open("r", encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle)
+        if skip_header:
+            next(reader, None)
+        for row in reader:
+            yield _pad(value if value != "" else None for value in row)
+
+
+def _iter_parquet_rows(path: Path) -> Iterator[Row]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:  # pragma: no cover - dependencia opcional
+        raise RuntimeError("Leer Parquet requiere pyarrow (pip install pyarrow)") from exc
+
+    parquet_file = pq.ParquetFile(path)
+    width = min(ROW_WIDTH, len(parquet_file.schema_arrow))
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE):
+        columns = [batch.column(i).to_pylist() for i in range(width)]
+        for values in zip(*columns):
+            yield _pad(values)
+
+
+def group_by_patient(
+    records: Iterable[T],
+    patient_of: Callable[[T], str],
+    grouped: bool = False,
+    spill_dir: Optional[Path] = None,
+) -> Iterator[Tuple[str, List[T]]]:
+    """Agrupa ``records`` en lotes ``(paciente, registros)``.
+
+    Los pacientes salen en orden de primera aparición y los registros de cada
+    uno en su orden original, igual que al agrupar todo en un diccionario.
+    Con ``grouped=True`` se asume que las filas de cada paciente son
+    contiguas y no se usa almacenamiento temporal.
+    """
+
+    if grouped:
+        return _group_contiguous(records, patient_of)
+    return _group_spilled(records, patient_of, spill_dir)
+
+
+def _group_contiguous(records: Iterable[T], patient_of: Callable[[T], str]) -> Iterator[Tuple[str, List[T]]]:
+    seen: set = set()
+    current: Optional[str] = None
+    batch: List[T] = []
+    for record in records:
+        patient = patient_of(record)
+        if patient != current:
+            if batch:
+                yield current, batch  # type: ignore[misc]
+            if patient in seen:
+                raise ValueError(f"Patient {patient!r} is not contiguous; drop the grouped-input option")
+            seen.add(patient)
+            current, batch = patient, []
+        batch.append(record)
+    if batch:
+        yield current, batch  # type: ignore[misc]
+
+
+def _group_spilled(
+    records: Iterable[T], patient_of: Callable[[T], str], spill_dir: Optional[Path]
+) -> Iterator[Tuple[str, List[T]]]:
+    # Sólo el volcado necesita SQLite; las entradas agrupadas no lo cargan.
+    import pickle
+    import sqlite3
+    import tempfile
+
+    patients: Dict[str, int] = {}
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+        connection = sqlite3.connect(Path(tmp) / "spill.sqlite")
+        try:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("CREATE TABLE records (patient INTEGER NOT NULL, payload BLOB NOT NULL)")
+            pending: List[Tuple[int, bytes]] = []
+            for record in records:
+                patient = patients.setdefault(patient_of(record), len(patients))
+                pending.append((patient, pickle.dumps(record, pickle.HIGHEST_PROTOCOL)))
+                if len(pending) >= _SPILL_BATCH_SIZE:
+                    connection.executemany("INSERT INTO records VALUES (?, ?)", pending)
+                    pending.clear()
+            connection.executemany("INSERT INTO records VALUES (?, ?)", pending)
+            connection.execute("CREATE INDEX records_patient ON records (patient)")
+            LOGGER.debug("Volcados registros de %s pacientes en %s", len(patients), tmp)
+
+            names = list(patients)
+            current = -1
+            batch: List[T] = []
+            for patient, payload in connection.execute("SELECT patient, payload FROM records ORDER BY patient, rowid"):
+                if patient != current:
+                    if batch:
+                        yield names[current], batch
+                    current, batch = patient, []
+                batch.append(pickle.loads(payload))
+            if batch:
+                yield names[current], batch
+        finally:
+            connection.close()
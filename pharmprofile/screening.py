@@ -0,0 +1,322 @@
+"""Cribado de las coadministraciones observadas contra las interacciones de DrugBank.
+
+En lugar de escribir las listas de pares y cruzarlas después a mano con
+``interacciones_drugbank.txt``, cada paciente se recorre una vez: los pares
+de medicamentos que comparten ventana se consultan en una tabla hash de
+interacciones y sólo los marcados se escriben, en cuanto aparecen, como
+registros ``paciente / ventana / fechas / par / descripción``.
+
+La tabla se llena bajo demanda a partir del índice compilado de DrugBank:
+cada medicamento del plan se resuelve una sola vez con
+:class:`name_resolver.NameResolver` y sus interacciones quedan en un
+diccionario ``contraparte normalizada -> descripción``; el resultado de cada
+par (marcado o no) se memoriza por los nombres normalizados. Ambas cachés son
+LRU acotadas, de modo que la memoria no depende del tamaño de DrugBank ni del
+número de pares observados, tampoco en el servidor de consultas, donde los
+nombres llegan de los clientes.
+"""
+from __future__ import annotations
+
+import copy
+import csv
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Set, Tuple
+
+from pharmprofile.drugbank_index import DrugBankIndex, normalize_name
+from pharmprofile.name_resolver import MATCH_EXACT, NameResolver
+from pharmprofile.vocabulary import Vocabulary
+from pharmprofile.window_engine import (
+    DEFAULT_OFFSET_DAYS,
+    DEFAULT_ROLLING_HOURS,
+    SortedTimeline,
+    days_to_microseconds,
+    hours_to_microseconds,
+    window_labels,
+)
+
+SCREENING_COLUMNS = ("patient", "window", "first_time", "second_time", "first", "second", "description")
+# Límites de las cachés de :class:`InteractionLookup`: medicamentos cargados
+# del índice (DrugBank tiene del orden de 15.000 entradas) y pares consultados.
+MEDICATION_CACHE_SIZE = 1 << 16
+PAIR_CACHE_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class ScreeningRecord:
+    """Coadministración de un paciente con una interacción conocida."""
+
+    patient: str
+    window: str
+    first_time: datetime
+    second_time: datetime
+    first: str
+    second: str
+    description: str
+
+
+class InteractionLookup:
+    """Tabla hash de interacciones para los medicamentos de un vocabulario.
+
+    Las cachés se indexan por nombre normalizado, no por identificador del
+    vocabulario, así que :meth:`describe_names` consulta nombres sueltos sin
+    internarlos y :meth:`for_vocabulary` reutiliza la tabla con otro
+    vocabulario.
+    """
+
+    def __init__(
+        self,
+        index: DrugBankIndex,
+        vocabulary: Vocabulary,
+        policy: str = MATCH_EXACT,
+        cache_size: int = PAIR_CACHE_SIZE,
+    ) -> None:
+        self._index = index
+        self.vocabulary = vocabulary
+        # La caché de medicamentos ya memoriza cada resolución.
+        self._resolver = NameResolver(index, policy, cache_size=0)
+        self._medication = lru_cache(maxsize=MEDICATION_CACHE_SIZE)(self._load)
+        self._search = lru_cache(maxsize=cache_size)(self._find)
+
+    @property
+    def hits(self) -> int:
+        return self._search.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._search.cache_info().misses
+
+    @property
+    def cached_medications(self) -> int:
+        return self._medication.cache_info().currsize
+
+    @property
+    def cached_pairs(self) -> int:
+        return self._search.cache_info().currsize
+
+    def for_vocabulary(self, vocabulary: Vocabulary) -> "InteractionLookup":
+        """La misma tabla, con sus cachés, sobre otro vocabulario (p. ej. uno por petición)."""
+
+        view = copy.copy(self)
+        view.vocabulary = vocabulary
+        return view
+
+    def _load(self, name: str) -> Tuple[Tuple[str, ...], Dict[str, str]]:
+        # Alias ordenados del medicamento y sus interacciones ``contraparte -> descripción``.
+        aliases = {name}
+        partners: Dict[str, str] = {}
+        for drug_id in self._resolver.resolve(name):
+            aliases.add(normalize_name(self._index.name(drug_id)))
+            for partner, description in self._index.interactions(drug_id):
+                if partner and description:
+                    partners.setdefault(normalize_name(partner), description.strip())
+        return tuple(sorted(aliases)), partners
+
+    def _find(self, first: str, second: str) -> Optional[str]:
+        # DrugBank no siempre lista una interacción en ambos sentidos.
+        for source, target in ((first, second), (second, first)):
+            partners = self._medication(source)[1]
+            description = next((partners[alias] for alias in self._medication(target)[0] if alias in partners), None)
+            if description is not None:
+                return description
+        return None
+
+    def preload(self, medications: Iterable[int]) -> None:
+        """Carga por adelantado las interacciones de ``medications``."""
+
+        for medication in medications:
+            self._medication(self.vocabulary.folded[medication])
+
+    def preload_names(self, names: Iterable[str]) -> None:
+        for name in names:
+            self._medication(normalize_name(name))
+
+    def describe(self, first: int, second: int) -> Optional[str]:
+        """Descripción de la interacción entre dos medicamentos o ``None``.
+
+        Se busca en los dos sentidos, siempre en el orden canónico del par (el
+        de :meth:`Vocabulary.pack_pair`): primero entre las interacciones del
+        medicamento menor y después entre las del mayor. Así la descripción no
+        depende del orden de los argumentos.
+        """
+
+        # ``folded`` es la misma forma en minúsculas que ``normalize_name``.
+        first_name, second_name = self.vocabulary.folded[first], self.vocabulary.folded[second]
+        if first_name <= second_name:
+            return self._search(first_name, second_name)
+        return self._search(second_name, first_name)
+
+    def describe_names(self, first: str, second: str) -> Optional[str]:
+        """Como :meth:`describe`, para nombres que no están en el vocabulario."""
+
+        first, second = normalize_name(first), normalize_name(second)
+        return self._search(first, second) if first <= second else self._search(second, first)
+
+
+def screen_patient(
+    patient: str,
+    timestamps: Sequence[datetime],
+    medications: Sequence[Sequence[int]],
+    lookup: InteractionLookup,
+    rolling_hours: int = DEFAULT_ROLLING_HOURS,
+    offset_days: int = DEFAULT_OFFSET_DAYS,
+    exact_offset: bool = True,
+) -> Iterator[ScreeningRecord]:
+    """Registros marcados de un paciente, en orden cronológico.
+
+    Cada par de administraciones se visita una sola vez (de la anterior a la
+    posterior) y se asigna a la primera ventana que aplica: mismo día, luego
+    ``offset_days`` días después (instante exacto con ``exact_offset``, día
+    calendario sin él) y luego la ventana móvil. Los medicamentos de una misma
+    administración cuentan como pares del mismo día.
+    """
+
+    timeline = SortedTimeline(timestamps)
+    rolling = hours_to_microseconds(rolling_hours)
+    offset = days_to_microseconds(offset_days)
+    labels = window_labels(rolling_hours, offset_days)
+    vocabulary = lookup.vocabulary
+
+    for position, index_a in enumerate(timeline.order):
+        # Las asignaciones posteriores tienen prioridad, como en el cálculo de combinaciones.
+        later: Dict[int, str] = {}
+        for candidate in timeline.rolling(position, rolling):
+            later[candidate] = labels[2]
+        if offset_days:
+            if exact_offset:
+                offsets = timeline.exact_offset(position, offset)
+            else:
+                offsets = timeline.day_offset(position, offset_days)
+            for candidate in offsets:
+                later[candidate] = labels[1]
+        for candidate in timeline.same_day(position):
+            later[candidate] = labels[0]
+
+        for candidate in sorted(later):
+            if candidate < position:
+                continue
+            index_b = timeline.order[candidate]
+            seen: Set[int] = set()
+            for med_a in medications[index_a]:
+                for med_b in medications[index_b]:
+                    if vocabulary.folded[med_a] == vocabulary.folded[med_b]:
+                        continue
+                    code = vocabulary.pack_pair(med_a, med_b)
+                    if code in seen:
+                        continue
+                    seen.add(code)
+                    description = lookup.describe(med_a, med_b)
+                    if description is not None:
+                        yield ScreeningRecord(
+                            patient,
+                            later[candidate],
+                            timestamps[index_a],
+                            timestamps[index_b],
+                            vocabulary[med_a],
+                            vocabulary[med_b],
+                            description,
+                        )
+
+
+class ScreeningWriter:
+    """Escribe registros de cribado en un TSV a medida que se encuentran."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.records = 0
+        self.patients = 0
+        self._handle = path.open("w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._handle, delimiter="\t", lineterminator="\n")
+        self._writer.writerow(SCREENING_COLUMNS)
+
+    def __enter__(self) -> "ScreeningWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._handle.close()
+
+    def write_patient(self, records: Iterable[ScreeningRecord]) -> int:
+        """Escribe los registros de un paciente y los vuelca al disco."""
+
+        written = 0
+        for record in records:
+            self._writer.writerow(
+                (
+                    record.patient,
+                    record.window,
+                    record.first_time.isoformat(sep=" "),
+                    record.second_time.isoformat(sep=" "),
+                    record.first,
+                    record.second,
+                    record.description,
+                )
+            )
+            written += 1
+        if written:
+            self.patients += 1
+            self.records += written
+            self._handle.flush()
+        return written
+
+
+class Screening:
+    """Etapa de cribado completa: índice abierto, tabla de interacciones y TSV."""
+
+    def __init__(
+        self,
+        index: DrugBankIndex,
+        vocabulary: Vocabulary,
+        output_path: Path,
+        policy: str = MATCH_EXACT,
+        rolling_hours: int = DEFAULT_ROLLING_HOURS,
+        offset_days: int = DEFAULT_OFFSET_DAYS,
+        exact_offset: bool = True,
+    ) -> None:
+        self.index = index
+        self.lookup = InteractionLookup(index, vocabulary, policy)
+        self.writer = ScreeningWriter(output_path)
+        self.rolling_hours = rolling_hours
+        self.offset_days = offset_days
+        self.exact_offset = exact_offset
+
+    @classmethod
+    def open(
+        cls,
+        drugbank_xml: Path,
+        output_path: Path,
+        vocabulary: Vocabulary,
+        index_path: Optional[Path] = None,
+        rebuild_index: bool = False,
+        **options,
+    ) -> "Screening":
+        return cls(DrugBankIndex.open(drugbank_xml, index_path, rebuild=rebuild_index), vocabulary, output_path, **options)
+
+    def __enter__(self) -> "Screening":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.writer.close()
+        self.index.close()
+
+    def screen(self, patient: str, timestamps: Sequence[datetime], medications: Sequence[Sequence[int]]) -> int:
+        """Criba un paciente y escribe sus registros marcados; devuelve cuántos son."""
+
+        return self.writer.write_patient(
+            screen_patient(
+                patient,
+                timestamps,
+                medications,
+                self.lookup,
+                self.rolling_hours,
+                self.offset_days,
+                self.exact_offset,
+            )
+        )
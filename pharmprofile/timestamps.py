@@ -0,0 +1,194 @@
+"""Interpretación de las celdas de fecha y hora del plan de medicación.
+
+Un plan real repite una y otra vez las mismas fechas y horas, así que
+:class:`TimestampParser` interpreta cada valor distinto una sola vez y guarda
+el resultado en una caché LRU acotada. Los valores ``datetime``, ``date`` y
+``time`` (openpyxl, Parquet) se convierten directamente sin pasar por la
+caché.
+
+Se reconocen sin recurrir a excepciones:
+
+* números de serie de Excel (días desde 1899-12-30, la parte decimal es la
+  hora), como valor numérico o como texto;
+* texto ISO ``AAAA-MM-DD`` con hora opcional ``HH:MM[:SS[.ffffff]]``
+  separada por espacio o ``T``, como lo escriben los CSV exportados;
+* fechas ``DD/MM/AAAA`` (también con ``-`` o ``.``) y ``AAAA/MM/DD``;
+* horas sueltas ``H:MM[:SS[.ffffff]]``.
+
+Cualquier otro texto se intenta una vez con :func:`datetime.fromisoformat`,
+que era el comportamiento anterior; como el resultado queda en la caché, un
+valor no reconocido sólo cuesta una excepción por valor distinto. Las filas
+que no se pueden interpretar se cuentan (:attr:`TimestampParser.failures`)
+en lugar de registrar un aviso por fila.
+"""
+from __future__ import annotations
+
+import re
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+DEFAULT_CACHE_SIZE = 4096
+MAX_FAILURE_SAMPLES = 5
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+# Último número de serie que Excel admite: 9999-12-31.
+_EXCEL_MAX_SERIAL = 2_958_466
+_MICROSECONDS_PER_DAY = 86_400_000_000
+
+_TIME_PATTERN = r"(\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?"
+_ISO = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:[T ]" + _TIME_PATTERN + r")?")
+_DAY_FIRST = re.compile(r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})(?: " + _TIME_PATTERN + r")?")
+_YEAR_FIRST = re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})(?: " + _TIME_PATTERN + r")?")
+_TIME = re.compile(_TIME_PATTERN)
+_SERIAL = re.compile(r"\d{1,7}(?:\.\d+)?")
+
+
+def _make_date(year: int, month: int, day: int) -> Optional[date]:
+    if not (1 <= year and 1 <= month <= 12 and 1 <= day <= monthrange(year, month)[1]):
+        return None
+    return date(year, month, day)
+
+
+def _make_time(groups: Tuple[Optional[str], ...]) -> Optional[time]:
+    """Hora a partir de los grupos de ``_TIME_PATTERN``; medianoche si no hay hora."""
+
+    hour, minute, second, fraction = groups
+    if hour is None:
+        return time()
+    hour, minute, second = int(hour), int(minute), int(second or 0)
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return time(hour, minute, second, int((fraction or "0").ljust(6, "0")))
+
+
+def _from_serial(serial: float) -> Optional[datetime]:
+    """Fecha y hora de un número de serie de Excel (sistema de 1900)."""
+
+    if not 0 <= serial < _EXCEL_MAX_SERIAL:
+        return None
+    if serial < 60:
+        # Excel cuenta el inexistente 29/02/1900; antes de él hay un día de desfase.
+        serial += 1
+    return _EXCEL_EPOCH + timedelta(microseconds=round(serial * _MICROSECONDS_PER_DAY))
+
+
+def _parse_text(text: str) -> Optional[Tuple[Optional[date], Optional[time]]]:
+    """Fecha y hora de un texto; ``None`` en la parte que no se puede interpretar."""
+
+    match = _ISO.fullmatch(text)
+    if match is not None:
+        year, month, day = map(int, match.group(1, 2, 3))
+        return _make_date(year, month, day), _make_time(match.group(4, 5, 6, 7))
+    match = _DAY_FIRST.fullmatch(text)
+    if match is not None:
+        day, month, year = map(int, match.group(1, 2, 3))
+        return _make_date(year, month, day), _make_time(match.group(4, 5, 6, 7))
+    match = _YEAR_FIRST.fullmatch(text)
+    if match is not None:
+        year, month, day = map(int, match.group(1, 2, 3))
+        return _make_date(year, month, day), _make_time(match.group(4, 5, 6, 7))
+    if _SERIAL.fullmatch(text):
+        moment = _from_serial(float(text))
+        return (None, None) if moment is None else (moment.date(), moment.time())
+    try:
+        # Otras variantes ISO (zona horaria, formato básico...); una vez por valor distinto.
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    return moment.date(), moment.time()
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, str):
+        parsed = _parse_text(value.strip())
+        return None if parsed is None else parsed[0]
+    moment = _from_serial(value)
+    return None if moment is None else moment.date()
+
+
+def _parse_time(value: Any) -> Optional[time]:
+    if isinstance(value, str):
+        text = value.strip()
+        match = _TIME.fullmatch(text)
+        if match is not None:
+            return _make_time(match.groups())
+        parsed = _parse_text(text)
+        return None if parsed is None else parsed[1]
+    # Sólo cuenta la parte decimal: un número de serie completo también lleva la hora.
+    moment = _from_serial(value % 1) if 0 <= value < _EXCEL_MAX_SERIAL else None
+    return None if moment is None else moment.time()
+
+
+class TimestampParser:
+    """Convierte pares de celdas fecha/hora en ``datetime`` con memoización.
+
+    ``hits`` y ``misses`` cuentan los accesos a las cachés de fechas y horas;
+    ``failures`` las filas que no se pudieron interpretar, ``samples`` guarda
+    las primeras para el mensaje final.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self._dates = lru_cache(maxsize=cache_size)(_parse_date)
+        self._times = lru_cache(maxsize=cache_size)(_parse_time)
+        self.failures = 0
+        self.samples: List[Tuple[Any, Any]] = []
+
+    def parse_date(self, value: Any) -> Optional[date]:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return self._dates(value)
+        return None
+
+    def parse_time(self, value: Any) -> Optional[time]:
+        if isinstance(value, datetime):
+            return value.time()
+        if isinstance(value, time):
+            return value
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return self._times(value)
+        return None
+
+    def parse(self, date_value: Any, time_value: Any) -> Optional[datetime]:
+        """Instante de la fila o ``None`` (contado como fallo) si alguna celda no se reconoce."""
+
+        # Los tipos habituales (texto de CSV, datetime de openpyxl) se despachan aquí mismo.
+        kind = type(date_value)
+        if kind is str:
+            day = self._dates(date_value)
+        elif kind is datetime:
+            day = date_value.date()
+        else:
+            day = self.parse_date(date_value)
+        kind = type(time_value)
+        if day is None:
+            moment = None
+        elif kind is str:
+            moment = self._times(time_value)
+        elif kind is datetime:
+            moment = time_value.time()
+        else:
+            moment = self.parse_time(time_value)
+        if moment is None:
+            self.failures += 1
+            if len(self.samples) < MAX_FAILURE_SAMPLES:
+                self.samples.append((date_value, time_value))
+            return None
+        return datetime.combine(day, moment)
+
+    @property
+    def hits(self) -> int:
+        return self._dates.cache_info().hits + self._times.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._dates.cache_info().misses + self._times.cache_info().misses
+
+    def describe_failures(self) -> str:
+        """Las primeras filas fallidas como texto, para los mensajes de registro."""
+
+        return "; ".join(f"{date_value!r} {time_value!r}" for date_value, time_value in self.samples)
@@ -0,0 +1,152 @@
+"""Vocabulario de nombres internados como enteros y pares empaquetados.
+
+Cada nombre de medicamento recibe un identificador entero la primera vez que
+aparece. Un par de medicamentos se guarda como un único entero de 64 bits
+(``primero << 32 | segundo``), en ``array('q')`` o en conjuntos de enteros, y
+sólo se convierte en el texto ``a_b`` al escribir los resultados.
+
+El orden dentro del par reproduce ``sorted([a, b], key=str.lower)``: manda
+la forma en minúsculas y, si coincide, se conserva el orden de llegada.
+
+Los identificadores de paciente no pasan por el vocabulario. El plan se
+recorre paciente a paciente, así que cada uno aparece una sola vez como
+cadena en :class:`~pharmprofile.engine.PatientSchedule`, en el cribado, en
+la salida columnar y en el estado incremental; un vocabulario de pacientes
+los mantendría todos en memoria durante la ejecución sin evitar ninguna
+copia. Donde sí se repiten, en el volcado temporal que agrupa las filas por
+paciente, :func:`schedule_reader.group_by_patient` ya los guarda como enteros.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+
+
+class Vocabulary:
+    """Asigna identificadores enteros consecutivos a cadenas."""
+
+    __slots__ = ("_ids", "names", "folded")
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.folded: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, identifier: int) -> str:
+        return self.names[identifier]
+
+    def intern(self, name: str) -> int:
+        identifier = self._ids.get(name)
+        if identifier is None:
+            identifier = self._ids[name] = len(self.names)
+            self.names.append(name)
+            self.folded.append(name.lower())
+        return identifier
+
+    def intern_all(self, names: Iterable[str]) -> List[int]:
+        return [self.intern(name) for name in names]
+
+    def snapshot(self) -> "Vocabulary":
+        """Copia independiente, p. ej. para enviarla a otro proceso."""
+
+        copy = Vocabulary()
+        copy._ids = dict(self._ids)
+        copy.names = list(self.names)
+        copy.folded = list(self.folded)
+        return copy
+
+    def pack_pair(self, first: int, second: int) -> int:
+        if self.folded[first] <= self.folded[second]:
+            return first << PAIR_SHIFT | second
+        return second << PAIR_SHIFT | first
+
+    def render_pair(self, code: int) -> str:
+        return f"{self.names[code >> PAIR_SHIFT]}_{self.names[code & PAIR_MASK]}"
+
+
+class PairList:
+    """Secuencia de pares empaquetados que se itera como texto ``a_b``.
+
+    ``boundaries`` guarda la longitud de ``codes`` al cerrar cada paciente,
+    de modo que los pares de un paciente son ``codes[inicio:fin]`` entre dos
+    límites consecutivos.
+    """
+
+    __slots__ = ("vocabulary", "codes", "boundaries")
+
+    def __init__(self, vocabulary: Vocabulary) -> None:
+        self.vocabulary = vocabulary
+        self.codes = array("q")
+        self.boundaries = array("q")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator[str]:
+        render = self.vocabulary.render_pair
+        return (render(code) for code in self.codes)
+
+    def add(self, first: int, second: int) -> None:
+        self.codes.append(self.vocabulary.pack_pair(first, second))
+
+    def add_codes(self, codes: Iterable[int]) -> None:
+        """Añade pares ya empaquetados, p. ej. compartidos entre varias ventanas."""
+
+        self.codes.extend(codes)
+
+    def mark_boundary(self) -> None:
+        self.boundaries.append(len(self.codes))
+
+    def export(self) -> Tuple[array, array]:
+        """Contenido compacto para enviarlo entre procesos."""
+
+        return self.codes, self.boundaries
+
+    def merge(self, exported: Tuple[array, array]) -> None:
+        """Añade pares calculados aparte con el mismo vocabulario."""
+
+        codes, boundaries = exported
+        offset = len(self.codes)
+        self.codes.extend(codes)
+        self.boundaries.extend(offset + boundary for boundary in boundaries)
+
+
+class PairSet:
+    """Conjunto de pares empaquetados que se itera como texto ``a_b``."""
+
+    __slots__ = ("vocabulary", "codes")
+
+    def __init__(self, vocabulary: Vocabulary) -> None:
+        self.vocabulary = vocabulary
+        self.codes: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator[str]:
+        render = self.vocabulary.render_pair
+        return (render(code) for code in self.codes)
+
+    def add(self, first: int, second: int) -> None:
+        self.codes.add(self.vocabulary.pack_pair(first, second))
+
+    def add_codes(self, codes: Iterable[int]) -> None:
+        self.codes.update(codes)
+
+    def mark_boundary(self) -> None:
+        """Los conjuntos no distinguen pacientes; existe para tratar igual ambas colecciones."""
+
+    def export(self) -> Set[int]:
+        return self.codes
+
+    def merge(self, exported: Set[int]) -> None:
+        self.codes.update(exported)
+
+    def update(self, other: "PairSet") -> None:
+        self.codes.update(other.codes)
@@ -0,0 +1,247 @@
+"""Motor de ventanas temporales para combinar administraciones.
+
+Ordena una sola vez las marcas de tiempo de un paciente y resuelve mediante
+búsqueda binaria qué administraciones caen dentro de cada horizonte (mismo
+día calendario, desplazamiento exacto y ventana móvil). Así sólo se visitan
+las administraciones que realmente comparten ventana en lugar de recorrer
+todos los pares de fechas.
+
+:func:`bucket_pairs` ofrece una variante vectorizada con NumPy: convierte las
+marcas de tiempo a enteros una sola vez por paciente, localiza los horizontes
+de todas las posiciones con ``searchsorted`` y clasifica de golpe cada par
+candidato en su ventana, con la misma precedencia.
+
+Además de esas tres ventanas se pueden pedir ventanas de exposición
+arbitrarias (:class:`WindowSpec`): móviles de ``N`` horas o de hasta ``N``
+días calendario. :meth:`SortedTimeline.window` resuelve cada una con la misma
+búsqueda binaria, de modo que todas se evalúan en un único recorrido.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy
+
+DEFAULT_ROLLING_HOURS = 6
+DEFAULT_OFFSET_DAYS = 2
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_MICROSECONDS_PER_HOUR = 3_600_000_000
+_MICROSECONDS_PER_DAY = 24 * _MICROSECONDS_PER_HOUR
+
+# Ventanas devueltas por ``bucket_pairs``; sin par cuando no aplica ninguna.
+BUCKET_SAME_DAY = 0
+BUCKET_OFFSET = 1
+BUCKET_ROLLING = 2
+
+# Unidades de :class:`WindowSpec`.
+WINDOW_HOURS = "h"
+WINDOW_DAYS = "d"
+
+
+def hours_to_microseconds(hours: float) -> int:
+    return int(round(hours * _MICROSECONDS_PER_HOUR))
+
+
+def days_to_microseconds(days: int) -> int:
+    return days * _MICROSECONDS_PER_DAY
+
+
+def window_labels(rolling_hours: int, offset_days: int) -> Tuple[str, str, str]:
+    """Etiquetas de las ventanas en el orden de ``BUCKET_SAME_DAY``, ``BUCKET_OFFSET`` y ``BUCKET_ROLLING``."""
+
+    return ("24h", f"{offset_days * 24}h", f"{rolling_hours}h")
+
+
+@dataclass(frozen=True)
+class WindowSpec:
+    """Ventana de exposición adicional.
+
+    Con ``unit == WINDOW_HOURS`` es una ventana móvil: administraciones a
+    menos de ``size`` horas, en el intervalo abierto ``(t - size, t + size)``
+    igual que ``--window-hours``. Con ``unit == WINDOW_DAYS`` son las que
+    distan como mucho ``size`` días calendario (``0d`` es el mismo día).
+    A diferencia de las tres ventanas clásicas, no son excluyentes: un par
+    está en todas las ventanas que lo contienen.
+    """
+
+    size: int
+    unit: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.size}{self.unit}"
+
+
+def window_spec(text: str) -> WindowSpec:
+    """Interpreta una ventana escrita como ``12h`` o ``7d``."""
+
+    value = text.strip().lower()
+    size, unit = value[:-1], value[-1:]
+    if unit not in (WINDOW_HOURS, WINDOW_DAYS) or not size.isdigit():
+        raise ValueError(f"Ventana no válida {text!r}; se espera p. ej. 12h o 7d")
+    if unit == WINDOW_HOURS and int(size) == 0:
+        raise ValueError("Una ventana móvil de 0h no contiene ninguna administración")
+    return WindowSpec(int(size), unit)
+
+
+def widest_horizon(rolling_hours: float, offset_days: int, windows: Iterable[WindowSpec]) -> Tuple[float, int]:
+    """Horas y días que cubren a la vez las ventanas clásicas y ``windows``."""
+
+    hours, days = rolling_hours, offset_days
+    for spec in windows:
+        if spec.unit == WINDOW_HOURS:
+            hours = max(hours, spec.size)
+        else:
+            days = max(days, spec.size)
+    return hours, days
+
+
+class SortedTimeline:
+    """Marcas de tiempo de un paciente ordenadas para consultas por ventana.
+
+    ``order[p]`` es el índice original de la administración que ocupa la
+    posición ``p`` tras ordenar, y ``position_of[i]`` la relación inversa.
+    Los instantes se guardan como microsegundos enteros para que las
+    comparaciones sean exactas, igual que entre objetos ``datetime``.
+    """
+
+    __slots__ = ("order", "position_of", "instants", "days")
+
+    def __init__(self, timestamps: Sequence[datetime]) -> None:
+        self.order: List[int] = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        self.position_of: List[int] = [0] * len(timestamps)
+        for position, index in enumerate(self.order):
+            self.position_of[index] = position
+        self.instants: List[int] = [(timestamps[i] - _EPOCH) // _MICROSECOND for i in self.order]
+        self.days: List[int] = [timestamps[i].toordinal() for i in self.order]
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def same_day(self, position: int) -> range:
+        """Posiciones con el mismo día calendario que ``position``."""
+
+        day = self.days[position]
+        return range(bisect_left(self.days, day), bisect_right(self.days, day))
+
+    def day_offset(self, position: int, days: int) -> range:
+        """Posiciones cuyo día calendario es ``days`` días posterior."""
+
+        day = self.days[position] + days
+        return range(bisect_left(self.days, day), bisect_right(self.days, day))
+
+    def exact_offset(self, position: int, microseconds: int) -> range:
+        """Posiciones exactamente ``microseconds`` después de ``position``."""
+
+        instant = self.instants[position] + microseconds
+        return range(bisect_left(self.instants, instant), bisect_right(self.instants, instant))
+
+    def rolling(self, position: int, microseconds: int) -> range:
+        """Posiciones dentro del intervalo abierto ``(t - w, t + w)``."""
+
+        instant = self.instants[position]
+        return range(
+            bisect_right(self.instants, instant - microseconds),
+            bisect_left(self.instants, instant + microseconds),
+        )
+
+    def window(self, position: int, spec: WindowSpec) -> range:
+        """Posiciones dentro de la ventana ``spec`` centrada en ``position``."""
+
+        if spec.unit == WINDOW_HOURS:
+            return self.rolling(position, hours_to_microseconds(spec.size))
+        day = self.days[position]
+        return range(bisect_left(self.days, day - spec.size), bisect_right(self.days, day + spec.size))
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - dependencia opcional
+        raise RuntimeError("La clasificación vectorizada requiere numpy (pip install numpy)") from exc
+    return numpy
+
+
+def _expand(np, lower, upper):
+    """Pares ``(posición, candidata)`` para cada intervalo ``[lower[p], upper[p])``."""
+
+    counts = np.maximum(upper - lower, 0)
+    total = int(counts.sum())
+    first = np.repeat(np.arange(len(lower), dtype=np.int64), counts)
+    starts = np.repeat(np.cumsum(counts) - counts - lower, counts)
+    return first, np.arange(total, dtype=np.int64) - starts
+
+
+def bucket_pairs(
+    timestamps: Sequence[datetime],
+    rolling_microseconds: int,
+    offset_days: int,
+    exact_offset: bool = True,
+    forward_only: bool = False,
+) -> Tuple["numpy.ndarray", "numpy.ndarray", "numpy.ndarray"]:
+    """Clasifica todos los pares de administraciones de un paciente por ventana.
+
+    Devuelve tres arreglos ``(primera, segunda, ventana)`` con índices de
+    ``timestamps`` ordenados por primera y luego segunda administración. La
+    ventana es ``BUCKET_SAME_DAY`` si comparten día calendario; si no,
+    ``BUCKET_OFFSET`` si la segunda está exactamente ``offset_days`` días
+    después (en instantes con ``exact_offset``, en días calendario sin él);
+    si no, ``BUCKET_ROLLING`` si distan menos de la ventana móvil.
+
+    Con ``forward_only`` sólo se devuelven pares en los que la segunda
+    administración ocupa una posición posterior tras ordenar por instante
+    (orden estable), como en ``Interact_Detect.py``.
+    """
+
+    np = _numpy()
+    size = len(timestamps)
+    instants_list = [(timestamp - _EPOCH) // _MICROSECOND for timestamp in timestamps]
+    order = np.array(sorted(range(size), key=instants_list.__getitem__), dtype=np.int64)
+    instants = np.array(instants_list, dtype=np.int64)[order]
+    days = np.array([timestamp.toordinal() for timestamp in timestamps], dtype=np.int64)[order]
+    offset_values, offset_targets = (
+        (instants, instants + days_to_microseconds(offset_days)) if exact_offset else (days, days + offset_days)
+    )
+
+    horizons = (
+        (np.searchsorted(days, days, "left"), np.searchsorted(days, days, "right")),
+        (np.searchsorted(offset_values, offset_targets, "left"), np.searchsorted(offset_values, offset_targets, "right")),
+        (
+            np.searchsorted(instants, instants - rolling_microseconds, "right"),
+            np.searchsorted(instants, instants + rolling_microseconds, "left"),
+        ),
+    )
+    after = np.arange(1, size + 1, dtype=np.int64)
+    firsts, seconds = [], []
+    for lower, upper in horizons:
+        if forward_only:
+            lower = np.maximum(lower, after)
+        first, second = _expand(np, lower, upper)
+        firsts.append(first)
+        seconds.append(second)
+
+    # Un mismo par puede estar en varios horizontes; se deja una sola vez.
+    first_index = order[np.concatenate(firsts)]
+    second_index = order[np.concatenate(seconds)]
+    keys = np.unique(first_index * max(size, 1) + second_index)
+    first_index, second_index = np.divmod(keys, max(size, 1))
+
+    position_of = np.empty(size, dtype=np.int64)
+    position_of[order] = np.arange(size, dtype=np.int64)
+    first_position, second_position = position_of[first_index], position_of[second_index]
+    if exact_offset:
+        is_offset = instants[second_position] - instants[first_position] == days_to_microseconds(offset_days)
+    else:
+        is_offset = days[second_position] - days[first_position] == offset_days
+    buckets = np.where(
+        days[first_position] == days[second_position],
+        BUCKET_SAME_DAY,
+        np.where(is_offset, BUCKET_OFFSET, BUCKET_ROLLING),
+    )
+    return first_index, second_index, buckets
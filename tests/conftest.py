@@ -0,0 +1,49 @@
+"""Utilidades comunes de las pruebas de ``pharmprofile``."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def write_drugbank(path: Path, drugs: Dict[str, Sequence[Tuple[str, str]]]) -> Path:
+    """XML mínimo de DrugBank: ``nombre -> [(contraparte, descripción), ...]``."""
+
+    entries = []
+    for position, (name, interactions) in enumerate(drugs.items()):
+        partners = "".join(
+            f"<drug-interaction><drugbank-id>X{partner}</drugbank-id><name>{partner}</name>"
+            f"<description>{description}</description></drug-interaction>"
+            for partner, description in interactions
+        )
+        entries.append(
+            f"<drug type='small'><drugbank-id>DB{position}</drugbank-id><name>{name}</name>"
+            f"<synonyms></synonyms><drug-interactions>{partners}</drug-interactions></drug>"
+        )
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<drugbank xmlns="http://www.drugbank.ca">\n'
+        + "\n".join(entries)
+        + "\n</drugbank>\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+@pytest.fixture
+def drugbank_xml(tmp_path: Path) -> Path:
+    # DrugBank lista la interacción en ambos sentidos con textos distintos.
+    return write_drugbank(
+        tmp_path / "drugbank.xml",
+        {
+            "Aspirin": [("Warfarin", "Bleeding")],
+            "Warfarin": [("Aspirin", "Bleeding Risk")],
+            "Aspirin Plus": [("Metformin", "Lactic acidosis")],
+            "Metformin": [],
+        },
+    )
@@ -0,0 +1,61 @@
+import csv
+from pathlib import Path
+
+from benchmarks.synthetic import ScheduleSpec, write_schedule
+from pharmprofile import detect
+from pharmprofile.batch import STATUS_FAILED, STATUS_OK, SUMMARY_TOTAL, BatchSource, SourceResult, write_cohort_summary
+
+
+def _result(label, patients, pairs, seconds):
+    report = {
+        "total_seconds": seconds,
+        "stages": [
+            {"name": "read", "counters": {"patients": patients}},
+            {"name": "write", "counters": {"pairs_24h": pairs}},
+        ],
+    }
+    return SourceResult(BatchSource(label, Path(f"{label}.xlsx"), "Hoja"), "ok", report)
+
+
+def test_total_row_only_sums_additive_counters(tmp_path):
+    path = tmp_path / "summary.tsv"
+    write_cohort_summary(path, [_result("a", 3, 16, 0.5), _result("b", 4, 31, 0.25)])
+    with path.open(encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle, delimiter="\t"))
+    total = rows[-1]
+    assert total["source"] == SUMMARY_TOTAL
+    assert (total["patients"], total["seconds"]) == ("7", "0.75")
+    # Los pares de distintos planes pueden solaparse: no hay total de cohorte.
+    assert total["pairs_24h"] == ""
+
+
+def test_detect_batch_records_a_corrupt_workbook_as_failed(tmp_path, drugbank_xml):
+    wards = tmp_path / "wards"
+    wards.mkdir()
+    for seed in (1, 2):
+        write_schedule(wards / f"ward_{seed}.xlsx", ScheduleSpec(patients=3, administrations=4, vocabulary=5, seed=seed))
+    (wards / "ward_bad.xlsx").write_bytes(b"not a workbook")
+    (tmp_path / "profile.txt").write_text("aspirin\n", encoding="utf-8")
+    output_dir = tmp_path / "output"
+
+    status = detect.main(
+        [
+            "--batch",
+            str(wards / "*.xlsx"),
+            "--workers",
+            "2",
+            "--drugbank",
+            str(drugbank_xml),
+            "--profile",
+            str(tmp_path / "profile.txt"),
+            "--output-dir",
+            str(output_dir),
+        ]
+    )
+
+    assert status == 1
+    with (output_dir / detect.OUTPUT_SUMMARY).open(encoding="utf-8") as handle:
+        rows = {row["source"]: row for row in csv.DictReader(handle, delimiter="\t")}
+    assert rows["ward_bad"]["status"] == STATUS_FAILED
+    assert rows["ward_1"]["status"] == rows["ward_2"]["status"] == STATUS_OK
+    assert (output_dir / "ward_2" / detect.OUTPUT_24H).exists()
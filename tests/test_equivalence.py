@@ -0,0 +1,216 @@
+"""Equivalencia entre los scripts originales y el paquete ``pharmprofile``.
+
+``tests/baseline`` guarda sin cambios las dos versiones originales de los
+scripts. Cada prueba ejecuta ambos lados en un subproceso sobre el mismo
+plan sintético y compara los archivos que escribe el original.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import pytest
+
+from benchmarks.synthetic import (
+    HEADER,
+    SHEET_NAME,
+    DrugBankSpec,
+    ScheduleSpec,
+    drug_name,
+    iter_schedule_rows,
+    profile_names,
+    write_drugbank,
+    write_profile,
+    write_schedule,
+)
+from conftest import REPO_ROOT
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baseline"
+SCRIPTS = {
+    "cic": ("drug_drug_interact_cic.py", "pharmprofile.cic"),
+    "detect": ("Interact_Detect.py", "pharmprofile.detect"),
+}
+SCHEDULE = ScheduleSpec(patients=12, administrations=25, vocabulary=14, seed=3)
+DRUGBANK = DrugBankSpec(drugs=30, interactions_per_drug=6, synonyms_per_drug=1, seed=3)
+
+
+def _run(command: Sequence[str], output_dir: Path) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    environment = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    result = subprocess.run(
+        [sys.executable, *command, "--output-dir", str(output_dir)],
+        cwd=output_dir,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def _inputs(data: Dict[str, Path], schedule: Path) -> List[str]:
+    return ["--excel", str(schedule), "--drugbank", str(data["drugbank"]), "--profile", str(data["profile"])]
+
+
+def run_baseline(script: str, data: Dict[str, Path], schedule: Path, output_dir: Path) -> Path:
+    _run([str(BASELINE_DIR / SCRIPTS[script][0]), *_inputs(data, schedule)], output_dir)
+    return output_dir
+
+
+def run_package(script: str, data: Dict[str, Path], schedule: Path, output_dir: Path, *options: str) -> Path:
+    _run(["-m", SCRIPTS[script][1], *_inputs(data, schedule), *options], output_dir)
+    return output_dir
+
+
+def assert_same_outputs(expected: Path, actual: Path, ignore_order: bool = False) -> None:
+    """Cada archivo del original existe en ``actual`` con el mismo contenido."""
+
+    names = sorted(path.name for path in expected.iterdir())
+    assert names
+    for name in names:
+        wanted = (expected / name).read_bytes()
+        produced = (actual / name).read_bytes()
+        if ignore_order and name.endswith(".txt"):
+            assert sorted(produced.split(b"\n")) == sorted(wanted.split(b"\n")), name
+        else:
+            assert produced == wanted, name
+
+
+@pytest.fixture(scope="module")
+def data(tmp_path_factory) -> Dict[str, Path]:
+    directory = tmp_path_factory.mktemp("inputs")
+    return {
+        "xlsx": write_schedule(directory / "schedule.xlsx", SCHEDULE),
+        "csv": write_schedule(directory / "schedule.csv", SCHEDULE),
+        "drugbank": write_drugbank(directory / "drugbank.xml", DRUGBANK),
+        "profile": write_profile(directory / "profile.txt", profile_names(5, SCHEDULE.vocabulary) + ["nodrug"]),
+    }
+
+
+@pytest.fixture(scope="module")
+def baseline(data, tmp_path_factory) -> Dict[str, Path]:
+    directory = tmp_path_factory.mktemp("baseline")
+    return {script: run_baseline(script, data, data["xlsx"], directory / script) for script in SCRIPTS}
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS))
+@pytest.mark.parametrize(
+    "options",
+    [
+        pytest.param((), id="serial"),
+        pytest.param(("--workers", "2"), id="workers"),
+        pytest.param(("--vectorized",), id="vectorized"),
+        pytest.param(("--grouped-input",), id="grouped"),
+    ],
+)
+def test_package_matches_baseline(script, options, data, baseline, tmp_path):
+    if "--vectorized" in options:
+        pytest.importorskip("numpy")
+    output_dir = run_package(script, data, data["xlsx"], tmp_path, *options)
+    assert_same_outputs(baseline[script], output_dir)
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS))
+def test_csv_schedule_matches_excel_baseline(script, data, baseline, tmp_path):
+    output_dir = run_package(script, data, data["csv"], tmp_path)
+    assert_same_outputs(baseline[script], output_dir)
+
+
+def _write_rows(path: Path, rows: Sequence[tuple]) -> Path:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS))
+def test_incremental_runs_match_baseline(script, data, baseline, tmp_path):
+    # La primera ejecución ve la mitad de las filas; la segunda, el plan completo.
+    # El estado se descarta si cambia la ruta del plan: ambas ejecuciones leen el mismo archivo.
+    rows = list(iter_schedule_rows(SCHEDULE))
+    cutoff = sorted(row[0] for row in rows)[len(rows) // 2]
+    schedule = _write_rows(tmp_path / "schedule.xlsx", [row for row in rows if row[0] < cutoff])
+    output_dir = tmp_path / "output"
+    run_package(script, data, schedule, output_dir, "--incremental")
+    shutil.copyfile(data["xlsx"], schedule)
+    run_package(script, data, schedule, output_dir, "--incremental")
+    # cic añade las líneas nuevas al final de sus listas: mismas líneas, otro orden.
+    assert_same_outputs(baseline[script], output_dir, ignore_order=script == "cic")
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS))
+def test_window_specs_keep_standard_outputs(script, data, baseline, tmp_path):
+    output_dir = run_package(script, data, data["xlsx"], tmp_path, "--window", "0d", "--window", "12h")
+    assert_same_outputs(baseline[script], output_dir)
+    suffix = "_noSorted.txt" if script == "cic" else ".txt"
+    same_day = "combinaciones_24h_noSorted.txt" if script == "cic" else "combinaciones_24h.txt"
+    # ``0d`` es la ventana del mismo día, que también tiene prioridad en las listas estándar.
+    assert (output_dir / f"combinaciones_ventana_0d{suffix}").read_bytes() == (baseline[script] / same_day).read_bytes()
+    if script == "detect":
+        rolling = set((output_dir / "combinaciones_ventana_12h.txt").read_text(encoding="utf-8").splitlines())
+        assert set((baseline[script] / "combinaciones_6h.txt").read_text(encoding="utf-8").splitlines()) <= rolling
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPTS))
+def test_incremental_rows_at_the_last_processed_second(script, data, tmp_path):
+    # Tras la primera ejecución se añade, para cada paciente, una fila con su última fecha ya procesada.
+    rows = list(iter_schedule_rows(SCHEDULE))
+    cutoff = sorted(row[0] for row in rows)[len(rows) // 2]
+    early = [row for row in rows if row[0] < cutoff]
+    latest = {}
+    for day, moment, patient, _ in early:
+        latest[patient] = max(latest.get(patient, (day, moment)), (day, moment))
+    extra = "_".join((drug_name(0), drug_name(SCHEDULE.vocabulary)))
+    appended = [(day, moment, patient, extra) for patient, (day, moment) in latest.items()]
+    full = _write_rows(tmp_path / "full.xlsx", early + appended + [row for row in rows if row[0] >= cutoff])
+
+    expected = run_baseline(script, data, full, tmp_path / "baseline")
+    schedule = _write_rows(tmp_path / "schedule.xlsx", early)
+    output_dir = tmp_path / "output"
+    run_package(script, data, schedule, output_dir, "--incremental")
+    shutil.copyfile(full, schedule)
+    run_package(script, data, schedule, output_dir, "--incremental")
+    assert_same_outputs(expected, output_dir, ignore_order=script == "cic")
+
+
+def _excel_serial(moment: datetime) -> float:
+    return (moment - datetime(1899, 12, 30)).total_seconds() / 86400
+
+
+def test_text_and_serial_timestamps_are_analysed(data, tmp_path):
+    """Cambio documentado: las celdas de texto ISO y los números de serie ya no se descartan.
+
+    Los originales sólo aceptaban celdas ``datetime`` en ``Interact_Detect.py``
+    y texto ISO de fecha en ``drug_drug_interact_cic.py``; ahora ambos leen las
+    filas igual que si las celdas fueran fechas de Excel.
+    """
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append(("Fecha", "Hora", "Paciente", "Med"))
+    for position, (day, moment, patient, medications) in enumerate(iter_schedule_rows(SCHEDULE)):
+        if position % 3 == 0:
+            day, moment = day.date().isoformat(), moment.strftime("%H:%M:%S")
+        elif position % 3 == 1:
+            day, moment = _excel_serial(day), _excel_serial(moment) % 1
+        sheet.append((day, moment, patient, medications))
+    mixed = tmp_path / "mixed.xlsx"
+    workbook.save(mixed)
+
+    clean = {script: run_baseline(script, data, data["xlsx"], tmp_path / "clean" / script) for script in SCRIPTS}
+    for script in SCRIPTS:
+        skipped = run_baseline(script, data, mixed, tmp_path / "skipped" / script)
+        assert (skipped / "drug.xml").read_bytes() != (clean[script] / "drug.xml").read_bytes()
+        output_dir = run_package(script, data, mixed, tmp_path / "package" / script)
+        assert_same_outputs(clean[script], output_dir)
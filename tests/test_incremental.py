@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from pharmprofile.incremental import IncrementalState, select_new
+
+LAST = datetime(2023, 1, 2, 8, 0)
+
+
+def test_select_new_splits_the_last_processed_administration():
+    timestamps = [datetime(2023, 1, 1, 8, 0), LAST, datetime(2023, 1, 2, 9, 0)]
+    medications = [[0], [1, 2, 3], [4]]
+    kept, meds, new = select_new(timestamps, medications, (LAST, 2), rolling_hours=6, offset_days=2)
+    assert kept == [timestamps[0], LAST, LAST, timestamps[2]]
+    assert meds == [[0], [1, 2], [3], [4]]
+    assert new == [False, False, True, True]
+
+
+def test_select_new_skips_patients_without_new_medications():
+    assert select_new([LAST], [[1, 2]], (LAST, 2), rolling_hours=6, offset_days=2) == ([], [], [])
+
+
+def test_state_remembers_medications_at_the_last_timestamp(tmp_path):
+    path = tmp_path / "state.sqlite"
+    with IncrementalState(path, {"window_hours": 6}) as state:
+        state.mark_processed("P1", [datetime(2023, 1, 1), LAST], [[0], [1, 2]])
+        state.mark_processed("P1", [LAST], [[1]])
+    with IncrementalState(path, {"window_hours": 6}) as state:
+        assert not state.fresh
+        assert state.last_processed("P1") == (LAST, 2)
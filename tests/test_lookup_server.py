@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from pharmprofile.drugbank_index import DrugBankIndex
+from pharmprofile.lookup_server import LookupService, serve
+
+
+def test_client_names_do_not_grow_the_caches(drugbank_xml):
+    with DrugBankIndex.open(drugbank_xml) as index:
+        service = LookupService(index, cache_size=8)
+        pairs = [["aspirin", f"unknown {number}"] for number in range(100)] + [["WARFARIN", "Aspirin"]]
+        results = service.interactions(pairs)
+        assert results[-1] == "Bleeding" and not any(results[:-1])
+        records = service.screen(
+            "P1",
+            [
+                {"time": "2023-01-01T08:00:00", "medications": ["Warfarin"]},
+                {"time": "2023-01-01T09:00:00", "medications": ["Aspirin", "brand new name"]},
+            ],
+        )
+        assert [(record["first"], record["second"]) for record in records] == [("Warfarin", "Aspirin")]
+        assert len(service.lookup.vocabulary) == 0
+        assert service.lookup.cached_pairs <= 8
+
+
+def test_serve_refuses_to_replace_a_regular_file(drugbank_xml, tmp_path):
+    path = tmp_path / "not-a-socket"
+    path.write_text("keep me", encoding="utf-8")
+    with DrugBankIndex.open(drugbank_xml) as index:
+        with pytest.raises(FileExistsError):
+            asyncio.run(serve(LookupService(index), path))
+    assert path.read_text(encoding="utf-8") == "keep me"
@@ -0,0 +1,114 @@
+import csv
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from benchmarks.synthetic import ScheduleSpec, write_schedule
+from pharmprofile import cic, detect
+from pharmprofile.pair_stats import (
+    HLL_PRECISION,
+    MIN_SKETCH_WIDTH,
+    SKETCH_DEPTH,
+    SketchWindow,
+    minimum_sketch_memory_mb,
+    sketch_footprint,
+    sketch_width,
+)
+
+
+@pytest.mark.parametrize("memory_mb, windows, top_k", [(16, 4, 20), (6, 3, 20), (64, 8, 1000)])
+def test_sketch_width_keeps_the_whole_footprint_under_the_cap(memory_mb, windows, top_k):
+    width = sketch_width(memory_mb, windows, top_k)
+    assert width >= MIN_SKETCH_WIDTH
+    assert sketch_footprint(width, windows, top_k) <= memory_mb * 1024 * 1024
+    assert sketch_footprint(width + 1, windows, top_k) > memory_mb * 1024 * 1024
+
+
+def test_sketch_width_rejects_a_budget_below_the_minimum():
+    with pytest.raises(ValueError):
+        sketch_width(minimum_sketch_memory_mb(4) * 0.99, 4)
+
+
+def _parse(module, argv, monkeypatch):
+    if module is cic:
+        monkeypatch.setattr("sys.argv", ["cic", *argv])
+        return cic.parse_arguments()
+    return detect.parse_args(argv)
+
+
+@pytest.mark.parametrize("module", [cic, detect])
+def test_cli_rejects_a_budget_below_the_minimum(module, capsys, monkeypatch):
+    with pytest.raises(SystemExit):
+        _parse(module, ["combos", "--pair-stats", "sketch", "--pair-stats-memory", "1"], monkeypatch)
+    assert "--pair-stats-memory" in capsys.readouterr().err
+    assert _parse(module, ["combos", "--pair-stats", "sketch", "--pair-stats-memory", "16"], monkeypatch).pair_stats
+
+
+def _cohort(patients, codes, seed):
+    """Conteos ``par -> apariciones`` por paciente, con pares de frecuencia muy desigual."""
+
+    generator = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(codes)]
+    cohort = []
+    for _ in range(patients):
+        drawn = generator.choices(range(codes), weights, k=generator.randint(1, 40))
+        cohort.append(Counter(drawn))
+    return cohort
+
+
+def test_count_min_never_underestimates_and_stays_within_its_error():
+    pytest.importorskip("numpy")
+    cohort = _cohort(patients=2000, codes=800, seed=5)
+    # Todos los pares caben entre los candidatos, así que ``top`` los devuelve todos.
+    window = SketchWindow(MIN_SKETCH_WIDTH, top_k=800)
+    occurrences, patients = Counter(), Counter()
+    for counts in cohort:
+        window.add(counts)
+        occurrences.update(counts)
+        patients.update(counts.keys())
+
+    estimates = window.top(len(occurrences))
+    assert len(estimates) == len(occurrences)
+    misses = 0
+    for code, occurrence, occurrence_error, patient, patient_error in estimates:
+        assert occurrence >= occurrences[code] and patient >= patients[code]
+        misses += occurrence - occurrence_error > occurrences[code]
+        misses += patient - patient_error > patients[code]
+    # El margen se cumple para cada par con probabilidad 1 - e^-d.
+    assert misses <= 2 * len(occurrences) * math.exp(-SKETCH_DEPTH)
+
+
+@pytest.mark.parametrize("distinct", [500, 20000, 200000])
+def test_hyperloglog_stays_within_its_standard_error(distinct):
+    pytest.importorskip("numpy")
+    window = SketchWindow(MIN_SKETCH_WIDTH, top_k=1)
+    codes = random.Random(distinct).sample(range(1 << 40), distinct)
+    for start in range(0, distinct, 100):
+        window.add(dict.fromkeys(codes[start : start + 100], 1))
+    estimate, error = window.distinct()
+    assert error == math.ceil(1.04 / math.sqrt(1 << HLL_PRECISION) * estimate)
+    # Tres errores típicos: la prueba es determinista, pero no depende de una semilla afortunada.
+    assert abs(estimate - distinct) <= 3 * error
+
+
+def _statistics(path):
+    with path.open(encoding="utf-8") as handle:
+        return [
+            (row["window"], row["rank"], row["pair"], row["occurrences"], row["patients"])
+            for row in csv.DictReader(handle, delimiter="\t")
+        ]
+
+
+def test_sketch_matches_exact_on_a_small_cohort(tmp_path):
+    pytest.importorskip("numpy")
+    schedule = write_schedule(tmp_path / "schedule.csv", ScheduleSpec(patients=20, administrations=10, vocabulary=12))
+    outputs = {}
+    for mode in ("exact", "sketch"):
+        output_dir = tmp_path / mode
+        arguments = ["combos", "--excel", str(schedule), "--output-dir", str(output_dir), "--pair-stats", mode]
+        assert detect.main(arguments) == 0
+        outputs[mode] = _statistics(output_dir / detect.OUTPUT_PAIR_STATS)
+    assert outputs["exact"]
+    assert outputs["sketch"] == outputs["exact"]
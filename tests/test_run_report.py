@@ -0,0 +1,30 @@
+import tracemalloc
+
+from pharmprofile.run_report import RunReport
+
+
+def _stages(report: RunReport) -> dict:
+    return {stage["name"]: stage for stage in report.as_dict()["stages"]}
+
+
+def test_nested_stage_keeps_the_outer_traced_peak():
+    report = RunReport(trace_memory=True)
+    with report.stage("outer"):
+        block = bytearray(8 * 1024 * 1024)
+        del block
+        with report.stage("inner"):
+            small = bytearray(1024)
+            del small
+    tracemalloc.stop()
+    stages = _stages(report)
+    assert stages["outer"]["peak_traced_mb"] >= 8
+    assert stages["inner"]["peak_traced_mb"] < 1
+
+
+def test_nested_stages_share_the_top_level_rss_sample():
+    report = RunReport()
+    with report.stage("outer"):
+        with report.stage("inner"):
+            pass
+    stages = _stages(report)
+    assert stages["inner"]["peak_rss_mb"] == stages["outer"]["peak_rss_mb"] > 0
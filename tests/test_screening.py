@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from pharmprofile.drugbank_index import DrugBankIndex
+from pharmprofile.name_resolver import MATCH_SUBSTRING
+from pharmprofile.screening import InteractionLookup, Screening, screen_patient
+from pharmprofile.vocabulary import Vocabulary
+
+
+def test_records_keep_each_drug_with_its_own_time(drugbank_xml):
+    vocabulary = Vocabulary()
+    warfarin, aspirin = vocabulary.intern_all(["Warfarin", "Aspirin"])
+    with DrugBankIndex.open(drugbank_xml) as index:
+        lookup = InteractionLookup(index, vocabulary)
+        records = list(
+            screen_patient(
+                "P1",
+                [datetime(2023, 1, 1, 8), datetime(2023, 1, 1, 9)],
+                [[warfarin], [aspirin]],
+                lookup,
+            )
+        )
+    assert len(records) == 1
+    record = records[0]
+    assert (record.first, record.first_time) == ("Warfarin", datetime(2023, 1, 1, 8))
+    assert (record.second, record.second_time) == ("Aspirin", datetime(2023, 1, 1, 9))
+
+
+def test_describe_does_not_depend_on_argument_order(drugbank_xml):
+    with DrugBankIndex.open(drugbank_xml) as index:
+        descriptions = set()
+        for order in (["Aspirin", "Warfarin"], ["Warfarin", "Aspirin"]):
+            vocabulary = Vocabulary()
+            first, second = vocabulary.intern_all(order)
+            lookup = InteractionLookup(index, vocabulary)
+            descriptions.add(lookup.describe(first, second))
+            descriptions.add(InteractionLookup(index, vocabulary).describe(second, first))
+    assert descriptions == {"Bleeding"}
+
+
+def test_screening_matches_names_exactly_unless_asked(drugbank_xml, tmp_path):
+    times = [datetime(2023, 1, 1, 8), datetime(2023, 1, 1, 9)]
+    flagged = {}
+    for policy in (None, MATCH_SUBSTRING):
+        vocabulary = Vocabulary()
+        medications = [vocabulary.intern_all(["aspirin"]), vocabulary.intern_all(["Metformin"])]
+        options = {} if policy is None else {"policy": policy}
+        with Screening.open(drugbank_xml, tmp_path / f"{policy}.tsv", vocabulary, **options) as screening:
+            flagged[policy] = screening.screen("P1", times, medications)
+    assert flagged == {None: 0, MATCH_SUBSTRING: 1}
@@ -0,0 +1,113 @@
+"""Cada orden sólo importa los módulos pesados que necesita y arranca a tiempo.
+
+Las órdenes se lanzan en un subproceso con ``-X importtime``, que lista en
+stderr cada módulo importado. El tiempo de arranque se mide aparte, sin
+``-X importtime``, frente a un presupuesto registrado; en máquinas de CI
+lentas se omite con ``PHARMPROFILE_SKIP_TIMING=1``.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Sequence, Set
+
+import pytest
+
+from conftest import REPO_ROOT, write_drugbank
+
+MODULES = ("pharmprofile.cic", "pharmprofile.detect")
+HEAVY = {"numpy", "openpyxl", "pyarrow", "multiprocessing", "sqlite3", "pharmprofile.drugbank_index"}
+INDEX = {"sqlite3", "pharmprofile.drugbank_index"}
+# Arranque de ``--help`` descontado el del intérprete vacío, medido con el
+# mejor de TIMING_RUNS (unos 0,085 s al registrarlo), y margen admitido.
+STARTUP_BUDGET_SECONDS = 0.085
+STARTUP_TOLERANCE = 2.0
+TIMING_RUNS = 5
+timing = pytest.mark.skipif(
+    os.environ.get("PHARMPROFILE_SKIP_TIMING") == "1", reason="medidas de tiempo desactivadas en esta máquina"
+)
+
+
+def imported_modules(arguments: Sequence[str], cwd: Path) -> Set[str]:
+    environment = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", *arguments],
+        cwd=cwd,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+
+def startup_seconds(arguments: Sequence[str], cwd: Path) -> float:
+    """Mejor tiempo de reloj de ``python *arguments`` en TIMING_RUNS ejecuciones."""
+
+    environment = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    best = float("inf")
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *arguments], cwd=cwd, env=environment, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+        assert result.returncode == 0, result.stderr
+    return best
+
+
+@pytest.fixture
+def inputs(tmp_path: Path) -> Path:
+    (tmp_path / "schedule.csv").write_text(
+        "Fecha,Hora,Paciente,Med\n2023-01-01,08:00:00,P1,Aspirin_Warfarin\n", encoding="utf-8"
+    )
+    (tmp_path / "profile.txt").write_text("aspirin\n", encoding="utf-8")
+    write_drugbank(tmp_path / "drugbank.xml", {"Aspirin": [("Warfarin", "Bleeding")]})
+    return tmp_path
+
+
+@pytest.mark.parametrize("module", MODULES)
+@pytest.mark.parametrize("command", [None, "all", "ingest", "combos", "interactions", "screen"])
+def test_help_imports_no_heavy_modules(module, command, tmp_path):
+    arguments = [module, "--help"] if command is None else [module, command, "--help"]
+    assert not imported_modules(arguments, tmp_path) & HEAVY
+
+
+@pytest.mark.parametrize("module", MODULES)
+@pytest.mark.parametrize(
+    "command, allowed",
+    [("ingest", set()), ("combos", set()), ("interactions", INDEX), ("screen", INDEX)],
+)
+def test_stage_imports_only_what_it_needs(module, command, allowed, inputs):
+    arguments = [
+        module,
+        command,
+        "--excel",
+        str(inputs / "schedule.csv"),
+        "--grouped-input",
+        "--drugbank",
+        str(inputs / "drugbank.xml"),
+        "--profile",
+        str(inputs / "profile.txt"),
+        "--output-dir",
+        str(inputs),
+    ]
+    assert not imported_modules(arguments, inputs) & (HEAVY - allowed)
+
+
+@timing
+@pytest.mark.parametrize(
+    "arguments", [("pharmprofile.cic", "interactions", "--help"), ("pharmprofile.detect", "--help")]
+)
+def test_help_starts_within_budget(arguments, tmp_path):
+    interpreter = startup_seconds(["-c", "pass"], tmp_path)
+    elapsed = startup_seconds(["-m", *arguments], tmp_path) - interpreter
+    assert elapsed <= STARTUP_BUDGET_SECONDS * STARTUP_TOLERANCE, (
+        f"{' '.join(arguments)} tardó {elapsed:.3f}s en arrancar; "
+        f"presupuesto {STARTUP_BUDGET_SECONDS}s x{STARTUP_TOLERANCE}"
+    )